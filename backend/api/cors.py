@@ -0,0 +1,28 @@
+import os
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+
+def get_allowed_origins() -> list[str]:
+    # Determine CORS origins via ALLOWED_ORIGINS env var (comma separated). Fall back to common dev origins.
+    allowed = os.environ.get("ALLOWED_ORIGINS")
+    if allowed:
+        return [s.strip() for s in allowed.split(",") if s.strip()]
+    return [
+        "http://localhost",
+        "http://localhost:3000",  # Common React dev port
+        "http://localhost:5173",  # Common Vite dev port (matching your error)
+        "http://127.0.0.1:5173",
+        "http://127.0.0.1",
+    ]
+
+
+def add_cors(app: FastAPI):
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=get_allowed_origins(),  # Allow the specific origins defined above
+        allow_credentials=True,  # Allow cookies/authorization headers
+        allow_methods=["*"],  # Allow all methods (GET, POST, etc.)
+        allow_headers=["*"],  # Allow all headers
+    )
@@ -1,4 +1,9 @@
-from pydantic import BaseModel
+from typing import Annotated, Literal
+
+import msgpack
+from pydantic import BaseModel, Field, TypeAdapter
+
+from game_state.events import EventUnion
 
 
 class JoinGameRequest(BaseModel):
@@ -7,3 +12,47 @@ class JoinGameRequest(BaseModel):
 
 class CreatePlayerRequest(BaseModel):
     name: str
+
+
+class ResyncRequest(BaseModel):
+    """Sent by a delta client that missed a version, for a full snapshot again."""
+
+    type: Literal["resync"]
+    updatesCursor: int | None = None
+
+
+# no message a client sends comes close, bigger ones close the websocket unparsed
+MAX_MESSAGE_BYTES = 4096
+
+
+def is_too_big(raw: str | bytes) -> bool:
+    """Whether a frame is over MAX_MESSAGE_BYTES, counting text frames in UTF-8 bytes."""
+    if len(raw) > MAX_MESSAGE_BYTES:
+        return True
+    # a character is 1 to 4 bytes, so only text that could be over is encoded to find out
+    return (
+        isinstance(raw, str)
+        and len(raw) * 4 > MAX_MESSAGE_BYTES
+        and len(raw.encode()) > MAX_MESSAGE_BYTES
+    )
+
+
+# everything a client can send over its game websocket, tagged on `type` like Event
+ClientMessage = Annotated[EventUnion | ResyncRequest, Field(discriminator="type")]
+ClientMessageAdapter = TypeAdapter(ClientMessage)
+# offered by clients that want binary MessagePack frames both ways instead of JSON text
+MSGPACK_SUBPROTOCOL = "leapfrog.msgpack"
+
+
+def parse_client_message(raw: str | bytes, use_msgpack: bool = False) -> ClientMessage:
+    """
+    Validates a websocket frame: JSON text, or MessagePack for a binary frame on a websocket
+    that negotiated MSGPACK_SUBPROTOCOL. Raises ValueError if it is malformed.
+
+    Frames are unpacked with msgpack rather than ormsgpack, which is only used to pack states:
+    ormsgpack allocates whatever length a frame claims up front and crashes the process on a
+    frame claiming a huge array, msgpack limits lengths by the size of the frame.
+    """
+    if use_msgpack and isinstance(raw, bytes):
+        return ClientMessageAdapter.validate_python(msgpack.unpackb(raw), by_alias=True)
+    return ClientMessageAdapter.validate_json(raw, by_alias=True)
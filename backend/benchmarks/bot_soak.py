@@ -0,0 +1,101 @@
+"""
+Soak test of many concurrent bot-only games on one GameManager, without any websockets.
+
+Every game gets `--players` server-side bots, put straight into its lobby since AddBotEvent is only
+taken from a host, and is started at once. Bots take their turns with no delay, so the games run as fast as the event loop allows, through the same
+Game tasks, event batching, odds and publishing as games with people in them.
+"blocked" is how late a 10 ms timer fired, i.e. how long the event loop was busy at once.
+
+    python -m benchmarks.bot_soak --games 200 --players 4 --bot greedy
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from benchmarks.common import bucket_percentile
+from game_state.bots import BOTS
+from game_state.events import StartGameEvent
+from game_state.game import BOT_DECISION_SECONDS, EVENTS_PER_BROADCAST, GameManager
+
+WATCH_INTERVAL = 0.01
+
+
+async def watch(lags: list[float]):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(WATCH_INTERVAL)
+        lags.append(time.perf_counter() - start - WATCH_INTERVAL)
+
+
+async def soak(args) -> dict:
+    manager = GameManager(bot_delay=0)
+    game_codes = [f"{i:06d}" for i in range(args.games)]
+    lags = []
+    watcher = asyncio.create_task(watch(lags))
+
+    start = time.perf_counter()
+    for game_code in game_codes:
+        await manager.create_game_state(game_code)
+        # before the game's first event, so its task doesn't touch the state yet
+        game_state = await manager.get_game_state(game_code)
+        for _ in range(args.players):
+            game_state.add_bot(args.bot)
+        await manager.add_event(StartGameEvent(game_code=game_code, websocket_id="host"))
+
+    deadline = start + args.timeout
+    game_states = [await manager.get_game_state(game_code) for game_code in game_codes]
+    while time.perf_counter() < deadline and not all(
+        game_state.state == "ended" for game_state in game_states
+    ):
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - start
+
+    watcher.cancel()
+    await asyncio.gather(*(manager._purge_game(game_code) for game_code in game_codes))
+    manager.shutdown()
+
+    lags.sort()
+    events_per_broadcast = EVENTS_PER_BROADCAST.labels(manager._batching.mode)
+    decision_buckets = BOT_DECISION_SECONDS.labels(args.bot).cumulative_buckets()
+    return {
+        "finished": sum(game_state.state == "ended" for game_state in game_states),
+        "elapsed": elapsed,
+        "events": events_per_broadcast.sum,
+        "blocked_p99": lags[int(0.99 * (len(lags) - 1))],
+        "blocked_max": lags[-1],
+        "decision_p50": bucket_percentile(decision_buckets, 0.5),
+        "decision_p99": bucket_percentile(decision_buckets, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bot_soak", description=__doc__)
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--bot", choices=list(BOTS), default="greedy")
+    parser.add_argument(
+        "--timeout", type=float, default=600, help="seconds to wait for every game to end"
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    result = asyncio.run(soak(args))
+    print(f"games:            {args.games} ({result['finished']} finished)")
+    print(f"elapsed:          {result['elapsed']:.1f} s")
+    print(f"games/sec:        {result['finished'] / result['elapsed']:.1f}")
+    print(f"events/sec:       {result['events'] / result['elapsed']:.0f}")
+    print(
+        f"blocked:          p99 {result['blocked_p99'] * 1e3:.1f} ms,"
+        f" max {result['blocked_max'] * 1e3:.1f} ms"
+    )
+    print(
+        f"bot decision:     p50 <= {result['decision_p50'] * 1e3:.2f} ms,"
+        f" p99 <= {result['decision_p99'] * 1e3:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+CPU per broadcast and bytes per message for compressed websocket traffic, as the number of
+viewers in a game grows.
+
+"per socket" is permessage-deflate as uvicorn negotiates it with browsers: every socket
+compresses every message again with its own compressor, which keeps a window of what it sent
+before. "shared" is `compression=zlib`: each payload is compressed once by
+PublishedState.compress and the bytes are sent to every socket, skipping small payloads.
+
+    python -m benchmarks.broadcast_compression
+"""
+
+import time
+
+from websockets.extensions.permessage_deflate import PerMessageDeflate
+from websockets.frames import Frame, Opcode
+
+from benchmarks.common import make_game, play_random_turn
+from game_state.snapshot import PublishedState
+
+NUM_VERSIONS = 20
+
+
+def played_versions(num_spectators: int) -> list[PublishedState]:
+    game_state = make_game(num_players=4, num_spectators=num_spectators, num_moves=0)
+    websocket_ids = {
+        game_state._get_player_id(conn.websocket_id): conn.websocket_id
+        for conn in game_state.connections
+        if conn.connection_type == "player"
+    }
+    versions = [PublishedState.initial(game_state)]
+    while game_state.state == "game" and len(versions) <= NUM_VERSIONS:
+        play_random_turn(game_state, websocket_ids[game_state.current_turn])
+        versions.append(versions[-1].next(game_state))
+    return versions[1:]
+
+
+def encode(published: PublishedState, connection_type: str, use_delta: bool) -> str:
+    if use_delta:
+        return published.encode_patch(connection_type)
+    return published.encode_full(connection_type)
+
+
+def per_socket(
+    versions: list[PublishedState], connection_types: list[str], use_delta: bool
+) -> tuple[float, float]:
+    """Seconds per broadcast and bytes per message."""
+    # uvicorn's settings, see websockets_sansio_impl
+    compressors = [
+        PerMessageDeflate(False, False, 12, 12, {"memLevel": 5}) for _ in connection_types
+    ]
+    elapsed = 0.0
+    num_bytes = 0
+    for published in versions:
+        payloads = {
+            ctype: encode(published, ctype, use_delta).encode()
+            for ctype in set(connection_types)
+        }
+        start = time.perf_counter()
+        for compressor, ctype in zip(compressors, connection_types):
+            num_bytes += len(compressor.encode(Frame(Opcode.TEXT, payloads[ctype])).data)
+        elapsed += time.perf_counter() - start
+    return elapsed / len(versions), num_bytes / len(versions) / len(connection_types)
+
+
+def shared(
+    versions: list[PublishedState], connection_types: list[str], use_delta: bool
+) -> tuple[float, float]:
+    elapsed = 0.0
+    num_bytes = 0
+    for published in versions:
+        published._compressed = None
+        payloads = {
+            ctype: encode(published, ctype, use_delta) for ctype in set(connection_types)
+        }
+        start = time.perf_counter()
+        for ctype in connection_types:
+            message = published.compress(payloads[ctype])
+            num_bytes += len(message) if isinstance(message, bytes) else len(message.encode())
+        elapsed += time.perf_counter() - start
+    return elapsed / len(versions), num_bytes / len(versions) / len(connection_types)
+
+
+def main():
+    print(
+        f"{'protocol':>8} {'viewers':>8} {'per socket (us)':>16} {'(B/msg)':>8} "
+        f"{'shared (us)':>12} {'(B/msg)':>8}"
+    )
+    for use_delta in (False, True):
+        for num_spectators in (6, 96, 996):
+            versions = played_versions(num_spectators)
+            connection_types = ["player"] * 4 + ["spectator"] * num_spectators
+            per_socket_seconds, per_socket_bytes = per_socket(
+                versions, connection_types, use_delta
+            )
+            shared_seconds, shared_bytes = shared(versions, connection_types, use_delta)
+            print(
+                f"{'delta' if use_delta else 'full':>8} {len(connection_types):>8} "
+                f"{per_socket_seconds * 1e6:>16.0f} {per_socket_bytes:>8.0f} "
+                f"{shared_seconds * 1e6:>12.0f} {shared_bytes:>8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Encode cost per event as the number of viewers in a game grows.
+
+"per socket" is the previous broadcast path: make_websocket_response and a json encode
+for every websocket. "shared" publishes the version once and reuses one encoded
+payload per connection type for all sockets.
+
+    python -m benchmarks.broadcast_encoding
+"""
+
+import json
+
+from benchmarks.common import make_game, timeit
+from game_state.snapshot import PublishedState
+
+
+def per_socket(game_state, websocket_ids):
+    for websocket_id in websocket_ids:
+        json.dumps(game_state.make_websocket_response(websocket_id))
+
+
+def shared(previous: PublishedState, game_state, websocket_ids):
+    published = previous.next(game_state)
+    for websocket_id in websocket_ids:
+        published.encode_full(published.get_connection_type(websocket_id))
+
+
+def main():
+    print(f"{'viewers':>8} {'per socket (us)':>16} {'shared (us)':>12}")
+    for num_spectators in (0, 10, 100, 300):
+        game_state = make_game(num_players=4, num_spectators=num_spectators)
+        websocket_ids = [conn.websocket_id for conn in game_state.connections]
+        websocket_ids.extend(game_state.spectators)
+        previous = PublishedState.initial(game_state)
+        repeat = 20 if num_spectators >= 100 else 200
+        print(
+            f"{len(websocket_ids):>8} "
+            f"{timeit(lambda: per_socket(game_state, websocket_ids), repeat):>16.0f} "
+            f"{timeit(lambda: shared(previous, game_state, websocket_ids), repeat):>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import random
+import time
+import uuid
+from typing import Callable
+
+from game_state.state import GameState
+
+
+def make_game(
+    num_players: int = 4, num_spectators: int = 0, num_moves: int = 10
+) -> GameState:
+    """
+    Creates a started game with the given connections and plays a few random moves,
+    so that the state has a realistic amount of updates in it.
+    """
+    game_state = GameState(game_code="000000")
+    for i in range(num_players):
+        game_state.add_connection(str(uuid.uuid4())[:8], "player", f"player{i}")
+    for _ in range(num_spectators):
+        game_state.add_connection(str(uuid.uuid4())[:8], "spectator")
+
+    game_state.reset_game()
+    game_state.create_players()
+    game_state.create_track()
+    game_state.create_frogs()
+    game_state.start_game()
+    game_state.state = "game"
+
+    websocket_ids = {
+        game_state._get_player_id(conn.websocket_id): conn.websocket_id
+        for conn in game_state.connections
+        if conn.connection_type == "player"
+    }
+    for _ in range(num_moves):
+        if game_state.state != "game":
+            break
+        play_random_turn(game_state, websocket_ids[game_state.current_turn])
+    return game_state
+
+
+def play_random_turn(game_state: GameState, websocket_id: str):
+    player = game_state.players[game_state._get_player_id(websocket_id)]
+    bettable_frogs = [
+        idx for idx, leg_bets in enumerate(game_state.leg_bets) if len(leg_bets) > 0
+    ]
+    if bettable_frogs and random.random() < 0.3:
+        game_state.make_leg_bet(websocket_id, random.choice(bettable_frogs))
+    elif "none" in player.overall_bets and random.random() < 0.1:
+        frog_idx = player.overall_bets.index("none")
+        game_state.make_overall_bet(
+            websocket_id, frog_idx, random.choice(["winner", "loser"])
+        )
+    else:
+        game_state.move_frog(websocket_id)
+
+
+def timeit(fn: Callable[[], object], repeat: int = 200) -> float:
+    """Returns the mean wall time of `fn` in microseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def bucket_percentile(buckets: list[tuple[float, int]], q: float) -> float:
+    """Upper bound of the histogram bucket the `q` quantile falls in."""
+    total = buckets[-1][1]
+    for upper_bound, count in buckets:
+        if count >= q * total:
+            return upper_bound
+    return buckets[-1][0]
@@ -0,0 +1,163 @@
+"""
+Broadcasts and event latency of the event batching modes of Game.run under bursty load.
+
+At a random time in the first two seconds, every game fills its lobby with a burst of joins and
+starts, then its players take turns with random think times. Each move comes with a burst of
+`--burst` events from the players waiting for their turn, like clicks on a bet or a reconnecting
+client. Every published state goes through PublishedState.next, like in GameManager, to show the
+encoding work the broadcasts cost.
+
+    python -m benchmarks.event_batching --games 50 --players 6
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from benchmarks.common import bucket_percentile
+from game_state.events import LegBetEvent, PlayerJoinEvent, StartGameEvent
+from game_state.game import EVENT_LATENCY, EVENTS_PER_BROADCAST, EventBatching, Game
+from game_state.snapshot import PublishedState
+from game_state.state import GameState
+from headless.bots import RandomBot
+
+
+async def play(
+    game: Game,
+    num_players: int,
+    num_moves: int,
+    burst: int,
+    think_time: float,
+    rng: random.Random,
+):
+    game_code = game.game_code
+    game_state = game._game_state
+    bots = {}
+    websocket_ids = [f"{game_code}-{i}" for i in range(num_players)]
+    # games start at different times, each start computes the leg odds of a fresh board
+    await asyncio.sleep(rng.uniform(0, 2))
+    # the lobby fills at once, e.g. from a link shared in a group chat
+    for i, websocket_id in enumerate(websocket_ids):
+        bots[game_state._get_player_id(websocket_id)] = (websocket_id, RandomBot(rng))
+        await game.add_event(
+            PlayerJoinEvent(
+                game_code=game_code, websocket_id=websocket_id, player_name=f"bot{i}"
+            )
+        )
+    await game.add_event(
+        StartGameEvent(game_code=game_code, websocket_id=websocket_ids[0])
+    )
+
+    for _ in range(num_moves):
+        await asyncio.sleep(rng.expovariate(1 / think_time))
+        if game_state.state != "game":
+            return
+        websocket_id, bot = bots[game_state.current_turn]
+        await game.add_event(bot.choose_event(game_state, websocket_id))
+        for _ in range(burst):
+            # out of turn, so ignored by the rules, but still an event to apply and publish
+            await game.add_event(
+                LegBetEvent(
+                    game_code=game_code,
+                    websocket_id=rng.choice(websocket_ids),
+                    frog_idx=0,
+                )
+            )
+
+
+async def measure(batching: EventBatching, args) -> dict:
+    random.seed(0)
+    published = {}
+    encode_seconds = 0.0
+
+    async def publish(game_state: GameState):
+        nonlocal encode_seconds
+        start = time.perf_counter()
+        published[game_state.game_code] = published[game_state.game_code].next(
+            game_state
+        )
+        encode_seconds += time.perf_counter() - start
+
+    games = [
+        Game(
+            f"{i:06d}",
+            GameState(game_code=f"{i:06d}"),
+            publish,
+            batching=batching,
+        )
+        for i in range(args.games)
+    ]
+    for game in games:
+        published[game.game_code] = PublishedState.initial(game._game_state)
+
+    tasks = [asyncio.create_task(game.run()) for game in games]
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            play(
+                game,
+                args.players,
+                args.moves,
+                args.burst,
+                args.think_time,
+                random.Random(i),
+            )
+            for i, game in enumerate(games)
+        )
+    )
+    # let the last batches through
+    await asyncio.sleep(batching.tick_interval * 2)
+    elapsed = time.perf_counter() - start
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    events_per_broadcast = EVENTS_PER_BROADCAST.labels(batching.mode)
+    event_latency = EVENT_LATENCY.labels(batching.mode)
+    buckets = event_latency.cumulative_buckets()
+    return {
+        "events": events_per_broadcast.sum,
+        "broadcasts": events_per_broadcast.count,
+        "mean_latency": event_latency.sum / max(event_latency.count, 1),
+        "p50_latency": bucket_percentile(buckets, 0.5),
+        "p99_latency": bucket_percentile(buckets, 0.99),
+        "encode_share": encode_seconds / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.event_batching", description=__doc__
+    )
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--players", type=int, default=6)
+    parser.add_argument("--moves", type=int, default=30, help="moves per game at most")
+    parser.add_argument("--burst", type=int, default=3, help="extra events per move")
+    parser.add_argument(
+        "--think-time", type=float, default=0.5, help="mean seconds between moves"
+    )
+    parser.add_argument(
+        "--tick", type=float, default=0.05, help="tick interval in seconds"
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(
+        f"{'mode':<10} {'events':>8} {'broadcasts':>11} {'events/bc':>10}"
+        f" {'mean ms':>8} {'p50 ms <=':>10} {'p99 ms <=':>10} {'encoding':>9}"
+    )
+    for mode in ("event", "tick", "adaptive"):
+        result = asyncio.run(measure(EventBatching(mode, args.tick), args))
+        print(
+            f"{mode:<10} {result['events']:>8.0f} {result['broadcasts']:>11}"
+            f" {result['events'] / max(result['broadcasts'], 1):>10.2f}"
+            f" {result['mean_latency'] * 1e3:>8.1f} {result['p50_latency'] * 1e3:>10.1f}"
+            f" {result['p99_latency'] * 1e3:>10.1f} {result['encode_share']:>9.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Parse cost per inbound websocket message, for every event type.
+
+"previous" is the old path: receive_json decodes the frame with json.loads, then the dict is
+validated against the plain union of events, which tries the models in turn. "tagged" validates
+the raw frame against the union tagged on `type`, which goes straight to the one model.
+The reject rows are frames that are dropped: malformed JSON, an unknown type, and an oversized
+frame, which the tagged path turns away on its length without parsing it.
+
+    python -m benchmarks.event_parsing
+"""
+
+import json
+
+from pydantic import TypeAdapter
+
+from api.requests import ClientMessageAdapter, is_too_big
+from benchmarks.common import timeit
+from game_state.events import EventUnion
+
+# frames as the frontend sends them, see frontend/src/api/events.ts
+FRAMES = {
+    "player_join": {"playerName": "frog fan"},
+    "spectator_join": {},
+    "add_bot": {"strength": "greedy"},
+    "kick_player": {"playerId": "3f2a9c1b"},
+    "update_game_settings": {"settings": {"num_frogs": 5, "track_length": 16}},
+    "start_game": {},
+    "move_frog": {},
+    "leg_bet": {"frogIdx": 2},
+    "overall_bet": {"frogIdx": 3, "betType": "winner"},
+    "spectator_tile": {"tileIdx": 7, "displacement": -1},
+    "end_game": {},
+}
+REJECTED_FRAMES = {
+    "malformed": b'{"type": "move_frog", "gameCode": "123456"',
+    "unknown type": b'{"type": "teleport_frog", "gameCode": "123456", "websocketId": "a1b2c3d4"}',
+    "oversized": json.dumps(
+        {
+            "type": "update_game_settings",
+            "gameCode": "123456",
+            "settings": {f"key{i}": i for i in range(20000)},
+        }
+    ).encode(),
+}
+
+PreviousEventAdapter = TypeAdapter(EventUnion)
+
+
+def previous(frame: bytes):
+    try:
+        PreviousEventAdapter.validate_python(json.loads(frame), by_alias=True)
+    except Exception:
+        pass
+
+
+def tagged(frame: bytes):
+    if is_too_big(frame):
+        return
+    try:
+        ClientMessageAdapter.validate_json(frame, by_alias=True)
+    except ValueError:
+        pass
+
+
+def main():
+    frames = {
+        event_type: json.dumps(
+            {"type": event_type, "gameCode": "123456", "websocketId": "a1b2c3d4", **fields}
+        ).encode()
+        for event_type, fields in FRAMES.items()
+    }
+    print(f"{'message':>22} {'bytes':>7} {'previous (us)':>14} {'tagged (us)':>12}")
+    for name, frame in (*frames.items(), *REJECTED_FRAMES.items()):
+        repeat = 20 if is_too_big(frame) else 20000
+        print(
+            f"{name:>22} {len(frame):>7} "
+            f"{timeit(lambda: previous(frame), repeat):>14.2f} "
+            f"{timeit(lambda: tagged(frame), repeat):>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
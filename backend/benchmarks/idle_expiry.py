@@ -0,0 +1,120 @@
+"""
+Work done by an idle-game purge pass as the number of games grows.
+
+Every game has two websockets that take `CLOSE_DELAY_SECONDS` to close. A pass is timed once when
+no game is due, and once when 1% of the games have been idle for longer than the threshold.
+"blocked" is the longest the event loop went without running anything else during the pass.
+
+"full scan" reproduces the previous GameManager, which looked at every game on every pass and
+closed the sockets of expired games one at a time while holding the registry lock. "heap" is the
+current GameManager.
+
+    python -m benchmarks.idle_expiry
+"""
+
+import asyncio
+import logging
+import time
+
+from game_state.game import GameManager
+
+GAME_COUNTS = (1000, 10000, 50000)
+EXPIRED_FRACTION = 0.01
+INACTIVE_THRESHOLD = 60 * 60
+CLOSE_DELAY_SECONDS = 0.005
+
+
+class FullScanGameManager(GameManager):
+    async def _purge_games(self, inactive_threshold: float) -> int:
+        current_time = time.time()
+        num_purged = 0
+        for game_code, game in list(self._games.items()):
+            if game._last_update_time >= current_time - inactive_threshold:
+                continue
+            async with self._lock_for(game_code):
+                if self._games.get(game_code) is not game:
+                    continue
+                self._game_tasks.pop(game_code).cancel()
+                del self._game_states[game_code]
+                for writer in self._websockets[game_code].values():
+                    await writer.close()
+                del self._websockets[game_code]
+                del self._published_states[game_code]
+                del self._games[game_code]
+                num_purged += 1
+        return num_purged
+
+
+class SlowClosingWebSocket:
+    async def send_text(self, data: str):
+        pass
+
+    async def close(self, code: int = 1000):
+        await asyncio.sleep(CLOSE_DELAY_SECONDS)
+
+
+async def timed_pass(manager: GameManager) -> tuple[float, float, int]:
+    """Returns the pass time, the longest event loop stall and the number of purged games."""
+    stalls = []
+    done = False
+
+    async def watch():
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(0)
+            stalls.append(time.perf_counter() - start)
+
+    watcher = asyncio.create_task(watch())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    num_purged = await manager._purge_games(INACTIVE_THRESHOLD)
+    elapsed = time.perf_counter() - start
+    done = True
+    await watcher
+    return elapsed, max(stalls), num_purged
+
+
+async def measure(manager: GameManager, num_games: int) -> list[tuple[float, float, int]]:
+    game_codes = [f"{i:06d}" for i in range(num_games)]
+    for game_code in game_codes:
+        await manager.create_game_state(game_code)
+        for i in range(2):
+            await manager.add_websocket(game_code, f"ws{i}", SlowClosingWebSocket())
+    # let the writers send their first snapshot
+    await asyncio.sleep(0.1)
+
+    results = [await timed_pass(manager)]
+
+    for game_code in game_codes[: int(num_games * EXPIRED_FRACTION)]:
+        # as if they had been idle since the epoch
+        manager._games[game_code]._last_update_time = 0
+        manager._idle_games.schedule(game_code, 0)
+    results.append(await timed_pass(manager))
+
+    await asyncio.gather(*(manager._purge_game(game_code) for game_code in game_codes))
+    manager.shutdown()
+    return results
+
+
+def main():
+    logging.disable(logging.INFO)
+    print(
+        f"{'manager':<10} {'games':>6} {'idle pass ms':>13} {'blocked ms':>11}"
+        f" {'expiring pass ms':>17} {'blocked ms':>11} {'purged':>7}"
+    )
+    for num_games in GAME_COUNTS:
+        for name, make_manager in (
+            ("full scan", FullScanGameManager),
+            ("heap", GameManager),
+        ):
+            (idle, idle_blocked, _), (expiring, expiring_blocked, num_purged) = asyncio.run(
+                measure(make_manager(), num_games)
+            )
+            print(
+                f"{name:<10} {num_games:>6} {idle * 1e3:>13.2f} {idle_blocked * 1e3:>11.2f}"
+                f" {expiring * 1e3:>17.2f} {expiring_blocked * 1e3:>11.2f} {num_purged:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
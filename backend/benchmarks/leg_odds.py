@@ -0,0 +1,49 @@
+"""
+Time to calculate the exact leg odds of a position, by number of frogs left to move in the leg.
+
+tests/test_odds.py checks the odds themselves against the GameState rule code.
+
+    python -m benchmarks.leg_odds
+"""
+
+import random
+import statistics
+import time
+
+from benchmarks.common import make_game
+from game_state.odds import calculate_leg_odds
+from game_state.state import GameState
+
+
+def make_position(num_unmoved: int) -> GameState:
+    while True:
+        game_state = make_game(num_players=3, num_moves=random.randint(0, 15))
+        if game_state.state != "game":
+            continue
+        player_id = game_state.player_order[0]
+        for tile_idx in range(1, game_state.num_tiles - 1):
+            if game_state.is_valid_spectator_tile_placement(tile_idx) and random.random() < 0.2:
+                game_state.track.place_spectator_tile(
+                    tile_idx, player_id, "", random.choice(["forward", "backward"])
+                )
+        game_state.unmoved_frogs = random.sample(
+            [frog.idx for frog in game_state.frogs], num_unmoved
+        )
+        return game_state
+
+
+def main():
+    random.seed(0)
+    print(f"{'unmoved':>8} {'p50 (ms)':>10} {'max (ms)':>10}")
+    for num_unmoved in (7, 6, 5, 4, 3):
+        timings = []
+        for _ in range(20):
+            game_state = make_position(num_unmoved)
+            start = time.perf_counter()
+            calculate_leg_odds(game_state)
+            timings.append((time.perf_counter() - start) * 1e3)
+        print(f"{num_unmoved:>8} {statistics.median(timings):>10.1f} {max(timings):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Memory footprint of idle lobbies, per game and by component.
+
+Creates `--games` games through GameManager, joins `--players` players to each and lets the game
+tasks settle, then reports tracemalloc's view of the total next to GameManager.memory_report.
+
+    python -m benchmarks.memory --games 10000 --players 2
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import tracemalloc
+
+from game_state.events import PlayerJoinEvent
+from game_state.game import GameManager
+
+
+async def measure(num_games: int, num_players: int):
+    manager = GameManager()
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    game_codes = [f"{i:06d}" for i in range(num_games)]
+    for game_code in game_codes:
+        await manager.create_game_state(game_code)
+        game = manager._games[game_code]
+        for i in range(num_players):
+            await game.process_event(
+                PlayerJoinEvent(
+                    game_code=game_code,
+                    websocket_id=f"{game_code}-{i}",
+                    player_name=f"player{i}",
+                )
+            )
+    # let the game tasks start and block on their event queues
+    await asyncio.sleep(0.1)
+
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    report = await manager.memory_report()
+    print(f"games:                  {num_games}")
+    print(f"traced total:           {(after - before) / 1e6:.1f} MB")
+    print(f"traced per game:        {(after - before) / num_games:.0f} B")
+    print(f"reported per game:      {report['bytes_per_game']:.0f} B")
+    print()
+    print(f"{'component':<32} {'bytes/game':>12}")
+    for name, size in report["components"].items():
+        if size >= 1:
+            print(f"{name:<32} {size:>12.0f}")
+
+    manager.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.memory")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=2)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    asyncio.run(measure(args.games, args.players))
+
+
+if __name__ == "__main__":
+    main()
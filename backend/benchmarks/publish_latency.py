@@ -0,0 +1,172 @@
+"""
+Event to first byte latency across 1, 100 and 5000 active games.
+
+Every game has a player whose client keeps sending an event, waiting for the state with it to
+arrive on its websocket and thinking for a while, so every game keeps publishing. Think times are
+picked to offer `--rate` events/s in total, at most 100 events/s per game.
+
+"shared queue" reproduces the previous GameManager, where games pushed their new states onto one
+queue that GameManager.run drained, sleeping 10 ms before each state. "per game" is the current
+GameManager, where every game publishes to its websockets from its own task.
+
+    python -m benchmarks.publish_latency
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from game_state.events import KickPlayerEvent
+from game_state.game import Game, GameManager
+from game_state.state import GameState
+from utils.queue import TypedQueue
+
+GAME_COUNTS = (1, 100, 5000)
+
+
+class SharedQueueGameManager(GameManager):
+    def __init__(self):
+        super().__init__()
+        self._state_update_queue = TypedQueue[GameState]()
+
+    def _make_game(self, initial_state: GameState) -> Game:
+        game = super()._make_game(initial_state)
+        game._publish = self._state_update_queue.put
+        return game
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(0.01)
+            await self._publish(await self._state_update_queue.get())
+
+
+class RecordingWebSocket:
+    def __init__(self):
+        self.received = asyncio.Event()
+
+    async def send_text(self, data: str):
+        self.received.set()
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def client(
+    manager: GameManager,
+    game_code: str,
+    websocket: RecordingWebSocket,
+    think_time: float,
+    timeout: float,
+    deadline: float,
+    latencies: list[float],
+    rng: random.Random,
+):
+    # the snapshot sent on connect
+    await websocket.received.wait()
+    while True:
+        delay = rng.expovariate(1 / think_time)
+        if time.perf_counter() + delay > deadline:
+            return
+        await asyncio.sleep(delay)
+        websocket.received.clear()
+        start = time.perf_counter()
+        # changes nothing, but is applied and published like any other event
+        await manager.add_event(
+            KickPlayerEvent(
+                game_code=game_code, websocket_id=f"{game_code}-0", player_id=""
+            )
+        )
+        try:
+            await asyncio.wait_for(websocket.received.wait(), timeout)
+        except asyncio.TimeoutError:
+            latencies.append(float("inf"))
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def measure(manager: GameManager, num_games: int, args) -> list[float]:
+    game_codes = [f"{i:06d}" for i in range(num_games)]
+    websockets = {}
+    for game_code in game_codes:
+        await manager.create_game_state(game_code)
+        game = manager._games[game_code]
+        for i in range(4):
+            # applied directly, so the setup doesn't go through the manager being measured
+            game._game_state.add_connection(f"{game_code}-{i}", "player", f"player{i}")
+        websockets[game_code] = RecordingWebSocket()
+        await manager.add_websocket(game_code, f"{game_code}-0", websockets[game_code])
+
+    run_task = (
+        asyncio.create_task(manager.run())
+        if isinstance(manager, SharedQueueGameManager)
+        else None
+    )
+    latencies = []
+    think_time = max(num_games / args.rate, 0.01)
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            client(
+                manager,
+                game_code,
+                websockets[game_code],
+                think_time,
+                args.timeout,
+                start + args.duration,
+                latencies,
+                random.Random(i),
+            )
+            for i, game_code in enumerate(game_codes)
+        )
+    )
+
+    if run_task is not None:
+        run_task.cancel()
+    await asyncio.gather(*(manager._purge_game(game_code) for game_code in game_codes))
+    manager.shutdown()
+    return latencies
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.publish_latency", description=__doc__
+    )
+    parser.add_argument(
+        "--rate", type=float, default=1000, help="events/s offered over all games"
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument(
+        "--timeout", type=float, default=2.0, help="seconds to wait for an event's state"
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    print(
+        f"{'manager':<13} {'games':>6} {'events/s':>9} {'p50 ms':>8} {'p99 ms':>8}"
+        f" {'max ms':>8} {'timed out':>10}"
+    )
+    for num_games in GAME_COUNTS:
+        for name, make_manager in (
+            ("shared queue", SharedQueueGameManager),
+            ("per game", GameManager),
+        ):
+            latencies = asyncio.run(measure(make_manager(), num_games, args))
+            num_timed_out = sum(latency == float("inf") for latency in latencies)
+            print(
+                f"{name:<13} {num_games:>6} {len(latencies) / args.duration:>9.0f}"
+                f" {percentile(latencies, 0.5) * 1e3:>8.2f}"
+                f" {percentile(latencies, 0.99) * 1e3:>8.2f}"
+                f" {max(latencies) * 1e3:>8.2f} {num_timed_out:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
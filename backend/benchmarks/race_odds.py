@@ -0,0 +1,99 @@
+"""
+Throughput of the Monte Carlo race odds engine, and the time and accuracy of estimates through the process pool.
+
+Each position is also checked against races played out move by move with the real GameState rule code,
+so the engine can't drift from the rules.
+
+    python -m benchmarks.race_odds
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import random
+import time
+
+from benchmarks.common import make_game
+from game_state.race_odds import RaceOddsEstimator, RaceSpec, simulate_races
+from game_state.state import GameState
+
+
+def make_position(num_moves: int) -> GameState:
+    """A game after `num_moves` random moves that hasn't finished yet."""
+    while True:
+        game_state = make_game(num_players=3, num_moves=num_moves)
+        if game_state.state == "game":
+            return game_state
+
+
+def play_out_races(game_state: GameState, num_races: int) -> dict[int, list[int]]:
+    """How often each forward frog wins and loses, by playing random moves with GameState itself."""
+    counts = {frog.idx: [0, 0] for frog in game_state.frogs if frog.is_forward_frog}
+    websocket_id = game_state.players[game_state.current_turn].connection.websocket_id
+    for _ in range(num_races):
+        state = copy.deepcopy(game_state)
+        # the copy would otherwise roll the same dice as every other copy
+        state.rng.seed(random.getrandbits(64))
+        while state.state == "game":
+            state.move_frog(websocket_id)
+        counts[state.frog_order[0]][0] += 1
+        counts[state.frog_order[-1]][1] += 1
+    return counts
+
+
+def check(game_state: GameState, num_races: int = 2000):
+    spec = RaceSpec.from_game_state(game_state)
+    wins, losses, num_finished = simulate_races(spec, 20000, seed=0)
+    expected = play_out_races(game_state, num_races)
+    for i, frog_idx in enumerate(spec.forward_frogs):
+        for actual, count in ((wins[i], expected[frog_idx][0]), (losses[i], expected[frog_idx][1])):
+            p, q = actual / num_finished, count / num_races
+            standard_error = (max(p * (1 - p), 1e-4) / num_races) ** 0.5
+            assert abs(p - q) < 5 * standard_error, (
+                f"Frog {frog_idx}: engine gives {p:.3f}, rules give {q:.3f}"
+            )
+
+
+async def time_estimates(target_standard_error: float, time_budget_seconds: float):
+    with ProcessPoolExecutor() as executor:
+        estimator = RaceOddsEstimator(
+            executor,
+            target_standard_error=target_standard_error,
+            time_budget_seconds=time_budget_seconds,
+        )
+        # warm up the worker processes
+        await estimator.estimate(RaceSpec.from_game_state(make_game(num_moves=0)))
+        for num_moves in (0, 20, 40):
+            spec = RaceSpec.from_game_state(make_position(num_moves))
+            start = time.perf_counter()
+            race_odds = await estimator.estimate(spec)
+            elapsed = (time.perf_counter() - start) * 1e3
+            max_standard_error = max(
+                max(odds.winner_standard_error, odds.loser_standard_error)
+                for odds in race_odds
+            )
+            print(
+                f"{target_standard_error:>8} {time_budget_seconds:>8} {num_moves:>6}"
+                f" {elapsed:>10.1f} {max_standard_error:>10.4f}"
+            )
+
+
+def main():
+    random.seed(0)
+    print(f"{'moves':>6} {'races/s':>12}")
+    for num_moves in (0, 20, 40):
+        game_state = make_position(num_moves)
+        spec = RaceSpec.from_game_state(game_state)
+        start = time.perf_counter()
+        _, _, num_finished = simulate_races(spec, 20000, seed=num_moves)
+        print(f"{num_moves:>6} {num_finished / (time.perf_counter() - start):>12.0f}")
+        check(game_state)
+
+    print()
+    print(f"{'target':>8} {'budget':>8} {'moves':>6} {'time (ms)':>10} {'max se':>10}")
+    for target_standard_error, time_budget_seconds in ((0.01, 2.0), (0.005, 2.0), (0.001, 0.5)):
+        asyncio.run(time_estimates(target_standard_error, time_budget_seconds))
+
+
+if __name__ == "__main__":
+    main()
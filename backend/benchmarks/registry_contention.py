@@ -0,0 +1,99 @@
+"""
+add_event latency across thousands of games while an idle-game purge is closing slow sockets.
+
+"global lock" reproduces the previous GameManager, where add_event and the whole purge sweep
+went through one asyncio.Lock. "sharded" is the current GameManager.
+
+    python -m benchmarks.registry_contention
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+
+from game_state.events import BaseEvent, KickPlayerEvent
+from game_state.game import GameManager
+
+NUM_GAMES = 2000
+NUM_EXPIRED_GAMES = 20
+NUM_EVENTS = 20000
+NUM_SENDERS = 100
+CLOSE_DELAY_SECONDS = 0.005
+
+
+class GlobalLockGameManager(GameManager):
+    def __init__(self):
+        super().__init__()
+        self.lock = asyncio.Lock()
+
+    async def add_event(self, event: BaseEvent) -> bool:
+        async with self.lock:
+            return await super().add_event(event)
+
+    async def _purge_games(self, inactive_threshold: float) -> None:
+        async with self.lock:
+            await super()._purge_games(inactive_threshold)
+
+
+class SlowClosingWebSocket:
+    async def send_text(self, data: str):
+        pass
+
+    async def close(self, code: int = 1000):
+        await asyncio.sleep(CLOSE_DELAY_SECONDS)
+
+
+async def measure(manager: GameManager) -> list[float]:
+    game_codes = [f"{i:06d}" for i in range(NUM_GAMES)]
+    for game_code in game_codes:
+        await manager.create_game_state(game_code)
+        for i in range(4):
+            await manager.add_websocket(game_code, f"ws{i}", SlowClosingWebSocket())
+
+    for game_code in game_codes[:NUM_EXPIRED_GAMES]:
+        # as if they had been idle since the epoch
+        manager._games[game_code]._last_update_time = 0
+        manager._idle_games.schedule(game_code, 0)
+    active_game_codes = game_codes[NUM_EXPIRED_GAMES:]
+
+    latencies = []
+
+    async def send_events(offset: int):
+        for i in range(offset, NUM_EVENTS, NUM_SENDERS):
+            event = KickPlayerEvent(
+                game_code=active_game_codes[i % len(active_game_codes)],
+                player_id="",
+                websocket_id="",
+            )
+            start = time.perf_counter()
+            await manager.add_event(event)
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0)
+
+    purge_task = asyncio.create_task(manager._purge_games(inactive_threshold=60))
+    await asyncio.gather(*(send_events(offset) for offset in range(NUM_SENDERS)))
+    await purge_task
+
+    for task in manager._game_tasks.values():
+        task.cancel()
+    return latencies
+
+
+def main():
+    logging.disable(logging.INFO)
+    print(f"{'registry':>12} {'p50 (us)':>10} {'p99 (us)':>10} {'max (us)':>10}")
+    for name, make_manager in (
+        ("global lock", GlobalLockGameManager),
+        ("sharded", GameManager),
+    ):
+        latencies = asyncio.run(measure(make_manager()))
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{name:>12} {quantiles[49] * 1e6:>10.0f} "
+            f"{quantiles[98] * 1e6:>10.0f} {max(latencies) * 1e6:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Player turn latency on one game as its audience grows, through the real endpoints.
+
+Four players take turns as fast as they get them, on a backend started in a child process, with
+up to 2000 spectators watching the same game. Latency is from a player sending an event to each
+player getting the state with it. Spectators connect from another process, so that reading their
+frames doesn't slow down the players' client: by websocket with permessage-deflate as browsers
+do ("deflate"), without it as on a server run with `--ws-per-message-deflate false`
+("websocket"), or as read-only watchers of the /stream Server-Sent Events ("stream"), who are
+sent every version, batched at the max rate, so their states/s are versions. The rows with the
+highest max rate send spectators every state, as fast as they can be sent.
+
+    python -m benchmarks.spectator_tier
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import random
+
+import httpx
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+from loadtest.__main__ import percentile
+from loadtest.client import LoadGame, LoadStats
+from loadtest.server import local_server
+
+NUM_PLAYERS = 4
+
+
+async def watch_streams(url: str, game_code: str, num_watchers: int, ready, stop) -> list[int]:
+    """Opens the event streams and counts the versions each of them gets until `stop` is set."""
+    counts = [0] * num_watchers
+    connected = [asyncio.Event() for _ in range(num_watchers)]
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(base_url=url, timeout=None, limits=limits) as http:
+
+        async def count(i: int):
+            async with http.stream("GET", f"/leapfrog/game/{game_code}/stream") as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        counts[i] += 1
+                        connected[i].set()
+
+        tasks = [asyncio.create_task(count(i)) for i in range(num_watchers)]
+        await asyncio.gather(*(event.wait() for event in connected))
+        # the snapshot each stream starts with
+        counts = [0] * num_watchers
+        ready.set()
+        await asyncio.to_thread(stop.wait)
+        result = list(counts)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return result
+
+
+async def spectate(
+    url: str, game_code: str, num_spectators: int, via: str, ready, stop
+) -> list[int]:
+    """Connects the spectators and counts the states each of them gets until `stop` is set."""
+    if via == "stream":
+        return await watch_streams(url, game_code, num_spectators, ready, stop)
+    async with httpx.AsyncClient(base_url=url, timeout=30.0) as http:
+        websocket_ids = []
+        for _ in range(num_spectators):
+            response = await http.post(f"/leapfrog/game/{game_code}/create-spectator")
+            websocket_ids.append(response.json()["websocket_id"])
+    ws_url = url.replace("http", "ws", 1)
+    websockets = await asyncio.gather(
+        *(
+            connect(
+                f"{ws_url}/leapfrog/game/{game_code}?websocket_id={websocket_id}",
+                compression="deflate" if via == "deflate" else None,
+            )
+            for websocket_id in websocket_ids
+        )
+    )
+    # the snapshot sent on connect
+    await asyncio.gather(*(websocket.recv() for websocket in websockets))
+    counts = [0] * num_spectators
+
+    async def count(i: int):
+        try:
+            async for _ in websockets[i]:
+                counts[i] += 1
+        except ConnectionClosed:
+            pass
+
+    tasks = [asyncio.create_task(count(i)) for i in range(num_spectators)]
+    ready.set()
+    await asyncio.to_thread(stop.wait)
+    result = list(counts)
+    await asyncio.gather(*(websocket.close() for websocket in websockets))
+    await asyncio.gather(*tasks)
+    return result
+
+
+def run_spectators(
+    url: str, game_code: str, num_spectators: int, via: str, ready, stop, results
+):
+    results.put(asyncio.run(spectate(url, game_code, num_spectators, via, ready, stop)))
+
+
+async def measure(
+    url: str, num_spectators: int, via: str, duration: float, seed: int
+) -> tuple[LoadStats, list[int]]:
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=20)
+    async with httpx.AsyncClient(base_url=url, timeout=30.0, limits=limits) as http:
+        game = LoadGame(
+            http,
+            url.replace("http", "ws", 1),
+            stats,
+            NUM_PLAYERS,
+            0,
+            think_time=0.01,
+            protocol="full",
+            encoding="json",
+            compression=None,
+            rng=random.Random(seed),
+        )
+        if not await game.setup():
+            raise RuntimeError("Could not set up the game")
+
+        context = multiprocessing.get_context("spawn")
+        ready, stop, results = context.Event(), context.Event(), context.Queue()
+        spectators = context.Process(
+            target=run_spectators,
+            args=(url, game.game_code, num_spectators, via, ready, stop, results),
+        )
+        if num_spectators:
+            spectators.start()
+            await asyncio.to_thread(ready.wait)
+        stats.latencies.clear()
+        await game.start()
+        await asyncio.sleep(duration)
+        game.stopped = True
+        stop.set()
+        counts = await asyncio.to_thread(results.get) if num_spectators else []
+        await asyncio.sleep(1.0)
+        await game.close()
+        if num_spectators:
+            spectators.join()
+    return stats, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(
+        f"{'spectators':>10} {'via':>9} {'max rate':>9} {'turns/s':>8} {'player p50':>11} "
+        f"{'p99 (ms)':>9} {'spectator states/s':>19} {'errors':>7}"
+    )
+    runs = [(0, "deflate", "2"), (100, "deflate", "2")]
+    runs += [(1000, via, rate) for via in ("deflate", "websocket") for rate in ("2", "1000")]
+    runs += [(num_watchers, "stream", "2") for num_watchers in (1000, 2000)]
+    for num_spectators, via, rate in runs:
+        with local_server(env={"SPECTATOR_UPDATES_PER_SECOND": rate}) as url:
+            stats, counts = asyncio.run(
+                measure(url, num_spectators, via, args.duration, args.seed)
+            )
+        states_per_second = sum(counts) / len(counts) / args.duration if counts else 0.0
+        print(
+            f"{num_spectators:>10} {via:>9} {rate:>9} {stats.events_sent / args.duration:>8.1f} "
+            f"{percentile(stats.latencies, 0.5) * 1e3:>11.1f} "
+            f"{percentile(stats.latencies, 0.99) * 1e3:>9.1f} "
+            f"{states_per_second:>19.1f} {sum(stats.errors.values()):>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
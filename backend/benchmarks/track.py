@@ -0,0 +1,92 @@
+"""
+Frog lookup, pile moves and ranking on the indexed Track, against the previous list-of-tiles scans.
+
+    python -m benchmarks.track
+"""
+
+import random
+
+from benchmarks.common import timeit
+from game_state.track import Tile, Track
+
+
+def scan_position(tiles: list[Tile], frog_idx: int) -> tuple[int, int]:
+    for tile_idx, tile in enumerate(tiles):
+        if frog_idx in tile.frogs:
+            return tile_idx, tile.frogs.index(frog_idx)
+    raise ValueError("Frog not found on track")
+
+
+def scan_move_pile(tiles: list[Tile], frog_idx: int, distance: int) -> int:
+    current_tile, tile_pos = scan_position(tiles, frog_idx)
+    frog_pile = tiles[current_tile].frogs[tile_pos:]
+    tiles[current_tile].frogs = tiles[current_tile].frogs[:tile_pos]
+    next_tile = max(min(current_tile + distance, len(tiles) - 1), 0)
+    tiles[next_tile].frogs.extend(frog_pile)
+    return next_tile
+
+
+def scan_ranking(tiles: list[Tile], num_ranked: int) -> list[int]:
+    return [
+        frog_idx
+        for tile in reversed(tiles)
+        for frog_idx in reversed(tile.frogs)
+        if frog_idx < num_ranked
+    ]
+
+
+def make_tracks(num_tiles: int, num_frogs: int) -> tuple[list[Tile], Track]:
+    track = Track(num_tiles, num_frogs)
+    for frog_idx in range(num_frogs):
+        track.place_frog(frog_idx, random.randrange(num_tiles // 2))
+    tiles = [Tile(frogs=list(tile.frogs)) for tile in track]
+    return tiles, track
+
+
+def main():
+    random.seed(0)
+    print(
+        f"{'tiles':>6} {'frogs':>6} {'op':>10} {'scan (us)':>10} {'track (us)':>11} {'speedup':>8}"
+    )
+    for num_tiles, num_frogs in ((17, 7), (60, 15), (200, 40)):
+        tiles, track = make_tracks(num_tiles, num_frogs)
+        moves = [
+            (random.randrange(num_frogs), random.choice((-2, -1, 1, 2)))
+            for _ in range(1000)
+        ]
+        move_iter = iter(moves * 1000)
+
+        def scan_move():
+            frog_idx, distance = next(move_iter)
+            scan_move_pile(tiles, frog_idx, distance)
+
+        track_iter = iter(moves * 1000)
+
+        def track_move():
+            frog_idx, distance = next(track_iter)
+            track.move_pile(frog_idx, distance)
+
+        results = [
+            (
+                "position",
+                timeit(lambda: scan_position(tiles, num_frogs - 1), 5000),
+                timeit(lambda: track.position(num_frogs - 1), 5000),
+            ),
+            ("move", timeit(scan_move, 5000), timeit(track_move, 5000)),
+            (
+                "ranking",
+                timeit(lambda: scan_ranking(tiles, num_frogs), 5000),
+                timeit(lambda: list(track.ranking), 5000),
+            ),
+        ]
+        # both boards went through the same moves
+        assert scan_ranking(tiles, num_frogs) == track.ranking
+        for op, scan_us, track_us in results:
+            print(
+                f"{num_tiles:>6} {num_frogs:>6} {op:>10} {scan_us:>10.2f} {track_us:>11.2f}"
+                f" {scan_us / track_us:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
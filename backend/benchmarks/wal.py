@@ -0,0 +1,154 @@
+"""
+Latency the write-ahead log adds to every event, and a check that recovery rebuilds the same games.
+
+Records `--games` games between random bots with the headless driver, then logs all of their events
+interleaved, as fast as possible, with the group commit running in the background. The time spent
+in WriteAheadLog.append is all the log adds to an event; the event loop lag shows whether commits
+hold up anything else. Finally every game is recovered from the log with a fresh GameManager and
+checked against the state the driver ended with.
+
+    python -m benchmarks.wal --games 1000
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import tempfile
+import time
+
+from game_state.events import BaseEvent
+from game_state.game import GameManager
+from game_state.state import GameState
+from game_state.wal import WriteAheadLog
+from headless.bots import RandomBot
+from headless.driver import play_game
+from utils.serialization import to_json_data
+
+# filled in asynchronously or only for the position a game ends on, so not compared
+_ODDS_FIELDS = ("leg_odds", "race_odds")
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def record_games(
+    num_games: int, num_players: int
+) -> list[tuple[GameState, list[BaseEvent]]]:
+    random.seed(0)
+    games = []
+    for i in range(num_games):
+        events = []
+        rng = random.Random(i)
+        result = play_game(
+            [RandomBot(rng) for _ in range(num_players)],
+            game_code=f"{i:06d}",
+            on_event=lambda game_state, event: events.append(event),
+        )
+        games.append((result.game_state, events))
+    return games
+
+
+async def log_games(
+    wal: WriteAheadLog, games: list[tuple[GameState, list[BaseEvent]]], batch_size: int
+) -> tuple[list[float], list[float], float]:
+    """Appends `batch_size` events of every game per turn of the event loop."""
+    for game_state, _ in games:
+        wal.create(game_state.game_code, game_state.seed)
+
+    lags = []
+
+    async def measure_lag():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    commit_task = asyncio.create_task(wal.run())
+    lag_task = asyncio.create_task(measure_lag())
+
+    append_times = []
+    start = time.perf_counter()
+    for offset in range(0, max(len(events) for _, events in games), batch_size):
+        for game_state, events in games:
+            for event in events[offset : offset + batch_size]:
+                append_start = time.perf_counter()
+                wal.append(game_state.game_code, event)
+                append_times.append(time.perf_counter() - append_start)
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    for task in (commit_task, lag_task):
+        task.cancel()
+    await asyncio.gather(commit_task, lag_task, return_exceptions=True)
+    await wal.close()
+    return append_times, lags, elapsed
+
+
+async def check_recovery(directory: str, games: list[tuple[GameState, list[BaseEvent]]]):
+    manager = GameManager(wal=WriteAheadLog(directory))
+    start = time.perf_counter()
+    num_recovered = await manager.recover_games()
+    elapsed = time.perf_counter() - start
+    print(f"recovered: {num_recovered} games in {elapsed:.2f} s")
+
+    assert num_recovered == len(games)
+    for game_state, _ in games:
+        recovered = to_json_data(await manager.get_game_state(game_state.game_code))
+        live = to_json_data(game_state)
+        for name in _ODDS_FIELDS:
+            del recovered[name], live[name]
+        assert recovered == live, f"Game {game_state.game_code} recovered differently"
+    print("recovered states match the played games")
+
+    for task in manager._game_tasks.values():
+        task.cancel()
+    for game in manager._games.values():
+        game._cancel_race_odds()
+    manager.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.wal", description=__doc__)
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument(
+        "--batch", type=int, default=1, help="events per game per event loop turn"
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    games = record_games(args.games, args.players)
+    num_events = sum(len(events) for _, events in games)
+    print(f"games:     {args.games}, {num_events} events")
+
+    with tempfile.TemporaryDirectory() as directory:
+        wal = WriteAheadLog(directory)
+        append_times, lags, elapsed = asyncio.run(log_games(wal, games, args.batch))
+        print(f"logged:    {num_events / elapsed:.0f} events/s")
+        print(
+            f"append:    p50 {percentile(append_times, 0.5) * 1e6:.1f} us,"
+            f" p99 {percentile(append_times, 0.99) * 1e6:.1f} us,"
+            f" max {max(append_times) * 1e6:.1f} us"
+        )
+        print(
+            f"loop lag:  p50 {percentile(lags, 0.5) * 1e3:.2f} ms,"
+            f" p99 {percentile(lags, 0.99) * 1e3:.2f} ms"
+        )
+        stats = wal.stats
+        num_commits = max(stats.num_commits, 1)
+        print(
+            f"commits:   {stats.num_commits}, {stats.num_records / num_commits:.0f} records"
+            f" and {stats.num_bytes / num_commits / 1e3:.1f} KB each,"
+            f" mean {stats.commit_seconds / num_commits * 1e3:.2f} ms,"
+            f" max {stats.max_commit_seconds * 1e3:.2f} ms"
+        )
+
+        asyncio.run(check_recovery(directory, games))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Bytes and encode cost per message, JSON against the MessagePack subprotocol, over the versions
+of a game as it is played.
+
+The encode time is for publishing one version and encoding it for a player and a spectator,
+which GameManager does once per version however many sockets then share the payloads.
+MessagePack messages leave out the static block (frogs and settings), which is only sent with
+snapshots and when it changes. The last rows parse an inbound event.
+
+    python -m benchmarks.wire_encoding
+"""
+
+import msgpack
+import orjson
+
+from api.requests import parse_client_message
+from benchmarks.common import make_game, play_random_turn, timeit
+from game_state.snapshot import PublishedState
+
+NUM_VERSIONS = 40
+
+
+def encode_json(published: PublishedState) -> list[str]:
+    return [
+        published.encode_full("player"),
+        published.encode_snapshot("player"),
+        published.encode_patch("player"),
+    ]
+
+
+def encode_msgpack(published: PublishedState) -> list[bytes]:
+    return [
+        published.pack_full("player", False),
+        published.pack_snapshot("player"),
+        published.pack_patch("player", False),
+    ]
+
+
+def publish_json(previous: PublishedState, game_state):
+    published = previous.next(game_state)
+    for ctype in ("player", "spectator"):
+        published.encode_full(ctype)
+        published.encode_patch(ctype)
+
+
+def publish_msgpack(previous: PublishedState, game_state):
+    published = previous.next(game_state, pack=True)
+    for ctype in ("player", "spectator"):
+        published.pack_full(ctype, False)
+        published.pack_patch(ctype, False)
+
+
+def main():
+    game_state = make_game(num_players=4, num_spectators=2, num_moves=0)
+    websocket_ids = {
+        game_state._get_player_id(conn.websocket_id): conn.websocket_id
+        for conn in game_state.connections
+        if conn.connection_type == "player"
+    }
+    previous = PublishedState.initial(game_state)
+    sizes = {"json": [0, 0, 0], "msgpack": [0, 0, 0]}
+    times = {"json": 0.0, "msgpack": 0.0}
+    num_versions = 0
+    while game_state.state == "game" and num_versions < NUM_VERSIONS:
+        play_random_turn(game_state, websocket_ids[game_state.current_turn])
+        times["json"] += timeit(lambda: publish_json(previous, game_state), 50)
+        times["msgpack"] += timeit(lambda: publish_msgpack(previous, game_state), 50)
+        published = previous.next(game_state)
+        for encoding, messages in (
+            ("json", encode_json(published)),
+            ("msgpack", encode_msgpack(published)),
+        ):
+            for i, message in enumerate(messages):
+                sizes[encoding][i] += len(message)
+        previous = published
+        num_versions += 1
+
+    print(f"mean over {num_versions} versions of a 4 player game")
+    print(
+        f"{'encoding':>9} {'full (B)':>9} {'snapshot (B)':>13} {'patch (B)':>10} "
+        f"{'publish (us)':>13}"
+    )
+    for encoding in ("json", "msgpack"):
+        full, snapshot, patch = (size / num_versions for size in sizes[encoding])
+        print(
+            f"{encoding:>9} {full:>9.0f} {snapshot:>13.0f} {patch:>10.0f} "
+            f"{times[encoding] / num_versions:>13.0f}"
+        )
+
+    event = {"type": "leg_bet", "gameCode": "123456", "websocketId": "a1b2c3d4", "frogIdx": 2}
+    print(f"\n{'event':>9} {'bytes':>9} {'parse (us)':>13}")
+    for encoding, frame in (
+        ("json", orjson.dumps(event)),
+        ("msgpack", msgpack.packb(event)),
+    ):
+        use_msgpack = encoding == "msgpack"
+        print(
+            f"{encoding:>9} {len(frame):>9} "
+            f"{timeit(lambda: parse_client_message(frame, use_msgpack), 20000):>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Runs the backend sharded over several processes: one shard process per game shard, each with its own
+GameManager and event loop, behind the stateless router in router.py.
+
+    python cluster.py --shards 4 --routers 2 --port 8000
+
+Shard i listens on 127.0.0.1:(shard_base_port + i) and owns the game codes c with shard_for(c, shards) == i.
+"""
+
+import argparse
+import multiprocessing
+import os
+
+import uvicorn
+
+
+def run_shard(shard_index: int, num_shards: int, port: int):
+    # set before main is imported by uvicorn, in the freshly spawned process
+    os.environ["SHARD_INDEX"] = str(shard_index)
+    os.environ["NUM_SHARDS"] = str(num_shards)
+    uvicorn.run("main:app", host="127.0.0.1", port=port, log_level="warning")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python cluster.py", description=__doc__)
+    parser.add_argument("--shards", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--routers", type=int, default=1, help="number of router worker processes"
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--shard-base-port", type=int, default=8100)
+    args = parser.parse_args()
+
+    # not daemonic, as every shard starts its own race odds process pool
+    context = multiprocessing.get_context("spawn")
+    shards = [
+        context.Process(
+            target=run_shard,
+            args=(shard_index, args.shards, args.shard_base_port + shard_index),
+        )
+        for shard_index in range(args.shards)
+    ]
+    for shard in shards:
+        shard.start()
+
+    os.environ["SHARD_URLS"] = ",".join(
+        f"http://127.0.0.1:{args.shard_base_port + shard_index}"
+        for shard_index in range(args.shards)
+    )
+    try:
+        uvicorn.run("router:app", host=args.host, port=args.port, workers=args.routers)
+    finally:
+        for shard in shards:
+            shard.terminate()
+        for shard in shards:
+            shard.join()
+
+
+if __name__ == "__main__":
+    main()
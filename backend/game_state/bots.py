@@ -0,0 +1,345 @@
+import random
+from typing import Callable, Protocol
+
+from game_state.events import (
+    BaseEvent,
+    BotStrength,
+    LegBetEvent,
+    MoveFrogEvent,
+    OverallBetEvent,
+    SpectatorTileEvent,
+)
+from game_state.odds import LegOdds, calculate_leg_odds, calculate_move_outcomes
+from game_state.state import GameState, LegBet, Player
+
+# the gold a player gets for moving a frog
+MOVE_FROG_VALUE = 1.0
+# how many frogs can be left to move for LookaheadBot to play out the next move, enough to keep
+# a decision to a few milliseconds (see calculate_move_outcomes)
+DEFAULT_LOOKAHEAD_MAX_UNMOVED = 4
+
+
+class Bot(Protocol):
+    """Chooses the event a player sends when it is their turn."""
+
+    def choose_event(self, game_state: GameState, websocket_id: str) -> BaseEvent: ...
+
+
+class RandomBot:
+    """
+    Picks a random legal action, with the given weights for moving a frog, leg bets,
+    overall bets and spectator tiles.
+    """
+
+    def __init__(
+        self,
+        rng: random.Random | None = None,
+        move_frog_weight: float = 0.6,
+        leg_bet_weight: float = 0.25,
+        overall_bet_weight: float = 0.05,
+        spectator_tile_weight: float = 0.1,
+    ):
+        self._rng = rng or random.Random()
+        self._weights = (
+            move_frog_weight,
+            leg_bet_weight,
+            overall_bet_weight,
+            spectator_tile_weight,
+        )
+
+    def choose_event(self, game_state: GameState, websocket_id: str) -> BaseEvent:
+        game_code = game_state.game_code
+        player = game_state.players[game_state._get_player_id(websocket_id)]
+
+        bettable_frogs = [
+            idx for idx, leg_bets in enumerate(game_state.leg_bets) if len(leg_bets) > 0
+        ]
+        unbet_frogs = [
+            idx for idx, bet in enumerate(player.overall_bets) if bet == "none"
+        ]
+        spectator_tiles = (
+            [] if player.has_spectator_tile else game_state.spectator_tile_placements
+        )
+        rng = self._rng
+        move_frog_weight, leg_bet_weight, overall_bet_weight, spectator_tile_weight = (
+            self._weights
+        )
+        choices = [
+            (
+                move_frog_weight,
+                lambda: MoveFrogEvent(game_code=game_code, websocket_id=websocket_id),
+            )
+        ]
+        if bettable_frogs:
+            choices.append(
+                (
+                    leg_bet_weight,
+                    lambda: LegBetEvent(
+                        game_code=game_code,
+                        websocket_id=websocket_id,
+                        frog_idx=rng.choice(bettable_frogs),
+                    ),
+                )
+            )
+        if unbet_frogs:
+            choices.append(
+                (
+                    overall_bet_weight,
+                    lambda: OverallBetEvent(
+                        game_code=game_code,
+                        websocket_id=websocket_id,
+                        frog_idx=rng.choice(unbet_frogs),
+                        bet_type=rng.choice(["winner", "loser"]),
+                    ),
+                )
+            )
+        if spectator_tiles:
+            choices.append(
+                (
+                    spectator_tile_weight,
+                    lambda: SpectatorTileEvent(
+                        game_code=game_code,
+                        websocket_id=websocket_id,
+                        tile_idx=rng.choice(spectator_tiles),
+                        displacement=rng.choice([1, -1]),
+                    ),
+                )
+            )
+        weights, make_events = zip(*choices)
+        return rng.choices(make_events, weights=weights)[0]()
+
+
+def current_leg_odds(game_state: GameState) -> list[LegOdds]:
+    """
+    The leg odds of the current position. Game keeps them up to date after every move, so this
+    only calculates them when nothing else does, like in the headless driver without odds.
+    """
+    return game_state.leg_odds or calculate_leg_odds(game_state)
+
+
+def leg_bet_value(leg_bet: LegBet, odds: LegOdds) -> float:
+    """Expected gold from a leg bet, the winnings of placings after second are all the same."""
+    winnings = leg_bet.winnings
+    return (
+        winnings[0] * odds.first
+        + winnings[1] * odds.second
+        + winnings[2] * (1 - odds.first - odds.second)
+    )
+
+
+def best_leg_bet(
+    leg_bets: list[list[LegBet]], leg_odds: list[LegOdds]
+) -> tuple[float, int | None]:
+    """The best expected gold from the top leg bet of any frog, and the frog, if any are left."""
+    best_value, best_frog = float("-inf"), None
+    for odds in leg_odds:
+        frog_leg_bets = leg_bets[odds.frog_idx]
+        if not frog_leg_bets:
+            continue
+        value = leg_bet_value(frog_leg_bets[0], odds)
+        if value > best_value:
+            best_value, best_frog = value, odds.frog_idx
+    return best_value, best_frog
+
+
+def overall_bet_values(
+    game_state: GameState, player: Player
+) -> list[tuple[float, int, str]]:
+    """
+    Expected gold from every overall bet the player can still make, from the race odds.
+    Empty until the race odds have been estimated, e.g. in the headless driver.
+    """
+    values = []
+    for race_odds in game_state.race_odds:
+        frog_idx = race_odds.frog_idx
+        if player.overall_bets[frog_idx] != "none":
+            continue
+        for bet_type, probability, bets in (
+            ("winner", race_odds.winner, game_state.overall_win_bets),
+            ("loser", race_odds.loser, game_state.overall_lose_bets),
+        ):
+            # correct bets are paid in the order they were made
+            num_ahead = sum(bet.frog_idx == frog_idx for bet in bets)
+            winnings = game_state.overall_bet_winnings[
+                min(num_ahead, len(game_state.overall_bet_winnings) - 1)
+            ]
+            value = probability * winnings - (1 - probability) * game_state.overall_bet_loss
+            values.append((value, frog_idx, bet_type))
+    return values
+
+
+def spectator_tile_values(game_state: GameState) -> dict[int, float]:
+    """
+    Expected number of frog moves that land on each tile a spectator tile can go on this leg,
+    each worth a gold to its owner. Frogs carried on top of a moving pile are left out.
+    """
+    placements = game_state.spectator_tile_placements
+    if not placements:
+        return {}
+    num_unmoved = len(game_state.unmoved_frogs)
+    leg_end_size = (
+        game_state.num_frogs
+        + game_state.num_backward_frogs
+        - game_state.num_frogs_per_round
+    )
+    # every unmoved frog is as likely to be one of the moves left this leg
+    move_probability = (num_unmoved - leg_end_size) / num_unmoved if num_unmoved else 0.0
+    landings = dict.fromkeys(placements, 0.0)
+    for frog_idx in game_state.unmoved_frogs:
+        moves = game_state.frogs[frog_idx].moves
+        tile_idx = game_state.track.frog_tiles[frog_idx]
+        for distance in moves:
+            if tile_idx + distance in landings:
+                landings[tile_idx + distance] += move_probability / len(moves)
+    return landings
+
+
+class GreedyBot:
+    """
+    Takes the action with the highest expected gold right now: a gold for moving a frog, leg bets
+    from the exact leg odds, overall bets from the race odds once they are estimated, and a
+    spectator tile by the frog moves expected to land on it this leg.
+    """
+
+    def __init__(self, rng: random.Random | None = None):
+        self._rng = rng or random.Random()
+
+    def choose_event(self, game_state: GameState, websocket_id: str) -> BaseEvent:
+        player = game_state.players[game_state._get_player_id(websocket_id)]
+        return self._best(self.value_actions(game_state, player, websocket_id))
+
+    def _best(self, choices: list[tuple[float, BaseEvent]]) -> BaseEvent:
+        best_value = max(value for value, _ in choices)
+        return self._rng.choice([event for value, event in choices if value == best_value])
+
+    def value_actions(
+        self, game_state: GameState, player: Player, websocket_id: str
+    ) -> list[tuple[float, BaseEvent]]:
+        """The best action of every kind the player can take, with its expected gold."""
+        game_code = game_state.game_code
+        choices: list[tuple[float, BaseEvent]] = [
+            (
+                MOVE_FROG_VALUE,
+                MoveFrogEvent(game_code=game_code, websocket_id=websocket_id),
+            )
+        ]
+
+        value, frog_idx = best_leg_bet(game_state.leg_bets, current_leg_odds(game_state))
+        if frog_idx is not None:
+            choices.append(
+                (
+                    value,
+                    LegBetEvent(
+                        game_code=game_code, websocket_id=websocket_id, frog_idx=frog_idx
+                    ),
+                )
+            )
+
+        overall_bets = overall_bet_values(game_state, player)
+        if overall_bets:
+            value, frog_idx, bet_type = max(overall_bets)
+            choices.append(
+                (
+                    value,
+                    OverallBetEvent(
+                        game_code=game_code,
+                        websocket_id=websocket_id,
+                        frog_idx=frog_idx,
+                        bet_type=bet_type,
+                    ),
+                )
+            )
+
+        if not player.has_spectator_tile:
+            tile_values = spectator_tile_values(game_state)
+            if tile_values:
+                tile_idx = max(tile_values, key=tile_values.__getitem__)
+                choices.append(
+                    (
+                        tile_values[tile_idx],
+                        SpectatorTileEvent(
+                            game_code=game_code,
+                            websocket_id=websocket_id,
+                            tile_idx=tile_idx,
+                            displacement=1,
+                        ),
+                    )
+                )
+        return choices
+
+
+class LookaheadBot(GreedyBot):
+    """
+    Like GreedyBot, but also counts what each action leaves for the next player: an action is
+    worth its expected gold minus the best expected gold of the next player's reply. Taking a leg
+    bet takes it away from them, and moving a frog is played out over every roll while at most
+    `max_unmoved` frogs are left to move, as a move late in a leg can hand them a sure bet.
+    """
+
+    def __init__(
+        self,
+        rng: random.Random | None = None,
+        max_unmoved: int = DEFAULT_LOOKAHEAD_MAX_UNMOVED,
+    ):
+        super().__init__(rng)
+        self._max_unmoved = max_unmoved
+
+    def choose_event(self, game_state: GameState, websocket_id: str) -> BaseEvent:
+        player_id = game_state._get_player_id(websocket_id)
+        player = game_state.players[player_id]
+        player_order = game_state.player_order
+        next_player = game_state.players[
+            player_order[(player_order.index(player_id) + 1) % len(player_order)]
+        ]
+        if next_player is player:
+            return super().choose_event(game_state, websocket_id)
+
+        leg_odds = current_leg_odds(game_state)
+        # the next player's best reply that no action of ours changes
+        other_value = max(
+            [MOVE_FROG_VALUE]
+            + [value for value, _, _ in overall_bet_values(game_state, next_player)]
+            + (
+                []
+                if next_player.has_spectator_tile
+                else list(spectator_tile_values(game_state).values())
+            )
+        )
+
+        def reply_value(
+            leg_bets: list[list[LegBet]], leg_odds: list[LegOdds]
+        ) -> float:
+            return max(other_value, best_leg_bet(leg_bets, leg_odds)[0])
+
+        choices = []
+        for value, event in self.value_actions(game_state, player, websocket_id):
+            match event:
+                case LegBetEvent(frog_idx=frog_idx):
+                    leg_bets = list(game_state.leg_bets)
+                    leg_bets[frog_idx] = leg_bets[frog_idx][1:]
+                    reply = reply_value(leg_bets, leg_odds)
+                case MoveFrogEvent() if len(game_state.unmoved_frogs) <= self._max_unmoved:
+                    reply = sum(
+                        outcome.probability
+                        * reply_value(
+                            game_state.leg_bets,
+                            # the leg bets of the next leg are fresh, as if nothing changed
+                            leg_odds if outcome.ends_leg else outcome.leg_odds,
+                        )
+                        for outcome in calculate_move_outcomes(game_state)
+                    )
+                case _:
+                    reply = reply_value(game_state.leg_bets, leg_odds)
+            choices.append((value - reply, event))
+        return self._best(choices)
+
+
+BOTS: dict[BotStrength, Callable[[random.Random | None], Bot]] = {
+    "random": RandomBot,
+    "greedy": GreedyBot,
+    "lookahead": LookaheadBot,
+}
+
+
+def make_bot(strength: BotStrength, rng: random.Random | None = None) -> Bot:
+    return BOTS[strength](rng)
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import time
+
+from fastapi import WebSocket, status
+
+from game_state.snapshot import PublishedState
+from utils.metrics import Counter, Histogram
+from utils.queue import TypedQueue
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_QUEUE_SIZE = 8
+DEFAULT_SEND_TIMEOUT_SECONDS = 5.0
+DEFAULT_MAX_STALLED_SENDS = 3
+
+SEND_SECONDS = Histogram(
+    "leapfrog_send_seconds",
+    "Time to write one game state to one websocket",
+    labelnames=("protocol", "encoding"),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 0.5, 1.0, 5.0),
+)
+COALESCED_STATES = Counter(
+    "leapfrog_coalesced_states_total",
+    "Game states dropped for a websocket that fell behind, only the latest one is sent",
+)
+SEND_TIMEOUTS = Counter(
+    "leapfrog_send_timeouts_total", "Sends to a websocket that timed out"
+)
+SENT_BYTES = Counter(
+    "leapfrog_sent_bytes_total",
+    "Bytes of game state messages written to websockets",
+    labelnames=("encoding",),
+)
+# bound once, so timing a send doesn't build a label tuple
+_SEND_SECONDS_BY_PROTOCOL = {
+    (use_delta, use_msgpack): SEND_SECONDS.labels(
+        "delta" if use_delta else "full", "msgpack" if use_msgpack else "json"
+    )
+    for use_delta in (False, True)
+    for use_msgpack in (False, True)
+}
+_SENT_BYTES_BY_ENCODING = {
+    False: SENT_BYTES.labels("json"),
+    True: SENT_BYTES.labels("msgpack"),
+}
+
+
+class ClientWriter:
+    """
+    Owns the outbound side of a single websocket.
+    Published states are queued without blocking and a dedicated task writes them to the socket,
+    so one slow client never delays the broadcast to anybody else.
+
+    If the client falls behind and its queue fills up, pending states are dropped and only the
+    latest one is kept (delta clients are then sent a snapshot instead of a patch).
+    A client whose sends keep timing out is disconnected.
+
+    MessagePack clients are sent binary frames, with the static part of the state only when
+    it changed since the last one they got. Compressing clients are sent binary zlib frames for
+    all but small messages.
+    """
+
+    __slots__ = (
+        "websocket_id",
+        "websocket",
+        "use_delta",
+        "use_msgpack",
+        "use_compression",
+        "connection_type",
+        "send_timeout",
+        "max_stalled_sends",
+        "closed",
+        "num_coalesced",
+        "_outbound",
+        "_last_sent_version",
+        "_needs_snapshot",
+        "_updates_cursor",
+        "_static_version",
+        "_stalled_sends",
+        "_task",
+    )
+
+    def __init__(
+        self,
+        websocket_id: str,
+        websocket: WebSocket,
+        use_delta: bool = False,
+        use_msgpack: bool = False,
+        use_compression: bool = False,
+        connection_type: str | None = None,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        send_timeout: float = DEFAULT_SEND_TIMEOUT_SECONDS,
+        max_stalled_sends: int = DEFAULT_MAX_STALLED_SENDS,
+    ):
+        self.websocket_id = websocket_id
+        self.websocket = websocket
+        self.use_delta = use_delta
+        self.use_msgpack = use_msgpack
+        self.use_compression = use_compression
+        # looked up in every published state when it isn't known up front
+        self.connection_type = connection_type
+        self.send_timeout = send_timeout
+        self.max_stalled_sends = max_stalled_sends
+        self.closed = False
+        self.num_coalesced = 0
+
+        self._outbound = TypedQueue[PublishedState](maxsize=max_queue_size)
+        self._last_sent_version: int | None = None
+        self._needs_snapshot = True
+        # updates the client already has, only used for its next snapshot
+        self._updates_cursor: int | None = None
+        # static_version of the last static block the client got
+        self._static_version: int | None = None
+        self._stalled_sends = 0
+        self._task = asyncio.create_task(self._run())
+
+    def publish(self, published: PublishedState):
+        if self.closed:
+            return
+        try:
+            self._outbound.put_nowait(published)
+        except asyncio.QueueFull:
+            # client is behind, only the latest state matters
+            num_dropped = self._outbound.qsize()
+            while not self._outbound.empty():
+                self._outbound.get_nowait()
+            self.num_coalesced += num_dropped
+            COALESCED_STATES.inc(num_dropped)
+            self._outbound.put_nowait(published)
+
+    @property
+    def num_queued(self) -> int:
+        """States waiting to be sent."""
+        return self._outbound.qsize()
+
+    def resync(self, published: PublishedState, updates_cursor: int | None = None):
+        self._needs_snapshot = True
+        self._updates_cursor = updates_cursor
+        self.publish(published)
+
+    def _encode(self, published: PublishedState) -> str | bytes:
+        connection_type = self.connection_type or published.get_connection_type(
+            self.websocket_id
+        )
+        if self.use_msgpack:
+            return self._pack(published, connection_type)
+        if not self.use_delta:
+            return published.encode_full(connection_type)
+        if self._needs_snapshot or self._last_sent_version != published.version - 1:
+            return published.encode_snapshot(connection_type, self._updates_cursor)
+        return published.encode_patch(connection_type)
+
+    def _pack(self, published: PublishedState, connection_type: str) -> bytes:
+        with_static = self._static_version != published.static_version
+        if not self.use_delta:
+            return published.pack_full(connection_type, with_static)
+        if self._needs_snapshot or self._last_sent_version != published.version - 1:
+            return published.pack_snapshot(connection_type, self._updates_cursor)
+        return published.pack_patch(connection_type, with_static)
+
+    async def _run(self):
+        send_seconds = _SEND_SECONDS_BY_PROTOCOL[self.use_delta, self.use_msgpack]
+        sent_bytes = _SENT_BYTES_BY_ENCODING[self.use_msgpack]
+        while True:
+            published = await self._outbound.get()
+            if (
+                not self._needs_snapshot
+                and self._last_sent_version is not None
+                and published.version <= self._last_sent_version
+            ):
+                continue
+
+            try:
+                message = self._encode(published)
+                if self.use_compression:
+                    message = published.compress(message)
+                start = time.perf_counter()
+                # not wait_for, which can swallow the cancel from close() if the send
+                # finishes at the same time, leaving this task running
+                async with asyncio.timeout(self.send_timeout):
+                    if isinstance(message, bytes):
+                        await self.websocket.send_bytes(message)
+                    else:
+                        await self.websocket.send_text(message)
+            except TimeoutError:
+                SEND_TIMEOUTS.inc()
+                self._stalled_sends += 1
+                logger.warning(
+                    f"Send to {self.websocket_id} timed out ({self._stalled_sends}/{self.max_stalled_sends})"
+                )
+                if self._stalled_sends >= self.max_stalled_sends:
+                    await self._close_websocket(status.WS_1013_TRY_AGAIN_LATER)
+                    return
+                # we don't know what the client received, start again from a snapshot
+                self._needs_snapshot = True
+                self._static_version = None
+                if self._outbound.empty():
+                    self.publish(published)
+                continue
+            except Exception as e:
+                logger.info(f"Stopped sending to {self.websocket_id}: {e}")
+                self.closed = True
+                return
+            send_seconds.observe(time.perf_counter() - start)
+            # characters rather than bytes for JSON, which is nearly all ASCII
+            sent_bytes.inc(len(message))
+
+            self._stalled_sends = 0
+            self._needs_snapshot = False
+            self._updates_cursor = None
+            self._static_version = published.static_version
+            self._last_sent_version = published.version
+
+    async def _close_websocket(self, code: int):
+        self.closed = True
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def close(self, code: int = status.WS_1000_NORMAL_CLOSURE):
+        self._task.cancel()
+        await self._close_websocket(code)
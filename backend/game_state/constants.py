@@ -1,6 +1,10 @@
 INITIAL_GOLD = 5
+# players a game takes, bots included
+MAX_PLAYERS = 8
 DEFAULT_ROUND_TIME_SECONDS = 60
 DEFAULT_TRACK_LENGTH = 15
+# number of updates kept per game, older ones are dropped
+UPDATE_LOG_CAPACITY = 200
 
 FROG_NAMES = [
     "Sir Hoppington",
@@ -0,0 +1,80 @@
+from game_state.events import (
+    AddBotEvent,
+    BaseEvent,
+    EndGameEvent,
+    KickPlayerEvent,
+    LegBetEvent,
+    MoveFrogEvent,
+    OverallBetEvent,
+    PlayerJoinEvent,
+    SpectatorJoinEvent,
+    SpectatorLeaveEvent,
+    SpectatorTileEvent,
+    StartGameEvent,
+    UpdateGameSettingsEvent,
+)
+from game_state.state import GameState
+
+
+def apply_event(game_state: GameState, event: BaseEvent):
+    """
+    Applies one event to the game state with the game rules, synchronously and without any I/O.
+    Game runs every websocket event through this, and the headless driver uses it directly.
+    """
+    game_state.notify_turn = False
+    match event:
+        case PlayerJoinEvent():
+            if not game_state.is_full:
+                game_state.add_connection(event.websocket_id, "player", event.player_name)
+        case SpectatorJoinEvent():
+            game_state.add_connection(event.websocket_id, "spectator")
+        case SpectatorLeaveEvent():
+            game_state.remove_spectator(event.websocket_id)
+        case AddBotEvent():
+            # any client can send one, only the host fills its lobby with bots
+            if (
+                game_state.state == "lobby"
+                and game_state.is_host(event.websocket_id)
+                and not game_state.is_full
+            ):
+                game_state.add_bot(event.strength)
+        case KickPlayerEvent():
+            pass
+        case UpdateGameSettingsEvent():
+            pass
+        case StartGameEvent():
+            game_state.reset_game()
+            game_state.create_players()
+            game_state.create_track()
+            game_state.create_frogs()
+            game_state.start_game()
+            game_state.state = "game"
+        case MoveFrogEvent():
+            if game_state.check_turn(event.websocket_id):
+                game_state.move_frog(event.websocket_id)
+        case LegBetEvent():
+            # frog indices come straight from the client too
+            if game_state.check_turn(event.websocket_id) and game_state.can_make_leg_bet(
+                event.frog_idx
+            ):
+                game_state.make_leg_bet(event.websocket_id, event.frog_idx)
+        case OverallBetEvent():
+            if game_state.check_turn(event.websocket_id) and (
+                game_state.can_make_overall_bet(event.websocket_id, event.frog_idx)
+            ):
+                game_state.make_overall_bet(
+                    event.websocket_id, event.frog_idx, event.bet_type
+                )
+        case SpectatorTileEvent():
+            # the tile comes straight from the client, an invalid placement is ignored like
+            # an event out of turn rather than failing the game
+            if game_state.check_turn(event.websocket_id) and (
+                game_state.can_place_spectator_tile(event.websocket_id, event.tile_idx)
+            ):
+                game_state.place_spectator_tile(
+                    event.websocket_id,
+                    event.tile_idx,
+                    "forward" if event.displacement == 1 else "backward",
+                )
+        case EndGameEvent():
+            game_state.to_lobby()
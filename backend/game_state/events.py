@@ -1,6 +1,9 @@
-from typing import Literal
+from typing import Annotated, Literal, get_args
 from pydantic import BaseModel, Field, TypeAdapter
 
+# how well a server-side bot plays, see game_state/bots.py
+BotStrength = Literal["random", "greedy", "lookahead"]
+
 
 class BaseEvent(BaseModel):
     type: str = Field(..., description="Type of the event")
@@ -29,6 +32,17 @@ class SpectatorJoinEvent(BaseEvent):
     type: Literal["spectator_join"] = "spectator_join"
 
 
+class SpectatorLeaveEvent(BaseEvent):
+    type: Literal["spectator_leave"] = "spectator_leave"
+
+
+class AddBotEvent(BaseEvent):
+    type: Literal["add_bot"] = "add_bot"
+    strength: BotStrength = Field(
+        "greedy", description="How well the bot joining the game plays"
+    )
+
+
 class KickPlayerEvent(BaseEvent):
     type: Literal["kick_player"] = "kick_player"
     player_id: str = Field(
@@ -80,9 +94,11 @@ class EndGameEvent(BaseEvent):
     type: Literal["end_game"] = "end_game"
 
 
-Event = (
+EventUnion = (
     PlayerJoinEvent
     | SpectatorJoinEvent
+    | SpectatorLeaveEvent
+    | AddBotEvent
     | KickPlayerEvent
     | UpdateGameSettingsEvent
     | StartGameEvent
@@ -92,4 +108,8 @@ Event = (
     | SpectatorTileEvent
     | EndGameEvent
 )
+# tagged on `type`, so validation goes straight to the one model an event can be
+Event = Annotated[EventUnion, Field(discriminator="type")]
 EventAdapter = TypeAdapter(Event)
+# the `type` of every event, e.g. to label metrics with
+EVENT_TYPES = tuple(event.model_fields["type"].default for event in get_args(EventUnion))
@@ -1,27 +1,42 @@
 import asyncio
-from dataclasses import asdict, dataclass
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from functools import partial
+import heapq
 import logging
-import queue
+import multiprocessing
+from typing import Awaitable, Callable, Literal
 from fastapi import WebSocket
-from readerwriterlock import rwlock
-import threading
 import time
 
-from game_state.state import GameState
+from game_state.bots import Bot, make_bot
+from game_state.broadcast import ClientWriter
+from game_state.odds import LegOddsCalculator, LegSpec, calculate_leg_odds
+from game_state.race_odds import RaceOddsEstimator, RaceSpec
+from game_state.snapshot import PublishedState
+from game_state.spectators import (
+    DEFAULT_MAX_SPECTATORS,
+    DEFAULT_SPECTATOR_MAX_RATE,
+    SpectatorTier,
+)
+from game_state.stream import FrameBuffer
+from game_state.state import Connection, GameState
+from game_state.engine import apply_event
+from game_state.wal import WriteAheadLog
 from game_state.events import (
+    EVENT_TYPES,
     BaseEvent,
-    EndGameEvent,
-    KickPlayerEvent,
-    LegBetEvent,
     MoveFrogEvent,
-    OverallBetEvent,
-    PlayerJoinEvent,
-    SpectatorJoinEvent,
+    SpectatorLeaveEvent,
     SpectatorTileEvent,
     StartGameEvent,
-    UpdateGameSettingsEvent,
 )
+from utils.expiry import ExpiryHeap
+from utils.memory import deep_sizeof
+from utils.metrics import Counter, Gauge, Histogram
+from utils.profiling import tag_work, untag_work
 from utils.queue import TypedQueue
+from utils.sharding import shard_for
 
 
 logging.basicConfig(
@@ -29,170 +44,829 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+EVENTS_PER_BROADCAST = Histogram(
+    "leapfrog_events_per_broadcast",
+    "Events applied per game state broadcast, its sum and count are the events and broadcasts",
+    labelnames=("mode",),
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100),
+)
+EVENT_LATENCY = Histogram(
+    "leapfrog_event_latency_seconds",
+    "Time from an event being queued to the game state with it being published to its websockets",
+    labelnames=("mode",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+BOT_DECISION_SECONDS = Histogram(
+    "leapfrog_bot_decision_seconds",
+    "Time a server-side bot takes to choose its action, on the event loop",
+    labelnames=("strength",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05),
+)
+PROCESS_EVENT_SECONDS = Histogram(
+    "leapfrog_process_event_seconds",
+    "Time to log and apply one event to its game state",
+    labelnames=("type",),
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
+UPDATE_ODDS_SECONDS = Histogram(
+    "leapfrog_update_odds_seconds",
+    "Time to recompute the leg odds after the events of a batch, when done on the event loop",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+SERIALIZE_SECONDS = Histogram(
+    "leapfrog_serialize_seconds",
+    "Time to encode a new game state and its patch for publishing",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+BROADCAST_FANOUT = Histogram(
+    "leapfrog_broadcast_fanout",
+    "Websockets a new game state is published to",
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+PURGE_SECONDS = Histogram(
+    "leapfrog_purge_seconds",
+    "Time a pass over the idle games takes, including stopping the ones that expired",
+    buckets=(0.0001, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+PURGED_GAMES = Counter("leapfrog_purged_games_total", "Idle games purged")
+# the gauges below are set by GameManager.collect_metrics
+GAMES = Gauge("leapfrog_games", "Games by state", labelnames=("state",))
+CONNECTIONS = Gauge(
+    "leapfrog_connections", "Websockets by the state of their game", labelnames=("state",)
+)
+QUEUED_EVENTS = Gauge("leapfrog_queued_events", "Events waiting to be applied, in all games")
+EVENT_QUEUE_DEPTH = Gauge(
+    "leapfrog_event_queue_depth",
+    "Events waiting to be applied, in the games with the most of them",
+    labelnames=("game_code",),
+)
+QUEUED_STATES = Gauge(
+    "leapfrog_queued_states", "Game states waiting to be sent, to all websockets"
+)
+OUTBOUND_QUEUE_DEPTH = Gauge(
+    "leapfrog_outbound_queue_depth",
+    "Game states waiting to be sent to the websockets of a game, in the games with the most of them",
+    labelnames=("game_code",),
+)
+# bound once, so timing an event doesn't build a label tuple
+_PROCESS_EVENT_SECONDS_BY_TYPE = {
+    event_type: PROCESS_EVENT_SECONDS.labels(event_type) for event_type in EVENT_TYPES
+}
+
+GAME_STATES = ("lobby", "game", "ended")
+# games the per-game queue depth gauges are reported for
+METRICS_TOP_GAMES = 10
+
+# seconds a server-side bot waits before taking its turn, so people can follow along
+DEFAULT_BOT_DELAY = 1.0
+
+
+@dataclass(frozen=True, slots=True)
+class EventBatching:
+    """
+    How Game.run turns queued events into broadcasts.
+
+    "event": applies and publishes one event at a time.
+    "tick": waits for the end of the current tick, then applies every queued event and
+        publishes once, so a game broadcasts at most once every `tick_interval` seconds.
+    "adaptive": publishes at once when the game has been idle for a tick, and otherwise holds
+        the events until a tick after its last broadcast, so bursts are coalesced.
+    """
+
+    mode: Literal["event", "tick", "adaptive"] = "event"
+    tick_interval: float = 0.05
+
+    def __post_init__(self):
+        if self.mode not in ("event", "tick", "adaptive"):
+            raise ValueError(f"Unknown event batching mode {self.mode}")
+        if self.tick_interval <= 0:
+            raise ValueError("The tick interval must be positive")
+
 
 class Game:
+    __slots__ = (
+        "game_code",
+        "_game_state",
+        "_start_time",
+        "_last_update_time",
+        "_last_push_time",
+        "event_queue",
+        "_publish",
+        "_race_odds_estimator",
+        "_race_odds_task",
+        "_leg_odds_calculator",
+        "_leg_odds_task",
+        "_wal",
+        "_batching",
+        "_bots",
+        "_bot_delay",
+        "_bot_task",
+    )
+
     def __init__(
         self,
         game_code: str,
         initial_state: GameState,
-        state_update_queue: TypedQueue[GameState],
+        publish: Callable[[GameState], Awaitable[None]],
+        race_odds_estimator: RaceOddsEstimator | None = None,
+        wal: WriteAheadLog | None = None,
+        batching: EventBatching | None = None,
+        bot_delay: float = DEFAULT_BOT_DELAY,
+        leg_odds_calculator: LegOddsCalculator | None = None,
     ):
         self.game_code = game_code
         self._game_state: GameState = initial_state
         self._start_time = time.time()
         self._last_update_time = self._start_time
-        self.event_queue = TypedQueue[BaseEvent]()
-        self._state_update_queue = state_update_queue
+        # perf_counter time of the last broadcast of an event batch
+        self._last_push_time = float("-inf")
+        # events with the perf_counter time they were queued at
+        self.event_queue = TypedQueue[tuple[BaseEvent, float]]()
+        # publishes a new state of the game straight to its subscribers
+        self._publish = publish
+        self._race_odds_estimator = race_odds_estimator
+        self._race_odds_task: asyncio.Task | None = None
+        # without one, leg odds are always calculated inline
+        self._leg_odds_calculator = leg_odds_calculator
+        self._leg_odds_task: asyncio.Task | None = None
+        self._wal = wal
+        self._batching = batching or EventBatching()
+        # the bots of the players the server plays by websocket id, created on their first turn
+        self._bots: dict[str, Bot] | None = None
+        self._bot_delay = bot_delay
+        self._bot_task: asyncio.Task | None = None
 
-    async def process_event(self, event: BaseEvent):
-        self._game_state.notify_turn = False
-        match event:
-            case PlayerJoinEvent():
-                self._game_state.add_connection(
-                    event.websocket_id, "player", event.player_name
-                )
-            case SpectatorJoinEvent():
-                self._game_state.add_connection(event.websocket_id, "spectator")
-            case KickPlayerEvent():
-                pass
-            case UpdateGameSettingsEvent():
-                pass
-            case StartGameEvent():
-                self._game_state.reset_game()
-                self._game_state.create_players()
-                self._game_state.create_track()
-                self._game_state.create_frogs()
-                self._game_state.start_game()
-                self._game_state.state = "game"
-            case MoveFrogEvent():
-                if self._game_state.check_turn(event.websocket_id):
-                    self._game_state.move_frog(event.websocket_id)
-            case LegBetEvent():
-                if self._game_state.check_turn(event.websocket_id):
-                    self._game_state.make_leg_bet(event.websocket_id, event.frog_idx)
-            case OverallBetEvent():
-                if self._game_state.check_turn(event.websocket_id):
-                    self._game_state.make_overall_bet(
-                        event.websocket_id, event.frog_idx, event.bet_type
-                    )
-            case SpectatorTileEvent():
-                if self._game_state.check_turn(event.websocket_id):
-                    self._game_state.place_spectator_tile(
-                        event.websocket_id,
-                        event.tile_idx,
-                        "forward" if event.displacement == 1 else "backward",
-                    )
-            case EndGameEvent():
-                self._game_state.to_lobby()
+    async def add_event(self, event: BaseEvent):
+        await self.event_queue.put((event, time.perf_counter()))
+
+    async def process_event(self, event: BaseEvent, replay: bool = False):
+        """
+        Applies an event and publishes the new state.
+        With `replay`, the event is being recovered from the write-ahead log, so it isn't
+        logged again and nothing is published.
+        """
+        if replay:
+            self._apply_event(event, log=False)
+            self._last_update_time = time.time()
+        else:
+            await self.process_events([event])
+
+    async def process_events(self, events: list[BaseEvent]):
+        """
+        Applies events in order and publishes the resulting state once. An event that fails
+        to apply is logged and left out, the rest of the batch still applies.
+        """
+        notify_turn = False
+        odds_changed = False
+        try:
+            for event in events:
+                tag_work(game_code=self.game_code, event_type=event.type)
+                try:
+                    odds_changed |= self._apply_event(event)
+                except Exception:
+                    logger.exception(f"Failed to apply {event.type} in game {self.game_code}")
+                    continue
+                # every event resets notify_turn, keep a turn change from earlier in the batch
+                notify_turn |= self._game_state.notify_turn
+            self._game_state.notify_turn = notify_turn
+            if odds_changed:
+                tag_work(game_code=self.game_code)
+                self.update_odds()
+        finally:
+            untag_work()
 
         self._last_update_time = time.time()
         await self.push_game_state()
+        self._start_bot_turn()
+
+    def _apply_event(self, event: BaseEvent, log: bool = True) -> bool:
+        """
+        Applies and logs one event. Returns whether the event can change the odds.
+        An event is only logged once it applied, so recovery never replays one that failed.
+        """
+        start = time.perf_counter()
+        apply_event(self._game_state, event)
+        if self._wal is not None and log:
+            self._wal.append(self.game_code, event)
+        _PROCESS_EVENT_SECONDS_BY_TYPE[event.type].observe(time.perf_counter() - start)
+
+        match event:
+            case StartGameEvent() | MoveFrogEvent() | SpectatorTileEvent():
+                # only frog moves and spectator tiles change the odds
+                return True
+        return False
+
+    def update_odds(self):
+        """
+        Recomputes the leg odds and starts estimating the race odds of the current position.
+        Leg odds too slow to calculate inline are left empty until the process pool is done
+        with them, and published then.
+        """
+        self._cancel_leg_odds()
+        game_state = self._game_state
+        calculator = self._leg_odds_calculator
+        if (
+            calculator is None
+            or game_state.state != "game"
+            or calculator.is_inline(game_state)
+        ):
+            start = time.perf_counter()
+            game_state.leg_odds = calculate_leg_odds(game_state)
+            UPDATE_ODDS_SECONDS.observe(time.perf_counter() - start)
+        else:
+            # the previous position's odds would be wrong in the meantime
+            game_state.leg_odds = []
+            self._leg_odds_task = asyncio.create_task(
+                self._update_leg_odds(LegSpec.from_game_state(game_state))
+            )
+        self._start_race_odds()
+
+    def _cancel_leg_odds(self):
+        if self._leg_odds_task is not None:
+            self._leg_odds_task.cancel()
+            self._leg_odds_task = None
+
+    async def _update_leg_odds(self, spec: LegSpec):
+        try:
+            leg_odds = await self._leg_odds_calculator.calculate(spec)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"Failed to calculate leg odds in game {self.game_code}")
+            return
+        self._game_state.leg_odds = leg_odds
+        self._leg_odds_task = None
+        await self.push_game_state()
+
+    def _start_race_odds(self):
+        """
+        Replaces any running race odds estimate with one for the current position.
+        The old odds stay published until the new estimate is done.
+        """
+        self._cancel_race_odds()
+        if self._race_odds_estimator is None or self._game_state.state != "game":
+            return
+        # taken now, so the estimate is for this position even if the task starts later
+        spec = RaceSpec.from_game_state(self._game_state)
+        self._race_odds_task = asyncio.create_task(self._update_race_odds(spec))
+
+    def _cancel_race_odds(self):
+        if self._race_odds_task is not None:
+            self._race_odds_task.cancel()
+            self._race_odds_task = None
+
+    async def _update_race_odds(self, spec: RaceSpec):
+        try:
+            race_odds = await self._race_odds_estimator.estimate(spec)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"Failed to estimate race odds in game {self.game_code}")
+            return
+        self._game_state.race_odds = race_odds
+        await self.push_game_state()
+
+    def _start_bot_turn(self):
+        """Starts the turn of the player to move if the server plays them."""
+        game_state = self._game_state
+        if game_state.state != "game" or self._bot_task is not None:
+            return
+        connection = game_state.players[game_state.current_turn].connection
+        if connection.bot_strength is None:
+            return
+        self._bot_task = asyncio.create_task(
+            self._play_bot_turn(connection, game_state.turn_number)
+        )
+
+    async def _play_bot_turn(self, connection: Connection, turn_number: int):
+        """
+        Queues the bot's action like any other player's event, so it is logged, batched and
+        published the same way, and replaying the log doesn't need the bot.
+        """
+        try:
+            await asyncio.sleep(self._bot_delay)
+            if self._leg_odds_task is not None:
+                # rather than the bot calculating the same leg odds again on the event loop
+                await asyncio.wait([self._leg_odds_task])
+            game_state = self._game_state
+            player_id = game_state._get_player_id(connection.websocket_id)
+            if (
+                game_state.state != "game"
+                or game_state.current_turn != player_id
+                or game_state.turn_number != turn_number
+            ):
+                # the game moved on while the bot waited, e.g. it was ended
+                return
+
+            if self._bots is None:
+                self._bots = {}
+            bot = self._bots.get(connection.websocket_id)
+            if bot is None:
+                bot = self._bots[connection.websocket_id] = make_bot(
+                    connection.bot_strength
+                )
+            start = time.perf_counter()
+            try:
+                event = bot.choose_event(game_state, connection.websocket_id)
+            except Exception:
+                # moving a frog is always allowed, so a broken bot can't stall the game
+                logger.exception(f"Bot failed to choose an event in game {self.game_code}")
+                event = MoveFrogEvent(
+                    game_code=self.game_code, websocket_id=connection.websocket_id
+                )
+            BOT_DECISION_SECONDS.labels(connection.bot_strength).observe(
+                time.perf_counter() - start
+            )
+        finally:
+            if self._bot_task is asyncio.current_task():
+                self._bot_task = None
+        await self.add_event(event)
+
+    def _cancel_bot_turn(self):
+        if self._bot_task is not None:
+            self._bot_task.cancel()
+            self._bot_task = None
 
     async def push_game_state(self):
-        logger.info(f"Updating game state: ${self.game_code}")
-        await self._state_update_queue.put(self._game_state)
+        logger.info(f"Updating game state: {self.game_code}")
+        await self._publish(self._game_state)
+
+    def _drain_events(self, batch: list[tuple[BaseEvent, float]]):
+        while self.event_queue:
+            batch.append(self.event_queue.get_nowait())
+
+    async def _next_batch(self) -> list[tuple[BaseEvent, float]]:
+        """Waits for the next events to apply together, as configured by the event batching."""
+        batch = [await self.event_queue.get()]
+        mode, tick_interval = self._batching.mode, self._batching.tick_interval
+        if mode == "event":
+            return batch
+
+        now = time.perf_counter()
+        if mode == "tick":
+            delay = tick_interval - now % tick_interval
+        else:
+            # nothing to wait for if the last broadcast was over a tick ago
+            delay = self._last_push_time + tick_interval - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._drain_events(batch)
+        return batch
 
     async def run(self):
-        while True:
-            try:
-                event = await self.event_queue.get()
-                logger.info(f"Event ${event.type} received in game ${self.game_code}")
-                await self.process_event(event)
-            except queue.Empty:
-                continue
+        mode = self._batching.mode
+        events_per_broadcast = EVENTS_PER_BROADCAST.labels(mode)
+        event_latency = EVENT_LATENCY.labels(mode)
+        # a recovered game may be waiting on a bot
+        self._start_bot_turn()
+        try:
+            while True:
+                batch = await self._next_batch()
+                for event, _ in batch:
+                    logger.info(f"Event {event.type} received in game {self.game_code}")
+                try:
+                    await self.process_events([event for event, _ in batch])
+                except Exception:
+                    # e.g. publishing failed, the game carries on with its next events
+                    logger.exception(f"Failed to process events in game {self.game_code}")
+
+                self._last_push_time = pushed_at = time.perf_counter()
+                events_per_broadcast.observe(len(batch))
+                for _, queued_at in batch:
+                    event_latency.observe(pushed_at - queued_at)
+        finally:
+            self._cancel_leg_odds()
+            self._cancel_race_odds()
+            self._cancel_bot_turn()
+
+
+DEFAULT_NUM_LOCK_SHARDS = 64
 
 
 class GameManager:
     """
     Thread-safe state manager for handling shared state in game.
+
+    Lookups and add_event never take a lock: the registry dicts are only mutated by code running
+    on the event loop, so a read between two awaits always sees a consistent view.
+    Registry writes (creating, purging, publishing, adding websockets) take the lock of the game's
+    shard, so they only ever wait behind writes to games in the same shard.
+
+    Idle games are found through a heap of games by last activity, so a purge only looks at the
+    games that could have expired, never at all of them.
     """
 
-    def __init__(self):
-        self.lock = asyncio.Lock()
-        self._state_update_queue = TypedQueue[GameState]()
+    def __init__(
+        self,
+        num_lock_shards: int = DEFAULT_NUM_LOCK_SHARDS,
+        race_odds_workers: int | None = None,
+        wal: WriteAheadLog | None = None,
+        batching: EventBatching | None = None,
+        bot_delay: float = DEFAULT_BOT_DELAY,
+        spectator_max_rate: float = DEFAULT_SPECTATOR_MAX_RATE,
+        max_spectators: int = DEFAULT_MAX_SPECTATORS,
+    ):
+        self._locks = [asyncio.Lock() for _ in range(num_lock_shards)]
         self._games: dict[str, Game] = {}
         self._game_tasks: dict[str, asyncio.Task] = {}
         self._game_states: dict[str, GameState] = {}
-        self._websockets: dict[str, dict[str, WebSocket]] = {}
+        # players' websockets, spectators' are in their game's SpectatorTier
+        self._websockets: dict[str, dict[str, ClientWriter]] = {}
+        self._spectator_tiers: dict[str, SpectatorTier] = {}
+        # SSE frames of the games someone has watched through /stream since they were created
+        self._frame_buffers: dict[str, FrameBuffer] = {}
+        self._published_states: dict[str, PublishedState] = {}
+        # games by their last activity as of when they were scheduled. Activity doesn't touch
+        # the heap, a game that was active since is scheduled again when its entry comes up.
+        self._idle_games = ExpiryHeap[str]()
+        # worker processes are only started once the first estimate is submitted. They are
+        # spawned, a forked worker would inherit every socket open by then and keep it from
+        # closing when the server closes it.
+        self._race_odds_executor = ProcessPoolExecutor(
+            max_workers=race_odds_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._race_odds_estimator = RaceOddsEstimator(self._race_odds_executor)
+        self._leg_odds_calculator = LegOddsCalculator(self._race_odds_executor)
+        self._wal = wal
+        self._batching = batching or EventBatching()
+        self._bot_delay = bot_delay
+        self._spectator_max_rate = spectator_max_rate
+        self._max_spectators = max_spectators
+
+    def shutdown(self):
+        self._race_odds_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _lock_for(self, game_code: str) -> asyncio.Lock:
+        return self._locks[shard_for(game_code, len(self._locks))]
 
     async def create_game_state(self, game_code: str) -> bool:
-        async with self.lock:
+        async with self._lock_for(game_code):
             if game_code in self._game_tasks:
                 return False
 
             initial_state = GameState(game_code=game_code)
-            self._game_states[game_code] = initial_state
-            self._websockets[game_code] = {}
+            if self._wal is not None:
+                self._wal.create(game_code, initial_state.seed)
+            self._add_game(self._make_game(initial_state))
+            return True
 
-            game = Game(game_code, initial_state, self._state_update_queue)
-            game_task = asyncio.create_task(game.run())
+    def _make_game(self, initial_state: GameState) -> Game:
+        return Game(
+            initial_state.game_code,
+            initial_state,
+            self._publish,
+            self._race_odds_estimator,
+            self._wal,
+            self._batching,
+            self._bot_delay,
+            self._leg_odds_calculator,
+        )
 
-            self._game_tasks[game_code] = game_task
-            self._games[game_code] = game
-            return True
+    def _add_game(self, game: Game):
+        """
+        This should always be called while holding the lock of the game's shard.
+        """
+        game_code = game.game_code
+        game_state = game._game_state
+        self._game_states[game_code] = game_state
+        self._websockets[game_code] = {}
+        tier = self._spectator_tiers[game_code] = SpectatorTier(
+            self._spectator_max_rate,
+            self._max_spectators,
+            on_leave=partial(self._remove_spectator, game_code),
+        )
+        # spectators of a recovered game get the same time to reconnect as any other
+        for websocket_id in game_state.spectators:
+            tier.hold(websocket_id)
+        self._published_states[game_code] = PublishedState.initial(game_state)
+        self._game_tasks[game_code] = asyncio.create_task(game.run())
+        self._games[game_code] = game
+        self._idle_games.schedule(game_code, game._last_update_time)
+
+    async def recover_games(self) -> int:
+        """
+        Rebuilds every game in the write-ahead log by replaying its events, e.g. after a restart.
+        Players keep their websocket ids, so their clients can simply reconnect.
+        Returns the number of games recovered.
+        """
+        if self._wal is None:
+            return 0
+
+        num_recovered = 0
+        for recovered in await asyncio.to_thread(self._wal.recover):
+            game_code = recovered.game_code
+            game = self._make_game(GameState(game_code=game_code, seed=recovered.seed))
+            for event in recovered.events:
+                try:
+                    await game.process_event(event, replay=True)
+                except Exception:
+                    # the live game hit the same error, carry on with its later events
+                    logger.exception(f"Failed to replay {event.type} in game {game_code}")
+
+            game.update_odds()
+
+            async with self._lock_for(game_code):
+                if game_code in self._games:
+                    game._cancel_leg_odds()
+                    game._cancel_race_odds()
+                    continue
+                self._add_game(game)
+            num_recovered += 1
+
+        logger.info(f"Recovered {num_recovered} game(s) from the write-ahead log")
+        return num_recovered
 
     async def get_game_state(self, game_code: str) -> GameState | None:
-        async with self.lock:
-            state = self._game_states.get(game_code, None)
-            if state is None:
-                return None
-            return state
+        return self._game_states.get(game_code, None)
+
+    async def get_published_state(self, game_code: str) -> PublishedState | None:
+        return self._published_states.get(game_code, None)
 
     async def add_websocket(
-        self, game_code: str, websocket_id: str, websocket: WebSocket
+        self,
+        game_code: str,
+        websocket_id: str,
+        websocket: WebSocket,
+        use_delta: bool = False,
+        updates_cursor: int | None = None,
+        use_msgpack: bool = False,
+        use_compression: bool = False,
     ) -> bool:
-        async with self.lock:
+        """
+        Registers a websocket and sends it the current state. Returns False if the game doesn't
+        exist, or if the websocket is a spectator's and the game's spectators are at capacity.
+        """
+        async with self._lock_for(game_code):
             if game_code not in self._websockets:
                 return False
-            self._websockets[game_code][websocket_id] = websocket
-            return True
+            tier = self._spectator_tiers[game_code]
+            is_spectator = (
+                websocket_id in tier
+                or websocket_id in self._game_states[game_code].spectators
+            )
+            if is_spectator:
+                writers = tier.writers
+                if not tier.admit(websocket_id):
+                    return False
+            else:
+                writers = self._websockets[game_code]
+            previous_writer = writers.get(websocket_id)
+            writer = ClientWriter(
+                websocket_id,
+                websocket,
+                use_delta,
+                use_msgpack,
+                use_compression,
+                connection_type="spectator" if is_spectator else None,
+            )
+            writers[websocket_id] = writer
+            # new connections start with the last published version
+            writer.resync(self._published_states[game_code], updates_cursor)
+
+        if previous_writer is not None and previous_writer.websocket is not websocket:
+            await previous_writer.close()
+        return True
+
+    async def reserve_spectator(self, game_code: str, websocket_id: str) -> bool:
+        """
+        Registers a spectator before its join event is applied, so its websocket goes to the
+        spectator tier. Returns False if the game doesn't exist or its spectators are at capacity.
+        """
+        tier = self._spectator_tiers.get(game_code)
+        return tier is not None and tier.reserve(websocket_id)
+
+    async def _remove_spectator(self, game_code: str, websocket_id: str):
+        """Removes a spectator whose place in the spectator tier ran out from its game."""
+        await self.add_event(
+            SpectatorLeaveEvent(gameCode=game_code, websocket_id=websocket_id)
+        )
+
+    def get_frame_buffer(self, game_code: str) -> FrameBuffer | None:
+        """The game's SSE frame buffer, started at its last published version on first use."""
+        if game_code not in self._published_states:
+            return None
+        buffer = self._frame_buffers.get(game_code)
+        if buffer is None:
+            buffer = FrameBuffer(self._published_states[game_code])
+            self._frame_buffers[game_code] = buffer
+        return buffer
+
+    def _get_writer(self, game_code: str, websocket_id: str) -> ClientWriter | None:
+        writer = self._websockets.get(game_code, {}).get(websocket_id)
+        if writer is None and game_code in self._spectator_tiers:
+            writer = self._spectator_tiers[game_code].writers.get(websocket_id)
+        return writer
+
+    async def resync_websocket(
+        self, game_code: str, websocket_id: str, updates_cursor: int | None = None
+    ) -> bool:
+        writer = self._get_writer(game_code, websocket_id)
+        if writer is None:
+            return False
+        writer.resync(self._published_states[game_code], updates_cursor)
+        return True
 
     async def remove_websocket(self, game_code: str, websocket_id: str):
-        async with self.lock:
+        async with self._lock_for(game_code):
             if game_code not in self._websockets:
                 return False
-            if websocket_id not in self._websockets[game_code]:
+            writer = self._websockets[game_code].pop(websocket_id, None)
+            if writer is None:
+                writer = self._spectator_tiers[game_code].writers.pop(websocket_id, None)
+            if writer is None:
                 return False
-            del self._websockets[game_code][websocket_id]
-            return True
 
-    async def is_websocket_exist(self, game_code: str, websocket_id: str):
-        async with self.lock:
-            if game_code not in self._websockets:
+        await writer.close()
+        return True
+
+    async def release_websocket(
+        self, game_code: str, websocket_id: str, websocket: WebSocket
+    ) -> bool:
+        """
+        Called once a websocket is closed. A spectator's writer is dropped, unless the spectator
+        already reconnected on a new websocket, and its place is only kept for it to reconnect
+        for a while. Players' writers are kept, they are how a rejoining player is recognised.
+        """
+        async with self._lock_for(game_code):
+            tier = self._spectator_tiers.get(game_code)
+            if tier is None:
+                return False
+            writer = tier.writers.get(websocket_id)
+            if writer is None or writer.websocket is not websocket:
                 return False
-            return websocket_id in self._websockets[game_code]
+            del tier.writers[websocket_id]
+            tier.hold(websocket_id)
+
+        await writer.close()
+        return True
+
+    async def is_websocket_exist(self, game_code: str, websocket_id: str):
+        if game_code not in self._websockets:
+            return False
+        return (
+            websocket_id in self._websockets[game_code]
+            or websocket_id in self._spectator_tiers[game_code]
+            or websocket_id in self._game_states[game_code].spectators
+        )
 
     async def add_event(self, event: BaseEvent) -> bool:
-        async with self.lock:
-            game = self._games.get(event.game_code)
+        game = self._games.get(event.game_code)
+        if game is None:
+            return False
+        await game.add_event(event)
+        return True
+
+    async def _purge_game(
+        self, game_code: str, idle_since: float | None = None
+    ) -> bool:
+        """
+        Removes a game from the registry, then stops it and closes its websockets concurrently
+        outside the lock. With `idle_since`, the game is only purged if it has had no activity
+        since then. Returns whether the game was purged.
+        """
+        async with self._lock_for(game_code):
+            game = self._games.get(game_code)
             if game is None:
                 return False
-            await game.event_queue.put(event)
-            return True
+            if idle_since is not None and game._last_update_time >= idle_since:
+                # an event came in while we waited for the lock
+                self._idle_games.schedule(game_code, game._last_update_time)
+                return False
 
-    async def _purge_game(self, game_code: str) -> None:
+            logger.info(f"Purging game {game_code}")
+            game_task = self._game_tasks.pop(game_code)
+            del self._game_states[game_code]
+            writers = self._websockets.pop(game_code)
+            tier = self._spectator_tiers.pop(game_code)
+            frame_buffer = self._frame_buffers.pop(game_code, None)
+            del self._published_states[game_code]
+            del self._games[game_code]
+            self._idle_games.discard(game_code)
+            if self._wal is not None:
+                self._wal.remove(game_code)
+
+        logger.info(f"Stopping game task {game_code}")
+        game_task.cancel()
+        if frame_buffer is not None:
+            frame_buffer.close()
+        logger.info(f"Closing web sockets in game {game_code}")
+        await asyncio.gather(
+            *(writer.close() for writer in writers.values()), tier.close()
+        )
+        logger.info(f"Purged game {game_code}")
+        return True
+
+    async def _purge_games(self, inactive_threshold: float) -> int:
+        """Purges every game that has been idle for `inactive_threshold` seconds. Returns how many."""
+        start = time.perf_counter()
+        idle_since = time.time() - inactive_threshold
+        expired = []
+        for game_code in self._idle_games.pop_due(idle_since):
+            game = self._games.get(game_code)
+            if game is None:
+                continue
+            if game._last_update_time >= idle_since:
+                # active since it was scheduled, check again once it could have been idle long enough
+                self._idle_games.schedule(game_code, game._last_update_time)
+                continue
+            expired.append(game_code)
+
+        purged = await asyncio.gather(
+            *(self._purge_game(game_code, idle_since) for game_code in expired)
+        )
+        num_purged = sum(purged)
+        PURGED_GAMES.inc(num_purged)
+        PURGE_SECONDS.observe(time.perf_counter() - start)
+        return num_purged
+
+    def collect_metrics(self, top_games: int = METRICS_TOP_GAMES):
         """
-        This should always be called under a function that has a write lock to the GameManager.
+        Sets the gauges that are read off the registry instead of being kept up to date on the
+        hot path. It walks every game, so it is meant to be called once per scrape.
         """
-        logger.info(f"Stopping game task ${game_code}")
-        game_task = self._game_tasks[game_code]
-        game_task.cancel()
-        logger.info(f"Purging game ${game_code}")
-        del self._game_tasks[game_code]
-        del self._game_states[game_code]
-        logger.info(f"Closing web sockets in game ${game_code}")
-        websockets = self._websockets[game_code]
-        for ws in websockets.values():
-            await ws.close()
-        del self._games[game_code]
-        logger.info(f"Purged game ${game_code}")
-
-    async def _purge_games(self, inactive_threshold: float) -> None:
-        async with self.lock:
-            current_time = time.time()
-            for game_code, game_object in list(self._games.items()):
-                if game_object._last_update_time < current_time - inactive_threshold:
-                    await self._purge_game(game_code)
+        num_games = dict.fromkeys(GAME_STATES, 0)
+        num_connections = dict.fromkeys(GAME_STATES, 0)
+        num_queued_events = num_queued_states = 0
+        event_queue_depths = []
+        outbound_queue_depths = []
+        for game_code, game in self._games.items():
+            state = self._game_states[game_code].state
+            writers = [
+                *self._websockets[game_code].values(),
+                *self._spectator_tiers[game_code].writers.values(),
+            ]
+            num_games[state] += 1
+            num_connections[state] += sum(not writer.closed for writer in writers)
+            if game.event_queue:
+                event_queue_depths.append((len(game.event_queue), game_code))
+                num_queued_events += len(game.event_queue)
+            num_queued = sum(writer.num_queued for writer in writers)
+            if num_queued:
+                outbound_queue_depths.append((num_queued, game_code))
+                num_queued_states += num_queued
+
+        for state in GAME_STATES:
+            GAMES.labels(state).set(num_games[state])
+            CONNECTIONS.labels(state).set(num_connections[state])
+        QUEUED_EVENTS.set(num_queued_events)
+        QUEUED_STATES.set(num_queued_states)
+        for gauge, depths in (
+            (EVENT_QUEUE_DEPTH, event_queue_depths),
+            (OUTBOUND_QUEUE_DEPTH, outbound_queue_depths),
+        ):
+            # games that drained since the last scrape shouldn't linger
+            gauge.clear()
+            for depth, game_code in heapq.nlargest(top_games, depths):
+                gauge.labels(game_code).set(depth)
+
+    async def memory_report(self, sample: int | None = None) -> dict:
+        """
+        Approximate bytes retained per game, averaged over up to `sample` games and broken down
+        by component. Objects shared between games are only counted once, under `shared_bytes`.
+
+        The walk yields to the event loop after every game, so that a report over many games
+        doesn't hold up the others; games purged in the meantime are left out.
+        """
+        game_codes = list(self._games)[:sample]
+        seen: set[int] = set()
+        shared_bytes = deep_sizeof(
+            [self._locks, self._race_odds_estimator, self._idle_games], seen
+        )
+
+        components: dict[str, int] = {}
+
+        def add(name: str, obj):
+            components[name] = components.get(name, 0) + deep_sizeof(obj, seen)
+
+        num_sampled = 0
+        for game_code in game_codes:
+            await asyncio.sleep(0)
+            if game_code not in self._games:
+                continue
+            num_sampled += 1
+            game_state = self._game_states[game_code]
+            for f in fields(game_state):
+                add(f"game_state.{f.name}", getattr(game_state, f.name))
+            add("game_state", game_state)
+            add("published_state", self._published_states[game_code])
+            add("game", self._games[game_code])
+            add("game_task", self._game_tasks[game_code])
+            add("websockets", self._websockets[game_code])
+            add("spectator_tier", self._spectator_tiers[game_code])
+            add("frame_buffer", self._frame_buffers.get(game_code))
+
+        return {
+            "num_games": len(self._games),
+            "num_sampled_games": num_sampled,
+            "bytes_per_game": sum(components.values()) / max(num_sampled, 1),
+            "shared_bytes": shared_bytes,
+            "components": {
+                name: total / max(num_sampled, 1)
+                for name, total in sorted(
+                    components.items(), key=lambda item: item[1], reverse=True
+                )
+            },
+        }
 
     async def purge_games(
         self, interval: int = 5 * 60, inactive_threshold: float = 60 * 60
@@ -201,24 +875,37 @@ class GameManager:
             await self._purge_games(inactive_threshold)
             await asyncio.sleep(interval)
 
-    async def run(self):
-        while True:
-            await asyncio.sleep(0.01)
+    async def _publish(self, new_state: GameState):
+        """
+        Publishes a new state of a game to its websockets. Every game calls this from its own task
+        as soon as it has a new state, so games never wait on each other to publish.
+        """
+        async with self._lock_for(new_state.game_code):
+            game_code = new_state.game_code
+            if game_code not in self._published_states:
+                # game was purged while we waited for the lock
+                return
+            self._game_states[game_code] = new_state
+            writers = list(self._websockets[game_code].values())
+            start = time.perf_counter()
+            tag_work(game_code=game_code)
             try:
-                new_state = await self._state_update_queue.get()
-                async with self.lock:
-                    self._game_states[new_state.game_code] = new_state
-                    websockets = self._websockets.get(new_state.game_code, {})
-                    for websocket_id, websocket in websockets.items():
-                        try:
-                            print(
-                                "websocket response: ",
-                                new_state.make_websocket_response(websocket_id),
-                            )
-                            await websocket.send_json(
-                                new_state.make_websocket_response(websocket_id)
-                            )
-                        except Exception:
-                            continue
-            except queue.Empty:
-                continue
+                # spectators' writers pack lazily, once per sampled state
+                published = self._published_states[game_code].next(
+                    new_state, pack=any(writer.use_msgpack for writer in writers)
+                )
+            finally:
+                untag_work()
+            SERIALIZE_SECONDS.observe(time.perf_counter() - start)
+            self._published_states[game_code] = published
+            tier = self._spectator_tiers[game_code]
+            frame_buffer = self._frame_buffers.get(game_code)
+
+        BROADCAST_FANOUT.observe(len(writers))
+        # writers send on their own tasks, so no network I/O happens under the lock
+        for writer in writers:
+            writer.publish(published)
+        # the players' writers are handed the state first, spectators get it at their own rate
+        tier.publish(published)
+        if frame_buffer is not None:
+            frame_buffer.publish(published)
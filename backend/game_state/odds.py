@@ -0,0 +1,382 @@
+import asyncio
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from game_state.state import GameState
+
+# positions with more frogs left to move than this are enumerated off the event loop. With 6
+# unmoved frogs an enumeration takes 3.6 ms (6 ms at worst), with 7, which is the start of
+# every leg, 40 ms (70 ms at worst), see benchmarks/leg_odds.py
+MAX_INLINE_UNMOVED_FROGS = 6
+
+
+@dataclass(slots=True)
+class LegOdds:
+    frog_idx: int
+    first: float
+    second: float
+    last: float
+
+
+@dataclass
+class Boards:
+    """
+    A batch of positions. Row b holds one position: the tile and stack height of every frog,
+    the bitmask of frogs that haven't moved this leg, and the probability of reaching it.
+    """
+
+    tiles: np.ndarray  # (batch, num_frogs) int16
+    heights: np.ndarray  # (batch, num_frogs) int16
+    unmoved: np.ndarray  # (batch,) int64 bitmask
+    weights: np.ndarray  # (batch,) float64
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def select(self, rows: np.ndarray) -> "Boards":
+        return Boards(
+            self.tiles[rows], self.heights[rows], self.unmoved[rows], self.weights[rows]
+        )
+
+    @classmethod
+    def concatenate(cls, boards: list["Boards"]) -> "Boards":
+        return cls(
+            np.concatenate([b.tiles for b in boards]),
+            np.concatenate([b.heights for b in boards]),
+            np.concatenate([b.unmoved for b in boards]),
+            np.concatenate([b.weights for b in boards]),
+        )
+
+
+def make_boards(game_state: "GameState") -> Boards:
+    num_frogs = len(game_state.frogs)
+    track = game_state.track
+    tiles = np.array([track.frog_tiles[:num_frogs]], dtype=np.int16)
+    heights = np.array([track.frog_heights[:num_frogs]], dtype=np.int16)
+
+    unmoved = sum(1 << frog_idx for frog_idx in game_state.unmoved_frogs)
+    return Boards(
+        tiles, heights, np.array([unmoved], dtype=np.int64), np.ones(1, dtype=np.float64)
+    )
+
+
+def move_piles(
+    tiles: np.ndarray,
+    heights: np.ndarray,
+    from_tiles: np.ndarray,
+    from_heights: np.ndarray,
+    distances: np.ndarray,
+    last_tile: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    For every row, moves the frog at (from_tile, from_height) and every frog on top of it by `distance`,
+    landing on top of the destination stack like GameState._move_frog.
+    Returns the new tiles, heights and the destination tile of every row.
+    """
+    to_tiles = np.clip(from_tiles + distances, 0, last_tile).astype(tiles.dtype)
+    movers = (tiles == from_tiles[:, None]) & (heights >= from_heights[:, None])
+    # frogs already on the destination tile, which the pile lands on top of
+    stack_sizes = np.count_nonzero((tiles == to_tiles[:, None]) > movers, axis=1)
+    height_changes = (stack_sizes - from_heights).astype(heights.dtype)
+    return (
+        np.where(movers, to_tiles[:, None], tiles),
+        np.where(movers, heights + height_changes[:, None], heights),
+        to_tiles,
+    )
+
+
+@dataclass
+class _Leg:
+    """What the leg enumeration needs from a position besides its boards."""
+
+    last_tile: int
+    leg_end_size: int
+    num_frogs: int
+    forward_frogs: np.ndarray
+    spectator_directions: np.ndarray
+    # every (frog, die value) a move can pick, with the number of die values of that frog
+    action_frogs: np.ndarray
+    action_distances: np.ndarray
+    action_num_moves: np.ndarray
+
+    @classmethod
+    def from_game_state(cls, game_state: "GameState") -> "_Leg":
+        spectator_directions = np.zeros(game_state.num_tiles, dtype=np.int16)
+        for tile_idx, tile in enumerate(game_state.track):
+            if tile.has_spectator_tile:
+                spectator_directions[tile_idx] = tile.spectator_tile.direction
+        return cls(
+            last_tile=game_state.num_tiles - 1,
+            leg_end_size=game_state.num_frogs
+            + game_state.num_backward_frogs
+            - game_state.num_frogs_per_round,
+            num_frogs=len(game_state.frogs),
+            forward_frogs=np.array(
+                [frog.idx for frog in game_state.frogs if frog.is_forward_frog]
+            ),
+            spectator_directions=spectator_directions,
+            action_frogs=np.array(
+                [frog.idx for frog in game_state.frogs for _ in frog.moves],
+                dtype=np.int64,
+            ),
+            action_distances=np.array(
+                [distance for frog in game_state.frogs for distance in frog.moves],
+                dtype=np.int16,
+            ),
+            action_num_moves=np.array(
+                [len(frog.moves) for frog in game_state.frogs for _ in frog.moves]
+            ),
+        )
+
+    def expand(self, boards: Boards, num_unmoved: int) -> tuple[Boards, np.ndarray]:
+        """Every move from every row, which all have `num_unmoved` frogs left to move."""
+        rows, actions = np.nonzero((boards.unmoved[:, None] >> self.action_frogs) & 1)
+        return _move(
+            boards.select(rows),
+            self.action_frogs[actions],
+            self.action_distances[actions],
+            num_unmoved * self.action_num_moves[actions],
+            self.spectator_directions,
+            self.last_tile,
+        )
+
+    def placings(self, boards: Boards, num_unmoved: int) -> np.ndarray:
+        """
+        Probability of each forward frog finishing the leg first, second and last from `boards`,
+        weighted by the probability of every row.
+        """
+        placings = np.zeros((3, len(self.forward_frogs)))
+        for num_unmoved in range(num_unmoved, self.leg_end_size, -1):
+            boards, to_tiles = self.expand(boards, num_unmoved)
+
+            # the game ends as soon as a pile reaches the finish, which also ends the leg
+            finished = to_tiles == self.last_tile
+            if finished.any():
+                _add_placings(
+                    placings, boards.select(finished), self.forward_frogs, self.num_frogs
+                )
+                boards = boards.select(~finished)
+            if num_unmoved - 1 > self.leg_end_size:
+                boards = _merge_transpositions(boards, self.last_tile)
+
+        _add_placings(placings, boards, self.forward_frogs, self.num_frogs)
+        return placings
+
+    def odds(self, placings: np.ndarray) -> list[LegOdds]:
+        return [
+            LegOdds(
+                frog_idx=int(frog_idx),
+                first=float(placings[0, i]),
+                second=float(placings[1, i]),
+                last=float(placings[2, i]),
+            )
+            for i, frog_idx in enumerate(self.forward_frogs)
+        ]
+
+
+def calculate_leg_odds(game_state: "GameState") -> list[LegOdds]:
+    """
+    Exact probabilities of each forward frog finishing the current leg first, second and last.
+
+    Every remaining move picks one of the unmoved frogs and one of its die values uniformly, so this
+    enumerates all of them, applying pile carrying and spectator tiles like the real rules.
+    Positions are expanded one move at a time for the whole batch with NumPy, and identical
+    (board, unmoved frogs) positions reached through different move orders are merged into one row
+    with their probabilities summed, so each transposition is only expanded once.
+    """
+    if game_state.state != "game":
+        return []
+
+    return calculate_spec_odds(LegSpec.from_game_state(game_state))
+
+
+@dataclass
+class LegSpec:
+    """Everything a worker process needs to enumerate the rest of a leg from one position."""
+
+    leg: _Leg
+    boards: Boards
+    num_unmoved: int
+
+    @classmethod
+    def from_game_state(cls, game_state: "GameState") -> "LegSpec":
+        return cls(
+            _Leg.from_game_state(game_state),
+            make_boards(game_state),
+            len(game_state.unmoved_frogs),
+        )
+
+
+def calculate_spec_odds(spec: LegSpec) -> list[LegOdds]:
+    """calculate_leg_odds of the position `spec` was taken from."""
+    return spec.leg.odds(spec.leg.placings(spec.boards, spec.num_unmoved))
+
+
+class LegOddsCalculator:
+    """
+    Calculates leg odds on the event loop when that is cheap, and in a process pool when there
+    are more than `max_inline_unmoved` frogs left to move, so that the start of a leg doesn't
+    hold up every other game for tens of milliseconds.
+    """
+
+    def __init__(
+        self,
+        executor: Executor | None = None,
+        max_inline_unmoved: int = MAX_INLINE_UNMOVED_FROGS,
+    ):
+        self._executor = executor
+        self.max_inline_unmoved = max_inline_unmoved
+
+    def is_inline(self, game_state: "GameState") -> bool:
+        return len(game_state.unmoved_frogs) <= self.max_inline_unmoved
+
+    async def calculate(self, spec: LegSpec) -> list[LegOdds]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, calculate_spec_odds, spec)
+
+
+@dataclass(slots=True)
+class MoveOutcome:
+    """One result of the next frog move, with the leg odds from there on."""
+
+    probability: float
+    frog_idx: int
+    # whether the move ends the leg, or the game, so `leg_odds` are its final placings
+    ends_leg: bool
+    leg_odds: list[LegOdds]
+
+
+def calculate_move_outcomes(game_state: "GameState") -> list[MoveOutcome]:
+    """
+    The leg odds after each possible next frog move, e.g. to see how much a move gives away to
+    the next player. Costs about one calculate_leg_odds of a leg with one frog fewer to move for
+    every outcome, so it is only cheap late in a leg.
+    """
+    if game_state.state != "game":
+        return []
+
+    leg = _Leg.from_game_state(game_state)
+    num_unmoved = len(game_state.unmoved_frogs)
+    start = make_boards(game_state)
+    # the one row of `start` expands into one row per action, in action order
+    _, actions = np.nonzero((start.unmoved[:, None] >> leg.action_frogs) & 1)
+    boards, to_tiles = leg.expand(start, num_unmoved)
+    outcomes = []
+    for row in range(len(boards)):
+        board = boards.select(np.array([row]))
+        probability = float(board.weights[0])
+        board.weights = np.ones(1)
+        ends_leg = to_tiles[row] == leg.last_tile or num_unmoved - 1 <= leg.leg_end_size
+        placings = leg.placings(board, 0 if ends_leg else num_unmoved - 1)
+        outcomes.append(
+            MoveOutcome(
+                probability=probability,
+                frog_idx=int(leg.action_frogs[actions[row]]),
+                ends_leg=bool(ends_leg),
+                leg_odds=leg.odds(placings),
+            )
+        )
+    return outcomes
+
+
+def _move(
+    boards: Boards,
+    frog_idxs: np.ndarray,
+    distances: np.ndarray,
+    num_outcomes: np.ndarray,
+    spectator_directions: np.ndarray,
+    last_tile: int,
+) -> tuple[Boards, np.ndarray]:
+    """
+    Applies one move per row: frog_idxs[b] moves distances[b], out of num_outcomes[b] equally likely moves.
+    Returns the new boards and the tile each moved pile ended up on.
+    """
+    batch = np.arange(len(boards))
+    tiles, heights, to_tiles = move_piles(
+        boards.tiles,
+        boards.heights,
+        boards.tiles[batch, frog_idxs],
+        boards.heights[batch, frog_idxs],
+        distances,
+        last_tile,
+    )
+
+    # a spectator tile moves the whole stack it is under, from the bottom frog
+    directions = spectator_directions[to_tiles]
+    bumped = np.nonzero(directions)[0]
+    if len(bumped) > 0:
+        tiles[bumped], heights[bumped], to_tiles[bumped] = move_piles(
+            tiles[bumped],
+            heights[bumped],
+            to_tiles[bumped],
+            np.zeros(len(bumped), dtype=heights.dtype),
+            directions[bumped],
+            last_tile,
+        )
+
+    moved = Boards(
+        tiles,
+        heights,
+        boards.unmoved & ~(1 << frog_idxs),
+        boards.weights / num_outcomes,
+    )
+    return moved, to_tiles
+
+
+def _merge_transpositions(boards: Boards, last_tile: int) -> Boards:
+    if len(boards) == 0:
+        return boards
+
+    num_frogs = boards.tiles.shape[1]
+    if num_frogs <= 7 and last_tile < 32:
+        # pack every position into one integer: a byte per frog plus the unmoved bitmask
+        keys = boards.unmoved.astype(np.uint64)
+        for frog_idx in range(num_frogs):
+            keys = (
+                (keys << np.uint64(8))
+                | (boards.tiles[:, frog_idx].astype(np.uint64) << np.uint64(3))
+                | boards.heights[:, frog_idx].astype(np.uint64)
+            )
+        _, first_rows, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    else:
+        keys = np.concatenate(
+            [boards.tiles, boards.heights, boards.unmoved[:, None].astype(np.int64)],
+            axis=1,
+        )
+        _, first_rows, inverse = np.unique(
+            keys, axis=0, return_index=True, return_inverse=True
+        )
+
+    merged = boards.select(first_rows)
+    merged.weights = np.bincount(
+        inverse.ravel(), weights=boards.weights, minlength=len(first_rows)
+    )
+    return merged
+
+
+def _add_placings(
+    placings: np.ndarray, boards: Boards, forward_frogs: np.ndarray, num_frogs: int
+):
+    """Adds the probability of each forward frog being first, second and last in `boards`."""
+    if len(boards) == 0:
+        return
+    # frogs further along, or higher up the same stack, are ahead
+    scores = (
+        boards.tiles[:, forward_frogs].astype(np.int64) * num_frogs
+        + boards.heights[:, forward_frogs]
+    )
+    num_forward = len(forward_frogs)
+    first = scores.argmax(axis=1)
+    placings[0] += np.bincount(first, weights=boards.weights, minlength=num_forward)
+    placings[2] += np.bincount(
+        scores.argmin(axis=1), weights=boards.weights, minlength=num_forward
+    )
+    if num_forward > 1:
+        scores[np.arange(len(boards)), first] = -1
+        placings[1] += np.bincount(
+            scores.argmax(axis=1), weights=boards.weights, minlength=num_forward
+        )
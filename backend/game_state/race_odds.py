@@ -0,0 +1,223 @@
+import asyncio
+from concurrent.futures import Executor
+from dataclasses import dataclass
+import random
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from game_state.odds import make_boards, move_piles
+
+if TYPE_CHECKING:
+    from game_state.state import GameState
+
+DEFAULT_BATCH_SIZE = 2000
+DEFAULT_TARGET_STANDARD_ERROR = 0.01
+DEFAULT_TIME_BUDGET_SECONDS = 2.0
+# a race that hasn't finished after this many moves is dropped from the sample
+MAX_RACE_MOVES = 1000
+
+
+@dataclass(slots=True)
+class RaceOdds:
+    frog_idx: int
+    winner: float
+    loser: float
+    winner_standard_error: float
+    loser_standard_error: float
+
+
+@dataclass
+class RaceSpec:
+    """Everything a worker process needs to play out the rest of a race from one position."""
+
+    tiles: list[int]
+    heights: list[int]
+    unmoved: list[int]
+    moves: list[list[int]]
+    forward_frogs: list[int]
+    # only apply to the current leg, they are cleared when the next one starts
+    spectator_directions: list[int]
+    num_tiles: int
+    leg_end_size: int
+
+    @classmethod
+    def from_game_state(cls, game_state: "GameState") -> "RaceSpec":
+        boards = make_boards(game_state)
+        spectator_directions = [
+            tile.spectator_tile.direction if tile.has_spectator_tile else 0
+            for tile in game_state.track
+        ]
+        return cls(
+            tiles=boards.tiles[0].tolist(),
+            heights=boards.heights[0].tolist(),
+            unmoved=list(game_state.unmoved_frogs),
+            moves=[list(frog.moves) for frog in game_state.frogs],
+            forward_frogs=[frog.idx for frog in game_state.frogs if frog.is_forward_frog],
+            spectator_directions=spectator_directions,
+            num_tiles=game_state.num_tiles,
+            leg_end_size=game_state.num_frogs
+            + game_state.num_backward_frogs
+            - game_state.num_frogs_per_round,
+        )
+
+
+def simulate_races(
+    spec: RaceSpec, num_races: int, seed: int
+) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Plays `num_races` copies of the race to the end at once, one move per step for every race still running.
+    Returns how often each forward frog won and lost, and the number of races that finished.
+    Runs in worker processes, so it only takes and returns picklable values.
+    """
+    rng = np.random.default_rng(seed)
+    num_frogs = len(spec.moves)
+    last_tile = spec.num_tiles - 1
+    forward_frogs = np.array(spec.forward_frogs)
+    all_frogs_mask = (1 << num_frogs) - 1
+
+    max_num_moves = max(len(moves) for moves in spec.moves)
+    moves_table = np.zeros((num_frogs, max_num_moves), dtype=np.int16)
+    for frog_idx, moves in enumerate(spec.moves):
+        moves_table[frog_idx, : len(moves)] = moves
+    num_moves = np.array([len(moves) for moves in spec.moves])
+    spectator_directions = np.array(spec.spectator_directions, dtype=np.int16)
+    frog_bits = 1 << np.arange(num_frogs, dtype=np.int64)
+
+    tiles = np.tile(np.array(spec.tiles, dtype=np.int16), (num_races, 1))
+    heights = np.tile(np.array(spec.heights, dtype=np.int16), (num_races, 1))
+    unmoved = np.full(num_races, sum(1 << f for f in spec.unmoved), dtype=np.int64)
+    num_unmoved = np.full(num_races, len(spec.unmoved))
+    in_first_leg = np.ones(num_races, dtype=bool)
+
+    wins = np.zeros(len(forward_frogs), dtype=np.int64)
+    losses = np.zeros(len(forward_frogs), dtype=np.int64)
+    num_finished = 0
+
+    for _ in range(MAX_RACE_MOVES):
+        if len(tiles) == 0:
+            break
+        batch = np.arange(len(tiles))
+
+        # pick an unmoved frog uniformly, then one of its die values uniformly
+        keys = rng.random((len(tiles), num_frogs))
+        keys[(unmoved[:, None] & frog_bits) == 0] = -1
+        frog_idxs = keys.argmax(axis=1)
+        die = (rng.random(len(tiles)) * num_moves[frog_idxs]).astype(np.int64)
+
+        tiles, heights, to_tiles = move_piles(
+            tiles,
+            heights,
+            tiles[batch, frog_idxs],
+            heights[batch, frog_idxs],
+            moves_table[frog_idxs, die],
+            last_tile,
+        )
+        directions = np.where(in_first_leg, spectator_directions[to_tiles], 0)
+        bumped = np.nonzero(directions)[0]
+        if len(bumped) > 0:
+            tiles[bumped], heights[bumped], to_tiles[bumped] = move_piles(
+                tiles[bumped],
+                heights[bumped],
+                to_tiles[bumped],
+                np.zeros(len(bumped), dtype=heights.dtype),
+                directions[bumped],
+                last_tile,
+            )
+        unmoved &= ~frog_bits[frog_idxs]
+        num_unmoved -= 1
+
+        finished = to_tiles == last_tile
+        if finished.any():
+            scores = (
+                tiles[finished][:, forward_frogs].astype(np.int64) * num_frogs
+                + heights[finished][:, forward_frogs]
+            )
+            wins += np.bincount(scores.argmax(axis=1), minlength=len(forward_frogs))
+            losses += np.bincount(scores.argmin(axis=1), minlength=len(forward_frogs))
+            num_finished += int(finished.sum())
+
+            running = ~finished
+            tiles, heights = tiles[running], heights[running]
+            unmoved, num_unmoved = unmoved[running], num_unmoved[running]
+            in_first_leg = in_first_leg[running]
+
+        # next leg: every frog can move again and spectator tiles are cleared
+        leg_over = num_unmoved <= spec.leg_end_size
+        unmoved[leg_over] = all_frogs_mask
+        num_unmoved[leg_over] = num_frogs
+        in_first_leg[leg_over] = False
+
+    return wins, losses, num_finished
+
+
+class RaceOddsEstimator:
+    """
+    Estimates the chance of each forward frog winning or losing the whole race by playing the rest of it
+    many times in a process pool, off the event loop.
+
+    Batches are simulated until the largest standard error is below `target_standard_error` or
+    `time_budget_seconds` runs out, so accuracy can be traded for CPU. Cancelling the awaiting task
+    stops any further batches from being submitted.
+    """
+
+    def __init__(
+        self,
+        executor: Executor | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        target_standard_error: float = DEFAULT_TARGET_STANDARD_ERROR,
+        time_budget_seconds: float = DEFAULT_TIME_BUDGET_SECONDS,
+    ):
+        self._executor = executor
+        self.batch_size = batch_size
+        self.target_standard_error = target_standard_error
+        self.time_budget_seconds = time_budget_seconds
+
+    async def estimate(self, spec: RaceSpec) -> list[RaceOdds]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.time_budget_seconds
+
+        wins = np.zeros(len(spec.forward_frogs), dtype=np.int64)
+        losses = np.zeros(len(spec.forward_frogs), dtype=np.int64)
+        num_races = 0
+        while True:
+            batch_wins, batch_losses, batch_num_races = await loop.run_in_executor(
+                self._executor,
+                simulate_races,
+                spec,
+                self.batch_size,
+                random.getrandbits(63),
+            )
+            wins += batch_wins
+            losses += batch_losses
+            num_races += batch_num_races
+
+            race_odds = self._make_race_odds(spec, wins, losses, num_races)
+            max_standard_error = max(
+                max(odds.winner_standard_error, odds.loser_standard_error)
+                for odds in race_odds
+            )
+            if (
+                max_standard_error <= self.target_standard_error
+                or loop.time() >= deadline
+            ):
+                return race_odds
+
+    @staticmethod
+    def _make_race_odds(
+        spec: RaceSpec, wins: np.ndarray, losses: np.ndarray, num_races: int
+    ) -> list[RaceOdds]:
+        num_races = max(num_races, 1)
+        winner, loser = wins / num_races, losses / num_races
+        winner_standard_error = np.sqrt(winner * (1 - winner) / num_races)
+        loser_standard_error = np.sqrt(loser * (1 - loser) / num_races)
+        return [
+            RaceOdds(
+                frog_idx=frog_idx,
+                winner=float(winner[i]),
+                loser=float(loser[i]),
+                winner_standard_error=float(winner_standard_error[i]),
+                loser_standard_error=float(loser_standard_error[i]),
+            )
+            for i, frog_idx in enumerate(spec.forward_frogs)
+        ]
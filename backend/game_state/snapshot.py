@@ -0,0 +1,411 @@
+from dataclasses import dataclass, field
+import time
+from typing import Any, Callable
+import zlib
+
+import orjson
+import ormsgpack
+
+from game_state.state import GameState
+from utils.metrics import Counter, Histogram
+from utils.serialization import to_json_data
+
+
+COMPRESSION_LEVEL = 6
+# smaller payloads, e.g. most patches to spectators, save a few bytes at best
+COMPRESSION_MIN_BYTES = 256
+# payloads that compress by less than this are sent as they are
+COMPRESSION_MIN_SAVING = 0.1
+
+COMPRESS_SECONDS = Histogram(
+    "leapfrog_compress_seconds",
+    "Time to compress one broadcast payload, once for every socket it is sent to",
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01),
+)
+COMPRESSION_RATIO = Histogram(
+    "leapfrog_compression_ratio",
+    "Uncompressed over compressed size of each compressed broadcast payload",
+    buckets=(1.25, 1.5, 2, 3, 4, 5, 6, 8, 10, 15),
+)
+COMPRESSION_SKIPPED = Counter(
+    "leapfrog_compression_skipped_total",
+    "Broadcast payloads sent uncompressed to compressing sockets",
+    labelnames=("reason",),
+)
+_SKIPPED_SMALL = COMPRESSION_SKIPPED.labels("small")
+_SKIPPED_INCOMPRESSIBLE = COMPRESSION_SKIPPED.labels("incompressible")
+
+
+def _escape(key: str) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(old: Any, new: Any, path: str = "") -> list[dict]:
+    """
+    Computes a structural patch (JSON Patch style add/remove/replace ops) that turns `old` into `new`.
+    Both values must be plain JSON-like data (dicts, lists, tuples and scalars).
+    """
+    if old is new:
+        return []
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old.keys() - new.keys():
+            ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            key_path = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": key_path, "value": value})
+            else:
+                ops.extend(make_patch(old[key], value, key_path))
+        return ops
+
+    if isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)):
+        ops = []
+        common = min(len(old), len(new))
+        for i in range(common):
+            ops.extend(make_patch(old[i], new[i], f"{path}/{i}"))
+        for i in range(common, len(new)):
+            ops.append({"op": "add", "path": f"{path}/{i}", "value": new[i]})
+        # remove from the back so that indices stay valid while applying
+        for i in reversed(range(common, len(old))):
+            ops.append({"op": "remove", "path": f"{path}/{i}"})
+        return ops
+
+    if type(old) is type(new) and old == new:
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def apply_patch(doc: Any, patch: list[dict]) -> Any:
+    """
+    Applies a patch produced by make_patch in place and returns the (possibly replaced) document.
+    """
+    for op in patch:
+        tokens = [_unescape(t) for t in op["path"].split("/")[1:]]
+        if not tokens:
+            doc = op["value"]
+            continue
+
+        parent = doc
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+
+        last = tokens[-1]
+        if isinstance(parent, list):
+            idx = int(last)
+            if op["op"] == "add":
+                parent.insert(idx, op["value"])
+            elif op["op"] == "remove":
+                del parent[idx]
+            else:
+                parent[idx] = op["value"]
+        else:
+            if op["op"] == "remove":
+                del parent[last]
+            else:
+                parent[last] = op["value"]
+    return doc
+
+
+def _without_updates(game_state: dict) -> dict:
+    return {key: value for key, value in game_state.items() if key != "updates"}
+
+
+# parts of the game state that only change between play-throughs or in the lobby: the frogs
+# with their names and colours, and the settings. MessagePack clients get them in a separate
+# "static" block only when they change, the rest of the state refers to frogs by index.
+STATIC_KEYS = (
+    "game_code",
+    "num_tiles",
+    "num_frogs",
+    "num_backward_frogs",
+    "num_frogs_per_round",
+    "frogs",
+    "overall_bet_winnings",
+    "overall_bet_loss",
+)
+_STATIC_KEY_SET = frozenset(STATIC_KEYS)
+
+
+def _is_static_op(op: dict) -> bool:
+    return op["path"].split("/", 2)[1] in _STATIC_KEY_SET
+
+
+def _pack_state(game_state: dict) -> tuple[bytes, bytes]:
+    """Packs a snapshot without STATIC_KEYS, and the static block with them."""
+    static = {key: game_state[key] for key in STATIC_KEYS}
+    rest = {key: value for key, value in game_state.items() if key not in _STATIC_KEY_SET}
+    return ormsgpack.packb(rest), ormsgpack.packb(static)
+
+
+def _compress(message: str | bytes) -> str | bytes:
+    data = message.encode() if isinstance(message, str) else message
+    if len(data) < COMPRESSION_MIN_BYTES:
+        _SKIPPED_SMALL.inc()
+        return message
+    start = time.perf_counter()
+    compressed = zlib.compress(data, COMPRESSION_LEVEL)
+    COMPRESS_SECONDS.observe(time.perf_counter() - start)
+    if len(compressed) > len(data) * (1 - COMPRESSION_MIN_SAVING):
+        _SKIPPED_INCOMPRESSIBLE.inc()
+        return message
+    COMPRESSION_RATIO.observe(len(data) / len(compressed))
+    return compressed
+
+
+def _pack_map(items: dict, packed: dict[str, bytes]) -> bytes:
+    """
+    Packs `items` and the already packed `packed` values into one MessagePack map,
+    which must have fewer than 16 entries.
+    """
+    num_entries = len(items) + len(packed)
+    assert num_entries < 16
+    # a fixmap header is 0x80 plus the number of entries, swapped for the one items was packed with
+    parts = [bytes((0x80 | num_entries,)), ormsgpack.packb(items)[1:]]
+    for key, value in packed.items():
+        parts.append(ormsgpack.packb(key))
+        parts.append(value)
+    return b"".join(parts)
+
+
+@dataclass(slots=True)
+class PublishedState:
+    """
+    A versioned snapshot of a game as it was last published to clients.
+    `patch` turns the snapshot of `version - 1` into this one, except for the update log:
+    `updates` only holds the updates appended since `version - 1`, and clients should drop
+    the ones older than `updates_first_seq`.
+
+    The snapshot is kept JSON encoded, which is a fraction of the size of the decoded dicts,
+    since idle games hold on to their last published state for a long time.
+    `static_version` is the last version that changed any of STATIC_KEYS.
+    """
+
+    version: int
+    game_state_json: bytes
+    patch: list[dict] = field(default_factory=list)
+    updates: list[dict] = field(default_factory=list)
+    updates_first_seq: int = 0
+    updates_next_seq: int = 0
+    static_version: int = 0
+    # encoded payloads keyed by (message kind, connection type), shared by every socket
+    _encoded: dict[tuple[str, str], str | bytes] | None = field(
+        default=None, repr=False, compare=False
+    )
+    # the packed state without STATIC_KEYS and the packed static block, for MessagePack clients
+    _packed: tuple[bytes, bytes] | None = field(default=None, repr=False, compare=False)
+    # compressed payloads keyed by the encoded ones they were made from
+    _compressed: dict[str | bytes, str | bytes] | None = field(
+        default=None, repr=False, compare=False
+    )
+    _connection_types: dict[str, str] | None = field(
+        default=None, repr=False, compare=False
+    )
+
+    @classmethod
+    def initial(cls, game_state: GameState) -> "PublishedState":
+        return cls(
+            version=0,
+            game_state_json=orjson.dumps(to_json_data(game_state)),
+            updates_first_seq=game_state.updates.first_seq,
+            updates_next_seq=game_state.updates.next_seq,
+        )
+
+    @property
+    def game_state(self) -> dict:
+        """The decoded snapshot. It is decoded again on every access."""
+        return orjson.loads(self.game_state_json)
+
+    def next(self, game_state: GameState, pack: bool = False) -> "PublishedState":
+        """
+        Publishes the next version. With `pack`, it is also packed for MessagePack clients
+        straight away, which saves decoding the JSON again to do it later.
+        """
+        snapshot = to_json_data(game_state)
+        update_log = game_state.updates
+        num_new_updates = update_log.next_seq - max(
+            self.updates_next_seq, update_log.first_seq
+        )
+        new_updates = snapshot["updates"][-num_new_updates:] if num_new_updates > 0 else []
+        patch = make_patch(_without_updates(self.game_state), _without_updates(snapshot))
+        published = PublishedState(
+            version=self.version + 1,
+            game_state_json=orjson.dumps(snapshot),
+            patch=patch,
+            updates=new_updates,
+            updates_first_seq=update_log.first_seq,
+            updates_next_seq=update_log.next_seq,
+            static_version=(
+                self.version + 1
+                if any(_is_static_op(op) for op in patch)
+                else self.static_version
+            ),
+        )
+        if pack:
+            published._packed = _pack_state(snapshot)
+        return published
+
+    def get_connection_type(self, websocket_id: str) -> str:
+        if self._connection_types is None:
+            self._connection_types = {
+                conn["websocket_id"]: conn["connection_type"]
+                for conn in self.game_state["connections"]
+            }
+        return self._connection_types.get(websocket_id, "unknown")
+
+    def make_full_response(self, connection_type: str) -> dict:
+        return {"type": connection_type, "game_state": self.game_state}
+
+    def make_snapshot_response(
+        self, connection_type: str, updates_cursor: int | None = None
+    ) -> dict:
+        game_state = self.game_state
+        if updates_cursor is not None:
+            # the client already has every update up to and including the cursor
+            game_state["updates"] = [
+                u for u in game_state["updates"] if u["seq"] > updates_cursor
+            ]
+        return {
+            "type": connection_type,
+            "kind": "snapshot",
+            "version": self.version,
+            "game_state": game_state,
+        }
+
+    def make_patch_response(self, connection_type: str) -> dict:
+        return {
+            "type": connection_type,
+            "kind": "patch",
+            "base_version": self.version - 1,
+            "version": self.version,
+            "patch": self.patch,
+            "updates_first_seq": self.updates_first_seq,
+            "updates": self.updates,
+        }
+
+    def _encode(
+        self, kind: str, connection_type: str, encode: Callable[[str], str | bytes]
+    ) -> str | bytes:
+        if self._encoded is None:
+            self._encoded = {}
+        key = (kind, connection_type)
+        encoded = self._encoded.get(key)
+        if encoded is None:
+            encoded = encode(connection_type)
+            self._encoded[key] = encoded
+        return encoded
+
+    def _encode_with_game_state(self, head: dict) -> str:
+        # splices the already encoded snapshot in, instead of decoding and encoding it again
+        return (
+            orjson.dumps(head)[:-1]
+            + b',"game_state":'
+            + self.game_state_json
+            + b"}"
+        ).decode()
+
+    def encode_full(self, connection_type: str) -> str:
+        return self._encode(
+            "full",
+            connection_type,
+            lambda ctype: self._encode_with_game_state({"type": ctype}),
+        )
+
+    def encode_snapshot(
+        self, connection_type: str, updates_cursor: int | None = None
+    ) -> str:
+        if updates_cursor is not None:
+            # cursors differ per client, so these are not worth caching
+            return orjson.dumps(
+                self.make_snapshot_response(connection_type, updates_cursor)
+            ).decode()
+        return self._encode(
+            "snapshot",
+            connection_type,
+            lambda ctype: self._encode_with_game_state(
+                {"type": ctype, "kind": "snapshot", "version": self.version}
+            ),
+        )
+
+    def encode_patch(self, connection_type: str) -> str:
+        return self._encode(
+            "patch",
+            connection_type,
+            lambda ctype: orjson.dumps(self.make_patch_response(ctype)).decode(),
+        )
+
+    def _packed_parts(self) -> tuple[bytes, bytes]:
+        if self._packed is None:
+            self._packed = _pack_state(self.game_state)
+        return self._packed
+
+    def _pack_with_game_state(self, head: dict, with_static: bool) -> bytes:
+        # like _encode_with_game_state, the state is packed once per version and spliced in
+        game_state, static = self._packed_parts()
+        packed = {"game_state": game_state}
+        if with_static:
+            packed["static"] = static
+        return _pack_map(head, packed)
+
+    def pack_full(self, connection_type: str, with_static: bool) -> bytes:
+        """encode_full for MessagePack clients, with the static block if they don't have it yet."""
+        return self._encode(
+            "msgpack_full_static" if with_static else "msgpack_full",
+            connection_type,
+            lambda ctype: self._pack_with_game_state({"type": ctype}, with_static),
+        )
+
+    def pack_snapshot(
+        self, connection_type: str, updates_cursor: int | None = None
+    ) -> bytes:
+        """encode_snapshot for MessagePack clients, snapshots always have the static block."""
+        head = {"type": connection_type, "kind": "snapshot", "version": self.version}
+        if updates_cursor is not None:
+            game_state = self.make_snapshot_response(connection_type, updates_cursor)[
+                "game_state"
+            ]
+            static = {key: game_state.pop(key) for key in STATIC_KEYS}
+            return ormsgpack.packb({**head, "game_state": game_state, "static": static})
+        return self._encode(
+            "msgpack_snapshot",
+            connection_type,
+            lambda ctype: self._pack_with_game_state({**head, "type": ctype}, True),
+        )
+
+    def pack_patch(self, connection_type: str, with_static: bool) -> bytes:
+        """
+        encode_patch for MessagePack clients. Ops on STATIC_KEYS are left out, the static block
+        is sent whole instead when this version changed it.
+        """
+
+        def pack(ctype: str) -> bytes:
+            response = self.make_patch_response(ctype)
+            response["patch"] = [op for op in self.patch if not _is_static_op(op)]
+            if not with_static:
+                return ormsgpack.packb(response)
+            return _pack_map(response, {"static": self._packed_parts()[1]})
+
+        return self._encode(
+            "msgpack_patch_static" if with_static else "msgpack_patch",
+            connection_type,
+            pack,
+        )
+
+    def compress(self, message: str | bytes) -> str | bytes:
+        """
+        An encoded message of this version compressed with zlib, or the message itself if it is
+        too small or compresses too little to be worth it. Payloads from the encode_ and pack_
+        methods are shared by every socket, so each is only compressed once.
+        """
+        if self._compressed is None:
+            self._compressed = {}
+        compressed = self._compressed.get(message)
+        if compressed is None:
+            compressed = _compress(message)
+            self._compressed[message] = compressed
+        return compressed
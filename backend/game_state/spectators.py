@@ -0,0 +1,141 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from fastapi import status
+
+from game_state.broadcast import ClientWriter
+from game_state.snapshot import PublishedState
+from utils.metrics import Counter, Histogram
+
+
+DEFAULT_SPECTATOR_MAX_RATE = 2.0
+DEFAULT_MAX_SPECTATORS = 2000
+# how long a spectator keeps its place for its websocket to connect, or to reconnect once it is
+# closed, before it is removed from the game
+DEFAULT_SPECTATOR_RESERVATION_SECONDS = 30.0
+# spectator writers handed a state per event loop step. Each of them sends in the next step, and
+# with permessage-deflate every send compresses the state again (~0.3 ms for a full one), so this
+# keeps a big audience from holding up the players' events and sends for more than a few ms
+SPECTATOR_FANOUT_BATCH = 20
+
+SPECTATOR_FANOUT = Histogram(
+    "leapfrog_spectator_fanout",
+    "Spectator websockets a sampled state is sent to",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+SPECTATOR_SKIPPED_STATES = Counter(
+    "leapfrog_spectator_skipped_states_total",
+    "Published states not sent to spectators because a newer one was published before their turn",
+)
+
+
+class SpectatorTier:
+    """
+    Delivers one game's states to its spectators, separately from its players.
+
+    Spectators get the latest published state at most `max_rate` times a second: a state
+    published sooner after the last one sent waits, and is replaced by any newer one. Every
+    spectator gets the same encoded payloads, and the writers are handed a state in batches
+    of SPECTATOR_FANOUT_BATCH, yielding to the event loop in between.
+
+    The tier takes at most `max_spectators` spectators at a time, connected or not. Spectators
+    are registered with `reserve` as soon as they join, since their websocket can connect before
+    their join event is applied, and keep their place for `reservation_seconds` until it does,
+    and again once it is closed. Spectators whose place runs out are passed to `on_leave`.
+    """
+
+    def __init__(
+        self,
+        max_rate: float = DEFAULT_SPECTATOR_MAX_RATE,
+        max_spectators: int = DEFAULT_MAX_SPECTATORS,
+        on_leave: Callable[[str], Awaitable[None]] | None = None,
+        reservation_seconds: float = DEFAULT_SPECTATOR_RESERVATION_SECONDS,
+    ):
+        self.min_interval = 1 / max_rate
+        self.max_spectators = max_spectators
+        self.reservation_seconds = reservation_seconds
+        # spectators without a websocket by monotonic expiry time. Places are always kept for
+        # reservation_seconds and moved to the end when kept again, so the first expires first.
+        self.reservations: dict[str, float] = {}
+        self.writers: dict[str, ClientWriter] = {}
+        self._on_leave = on_leave
+        self._latest: PublishedState | None = None
+        self._last_sent_at = float("-inf")
+        self._task: asyncio.Task | None = None
+        self._expiry_task: asyncio.Task | None = None
+
+    def __contains__(self, websocket_id: str) -> bool:
+        return websocket_id in self.reservations or websocket_id in self.writers
+
+    @property
+    def full(self) -> bool:
+        return len(self.reservations) + len(self.writers) >= self.max_spectators
+
+    def reserve(self, websocket_id: str) -> bool:
+        """Registers a spectator, unless the tier is full. Returns whether it was."""
+        if self.full:
+            return False
+        self.hold(websocket_id)
+        return True
+
+    def hold(self, websocket_id: str):
+        """Keeps a spectator's place for `reservation_seconds`, even if the tier is full."""
+        self.reservations.pop(websocket_id, None)
+        self.reservations[websocket_id] = time.monotonic() + self.reservation_seconds
+        if self._expiry_task is None or self._expiry_task.done():
+            self._expiry_task = asyncio.create_task(self._expire())
+
+    def admit(self, websocket_id: str) -> bool:
+        """
+        Whether a spectator's websocket can be added to the writers: always with a place kept
+        for it, otherwise only if the tier isn't full, e.g. for a spectator of a recovered game.
+        """
+        if self.reservations.pop(websocket_id, None) is not None:
+            return True
+        return websocket_id in self.writers or not self.full
+
+    async def _expire(self):
+        while self.reservations:
+            websocket_id, expires_at = next(iter(self.reservations.items()))
+            delay = expires_at - time.monotonic()
+            if delay > 0:
+                # the spectator may connect in the meantime, the loop looks again after
+                await asyncio.sleep(delay)
+                continue
+            del self.reservations[websocket_id]
+            if self._on_leave is not None:
+                await self._on_leave(websocket_id)
+
+    def publish(self, published: PublishedState):
+        if not self.writers:
+            # spectators that connect later start with the last published version anyway
+            return
+        if self._latest is not None:
+            SPECTATOR_SKIPPED_STATES.inc()
+        self._latest = published
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self._latest is not None:
+            delay = self._last_sent_at + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            published, self._latest = self._latest, None
+            self._last_sent_at = time.monotonic()
+
+            writers = list(self.writers.values())
+            SPECTATOR_FANOUT.observe(len(writers))
+            for i in range(0, len(writers), SPECTATOR_FANOUT_BATCH):
+                if i > 0:
+                    await asyncio.sleep(0)
+                for writer in writers[i : i + SPECTATOR_FANOUT_BATCH]:
+                    writer.publish(published)
+
+    async def close(self, code: int = status.WS_1000_NORMAL_CLOSURE):
+        if self._task is not None:
+            self._task.cancel()
+        if self._expiry_task is not None:
+            self._expiry_task.cancel()
+        await asyncio.gather(*(writer.close(code) for writer in self.writers.values()))
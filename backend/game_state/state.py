@@ -1,4 +1,4 @@
-from dataclasses import asdict, dataclass, field
+from dataclasses import dataclass, field
 import hashlib
 import random
 from typing import Literal
@@ -11,27 +11,36 @@ from game_state.updates import (
     PlayerOverallBetUpdate,
     PlayerSpectatorTileUpdate,
     SpectatorTileWinningsUpdate,
-    Update,
+    UpdateLog,
 )
+from game_state.events import BotStrength
+from game_state.odds import LegOdds
+from game_state.race_odds import RaceOdds
+from game_state.track import Track
 from game_state.constants import (
     DEFAULT_BACKWARD_FROG_MOVES,
     DEFAULT_FROG_MOVES,
     FROG_COLORS,
     FROG_NAMES,
     INITIAL_GOLD,
+    MAX_PLAYERS,
+    UPDATE_LOG_CAPACITY,
 )
+from utils.serialization import to_json_data
 
 
-@dataclass
+@dataclass(slots=True)
 class Connection:
     websocket_id: str
     name: str
     connection_type: Literal["player", "spectator"]
     active: bool = False
     is_host: bool = False
+    # set for players played by the server, see Game
+    bot_strength: BotStrength | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Frog:
     idx: int
     name: str
@@ -41,54 +50,19 @@ class Frog:
     moves: list[int] = field(default_factory=list)
 
 
-@dataclass
-class SpectatorTile:
-    player_id: str
-    player_name: str
-    direction: int
-
-
-@dataclass
-class Tile:
-    frogs: list[int] = field(default_factory=list)
-    can_spectator_tile_be_placed: bool = True
-    spectator_tile: SpectatorTile | None = None
-
-    @property
-    def has_frogs(self) -> bool:
-        return len(self.frogs) > 0
-
-    def place_frog(self, frog_idx: int):
-        self.frogs.append(frog_idx)
-
-    def place_spectator_tile(
-        self,
-        player_id: str,
-        player_name: str,
-        direction: Literal["forward", "backward"],
-    ):
-        self.spectator_tile = SpectatorTile(
-            player_id, player_name, 1 if direction == "forward" else -1
-        )
-
-    @property
-    def has_spectator_tile(self) -> bool:
-        return self.spectator_tile is not None
-
-
-@dataclass
+@dataclass(slots=True)
 class LegBet:
     frog_idx: int
     winnings: list[int]
 
 
-@dataclass
+@dataclass(slots=True)
 class OverallBet:
     frog_idx: int
     player_id: str
 
 
-@dataclass
+@dataclass(slots=True)
 class PlayerStats:
     move_frog_winnings: int = 0
 
@@ -125,7 +99,7 @@ class PlayerStats:
     spectator_tile_winnings: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class Player:
     player_id: str
     connection: Connection
@@ -192,7 +166,7 @@ class Player:
             self.stats.spectator_tile_winnings += winnings
 
 
-@dataclass
+@dataclass(slots=True)
 class EndGameStats:
     winner: tuple[Player, int]
     placings: list[Player]
@@ -202,22 +176,30 @@ class EndGameStats:
     most_spectator_tile_winnings: tuple[Player, int]
 
 
-@dataclass
+@dataclass(slots=True)
 class GameState:
     game_code: str
     state: Literal["lobby", "game", "ended"] = "lobby"
     current_round: int = 0
     turn_number: int = 0
-    updates: list[Update] = field(default_factory=list)
+    updates: UpdateLog = field(
+        default_factory=lambda: UpdateLog(capacity=UPDATE_LOG_CAPACITY)
+    )
 
+    # players (and bots) only, spectators are only sent to clients as a count, so that a game
+    # with a big audience doesn't publish all of it with every update
     connections: list[Connection] = field(default_factory=list)
+    spectators: dict[str, Connection] = field(
+        default_factory=dict, metadata={"json": False}
+    )
+    num_spectators: int = 0
     players: dict[str, Player] = field(default_factory=dict)
     player_order: list[str] = field(default_factory=list)
     current_turn: str = ""
     notify_turn: bool = False
 
     num_tiles: int = 16 + 1  # including finish tile
-    track: list[Tile] = field(default_factory=list)
+    track: Track = field(default_factory=lambda: Track(0))
 
     num_frogs: int = 5
     num_backward_frogs: int = 2
@@ -233,46 +215,73 @@ class GameState:
     overall_bet_loss: int = 1
 
     end_game_stats: EndGameStats | None = field(default=None)
+    # chance of each forward frog finishing the current leg first/second/last
+    leg_odds: list[LegOdds] = field(default_factory=list)
+    # estimated chance of each forward frog finishing the whole race first/last, filled in asynchronously
+    race_odds: list[RaceOdds] = field(default_factory=list)
+
+    # every random choice of the game comes from its own stream, so replaying the same events
+    # from the same seed rebuilds the same game (see wal.py). Neither is sent to clients.
+    seed: int = field(
+        default_factory=lambda: random.getrandbits(64), metadata={"json": False}
+    )
+    _rng: random.Random | None = field(
+        default=None, init=False, repr=False, metadata={"json": False}
+    )
+
+    @property
+    def rng(self) -> random.Random:
+        # created on first use, lobbies never need the ~2.5 KB of generator state
+        if self._rng is None:
+            self._rng = random.Random(self.seed)
+        return self._rng
 
     @property
     def forward_frogs(self) -> list[Frog]:
         return [frog for frog in self.frogs if frog.start_pos == 0]
 
-    def make_websocket_response(self, websocket_id: str) -> dict:
-        all_websocket_ids = set([conn.websocket_id for conn in self.connections])
-        spectator_websocket_ids = set(
-            [
-                conn.websocket_id
-                for conn in self.connections
-                if conn.connection_type == "spectator"
-            ]
-        )
-        player_websocket_ids = set(
-            [
-                conn.websocket_id
-                for conn in self.connections
-                if conn.connection_type == "player"
-            ]
+    @property
+    def is_full(self) -> bool:
+        return len(self.connections) >= MAX_PLAYERS
+
+    def is_host(self, websocket_id: str) -> bool:
+        return any(
+            conn.websocket_id == websocket_id and conn.is_host for conn in self.connections
         )
 
-        if websocket_id not in all_websocket_ids:
-            return {"type": "unknown", "game_state": asdict(self)}
+    def get_connection_type(
+        self, websocket_id: str
+    ) -> Literal["player", "spectator", "unknown"]:
+        if websocket_id in self.spectators:
+            return "spectator"
+        for conn in self.connections:
+            if conn.websocket_id == websocket_id:
+                return conn.connection_type
+        return "unknown"
 
-        if websocket_id in spectator_websocket_ids:
-            return {"type": "spectator", "game_state": asdict(self)}
-        elif websocket_id in player_websocket_ids:
-            return {"type": "player", "game_state": asdict(self)}
-        return {"type": "unknown", "game_state": asdict(self)}
+    def make_websocket_response(self, websocket_id: str) -> dict:
+        return {
+            "type": self.get_connection_type(websocket_id),
+            "game_state": to_json_data(self),
+        }
 
     def add_connection(
         self,
         websocket_id: str,
         connection_type: Literal["player", "spectator"],
         name: str = "",
+        bot_strength: BotStrength | None = None,
     ):
         connection = Connection(
-            websocket_id=websocket_id, name=name, connection_type=connection_type
+            websocket_id=websocket_id,
+            name=name,
+            connection_type=connection_type,
+            bot_strength=bot_strength,
         )
+        if connection_type == "spectator":
+            self.spectators[websocket_id] = connection
+            self.num_spectators = len(self.spectators)
+            return
         if (
             len(
                 list(
@@ -287,12 +296,26 @@ class GameState:
             connection.is_host = True
         self.connections.append(connection)
 
+    def remove_spectator(self, websocket_id: str):
+        self.spectators.pop(websocket_id, None)
+        self.num_spectators = len(self.spectators)
+
+    def add_bot(self, strength: BotStrength):
+        # drawn from the game's own stream, so a replay gives the bot the same id
+        websocket_id = f"bot-{self.rng.getrandbits(32):08x}"
+        num_bots = sum(conn.bot_strength is not None for conn in self.connections)
+        self.add_connection(
+            websocket_id, "player", f"{strength.title()} Bot {num_bots + 1}", strength
+        )
+
     def reset_game(self):
         self.players.clear()
         self.frogs.clear()
         self.updates.clear()
         self.unmoved_frogs.clear()
         self.end_game_stats = None
+        self.leg_odds.clear()
+        self.race_odds.clear()
         self.leg_bets.clear()
         self.overall_win_bets.clear()
         self.overall_lose_bets.clear()
@@ -305,44 +328,19 @@ class GameState:
 
     @property
     def frog_order(self) -> list[int]:
-        frog_order = []
-        for tile in reversed(self.track):
-            for frog_idx in reversed(tile.frogs):
-                frog = self.frogs[frog_idx]
-                if frog.is_forward_frog:
-                    frog_order.append(frog_idx)
-        return frog_order
+        # the track keeps forward frogs ranked as they move
+        return list(self.track.ranking)
 
     def _reset_spectator_tiles(self):
-        for tile in self.track:
-            tile.spectator_tile = None
+        self.track.clear_spectator_tiles()
         for player in self.players.values():
             player.clear_spectator_tile()
 
-    def _update_spectator_tile_availability(self):
-        for idx, tile in enumerate(self.track):
-            if idx == 0 or idx == self.num_tiles - 1:
-                # first and last tile
-                tile.can_spectator_tile_be_placed = False
-            elif tile.has_spectator_tile or len(tile.frogs) > 0:
-                # there is something already there
-                tile.can_spectator_tile_be_placed = False
-            elif (
-                self.track[idx - 1].has_spectator_tile
-                or self.track[idx + 1].has_spectator_tile
-            ):
-                # there are spectator tiles on the left and right
-                tile.can_spectator_tile_be_placed = False
-            else:
-                tile.can_spectator_tile_be_placed = True
-
     def _next_turn(self):
         if self.current_turn == "":
             self.current_turn = self.player_order[0]
             return
 
-        self._update_spectator_tile_availability()
-
         num_players = len(self.players)
         next_idx = (self.player_order.index(self.current_turn) + 1) % num_players
         self.current_turn = self.player_order[next_idx]
@@ -350,9 +348,12 @@ class GameState:
         self.turn_number += 1
 
     def _calculate_leg_bets(self):
+        frog_placings = {
+            frog_idx: placing for placing, frog_idx in enumerate(self.track.ranking)
+        }
         for player in self.players.values():
             for leg_bet in player.leg_bets:
-                frog_pos = self.frog_order.index(leg_bet.frog_idx)
+                frog_pos = frog_placings[leg_bet.frog_idx]
                 player.add_leg_bet_winnings(leg_bet.winnings[frog_pos])
 
                 self.updates.append(
@@ -429,7 +430,6 @@ class GameState:
         self._reset_leg_bets()
 
         self._reset_spectator_tiles()
-        self._update_spectator_tile_availability()
 
     def _calculate_stats(self, sorted_players: list[Player]):
         most_leg_bets_player = max(
@@ -485,24 +485,13 @@ class GameState:
 
     def _get_frog_position(self, frog_idx: int) -> tuple[int, int]:
         assert frog_idx < len(self.frogs), "Invalid frog index"
-        for tile_idx, tile in enumerate(self.track):
-            if frog_idx in tile.frogs:
-                return tile_idx, tile.frogs.index(frog_idx)
-        raise ValueError("Frog not found on track")
+        return self.track.position(frog_idx)
 
     def _move_frog(self, frog_idx: int, move_distance: int | None = None) -> int:
         frog = self.frogs[frog_idx]
         if move_distance is None:
-            move_distance = random.choice(frog.moves)
-        current_tile, tile_pos = self._get_frog_position(frog_idx)
-
-        frog_pile = self.track[current_tile].frogs[tile_pos:]
-        self.track[current_tile].frogs = self.track[current_tile].frogs[:tile_pos]
-
-        next_tile = min(current_tile + move_distance, self.num_tiles - 1)
-        next_tile = max(next_tile, 0)
-        self.track[next_tile].frogs.extend(frog_pile)
-        return next_tile
+            move_distance = self.rng.choice(frog.moves)
+        return self.track.move_pile(frog_idx, move_distance)
 
     def _use_spectator_tile(self, from_tile: int) -> int:
         tile = self.track[from_tile]
@@ -528,10 +517,10 @@ class GameState:
         return moved_to_tile
 
     def _initialize_frog_position(self):
-        random_frog_iter = iter(random.sample(self.frogs, len(self.frogs)))
+        random_frog_iter = iter(self.rng.sample(self.frogs, len(self.frogs)))
         for frog in random_frog_iter:
             # place frog
-            self.track[frog.start_pos].place_frog(frog.idx)
+            self.track.place_frog(frog.idx, frog.start_pos, frog.is_forward_frog)
 
             self._move_frog(frog.idx)
 
@@ -542,7 +531,7 @@ class GameState:
     def move_frog(self, websocket_id: str):
         player_id = self._get_player_id(websocket_id)
 
-        next_frog_idx = random.choice(self.unmoved_frogs)
+        next_frog_idx = self.rng.choice(self.unmoved_frogs)
         self.unmoved_frogs.remove(next_frog_idx)
 
         from_tile, _ = self._get_frog_position(next_frog_idx)
@@ -575,9 +564,6 @@ class GameState:
 
     def create_players(self):
         for conn in self.connections:
-            if conn.connection_type == "spectator":
-                continue
-
             player_id = self._get_player_id(conn.websocket_id)
             player = Player(
                 player_id=player_id, connection=conn, num_frogs=self.num_frogs
@@ -588,17 +574,17 @@ class GameState:
 
         player_ids = list(self.players.keys())
         self.player_order = player_ids
-        random.shuffle(self.player_order)
+        self.rng.shuffle(self.player_order)
         self.current_turn = self.player_order[0]
 
     def create_track(self):
-        self.track = [Tile() for _ in range(self.num_tiles)]
+        self.track = Track(self.num_tiles, self.num_frogs + self.num_backward_frogs)
 
     def create_frogs(self):
         frog_names_copy, frog_colors_copy = list(FROG_NAMES), list(FROG_COLORS)
 
-        random.shuffle(frog_names_copy)
-        random.shuffle(frog_colors_copy)
+        self.rng.shuffle(frog_names_copy)
+        self.rng.shuffle(frog_colors_copy)
 
         for i in range(self.num_frogs):
             self.frogs.append(
@@ -625,6 +611,19 @@ class GameState:
                 )
             )
 
+    def can_make_leg_bet(self, frog_idx: int) -> bool:
+        """Whether `frog_idx` is a forward frog with leg bets left this leg."""
+        return 0 <= frog_idx < len(self.leg_bets) and len(self.leg_bets[frog_idx]) > 0
+
+    def can_make_overall_bet(self, websocket_id: str, frog_idx: int) -> bool:
+        """Whether the player can still bet on `frog_idx` winning or losing the race."""
+        player = self.players.get(self._get_player_id(websocket_id))
+        return (
+            player is not None
+            and 0 <= frog_idx < len(player.overall_bets)
+            and player.overall_bets[frog_idx] == "none"
+        )
+
     def make_leg_bet(self, websocket_id: str, frog_idx: int):
         player_id = self._get_player_id(websocket_id)
         player = self.players[player_id]
@@ -662,31 +661,21 @@ class GameState:
         self._next_turn()
 
     def is_valid_spectator_tile_placement(self, tile_idx: int) -> bool:
-        """
-        There can only be one spectator tile at each tile
-        There cannot be a spectator tile within 1 tile of the placement
-        There cannot be a frog on the placement
-        There cannot be a spectator tile one the last tile (finish line)
-        """
-        placement_tile = self.track[tile_idx]
-        if placement_tile.has_frogs:
-            return False
-
-        if placement_tile.has_spectator_tile:
-            return False
-
-        if tile_idx == self.num_tiles - 1:
-            return False
-
-        next_tile = self.track[tile_idx + 1] if tile_idx + 1 < self.num_tiles else None
-        if next_tile is not None and next_tile.has_spectator_tile:
-            return False
-
-        prev_tile = self.track[tile_idx - 1] if tile_idx - 1 > 0 else None
-        if prev_tile is not None and prev_tile.has_spectator_tile:
-            return False
+        return self.track.can_place_spectator_tile(tile_idx)
+
+    def can_place_spectator_tile(self, websocket_id: str, tile_idx: int) -> bool:
+        """Whether the player can place their spectator tile on `tile_idx` this leg."""
+        player = self.players.get(self._get_player_id(websocket_id))
+        return (
+            player is not None
+            and not player.has_spectator_tile
+            and self.is_valid_spectator_tile_placement(tile_idx)
+        )
 
-        return True
+    @property
+    def spectator_tile_placements(self) -> list[int]:
+        """All tiles a spectator tile can currently be placed on."""
+        return self.track.spectator_tile_placements()
 
     def place_spectator_tile(
         self,
@@ -699,8 +688,8 @@ class GameState:
         assert not player.has_spectator_tile
         assert self.is_valid_spectator_tile_placement(tile_idx)
 
-        self.track[tile_idx].place_spectator_tile(
-            player_id, player.connection.name, direction
+        self.track.place_spectator_tile(
+            tile_idx, player_id, player.connection.name, direction
         )
         player.place_spectator_tile(tile_idx)
 
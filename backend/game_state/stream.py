@@ -0,0 +1,116 @@
+import asyncio
+from collections import deque
+import time
+from typing import AsyncIterator
+
+from game_state.snapshot import PublishedState
+from utils.metrics import Counter, Gauge
+
+
+# versions a watcher can be behind and still resume with patches rather than a snapshot
+STREAM_BUFFER_SIZE = 128
+# how long EventSource waits before reconnecting, and how often an idle stream is sent a
+# comment, so that proxies don't time it out
+STREAM_RETRY_MS = 1000
+STREAM_KEEPALIVE_SECONDS = 15.0
+
+STREAM_WATCHERS = Gauge("leapfrog_stream_watchers", "Open /stream connections")
+STREAM_RESUMES = Counter(
+    "leapfrog_stream_resumes_total",
+    "Streams opened with a Last-Event-ID, by whether the watcher could be sent patches",
+    labelnames=("result",),
+)
+_RESUMED_WITH_PATCHES = STREAM_RESUMES.labels("patches")
+_RESUMED_WITH_SNAPSHOT = STREAM_RESUMES.labels("snapshot")
+
+
+def format_event(version: int, kind: str, data: str) -> str:
+    # encoded states never contain a newline, so they fit in a single data line
+    return f"id: {version}\nevent: {kind}\ndata: {data}\n\n"
+
+
+class FrameBuffer:
+    """
+    The recent versions of one game's state as Server-Sent Events, for read-only watchers.
+
+    Frames are the spectator snapshot and patch messages of the delta websocket protocol, taken
+    from the same PublishedState versions and their cached encodings, with the version as the
+    event id. A watcher is only its cursor, the last version it was sent: when the game
+    publishes, it is sent every patch after its cursor, or a snapshot if it is further behind
+    than the last STREAM_BUFFER_SIZE versions.
+    """
+
+    def __init__(self, published: PublishedState, capacity: int = STREAM_BUFFER_SIZE):
+        self.latest = published
+        self.closed = False
+        self.num_watchers = 0
+        # patch frames of the versions up to and including latest.version
+        self._patches: deque[str] = deque(maxlen=capacity)
+        self._snapshot: str | None = None
+        self._changed = asyncio.Event()
+
+    def publish(self, published: PublishedState):
+        if published.version != self.latest.version + 1:
+            # a game recovered from its log starts counting again
+            self._patches.clear()
+        self._patches.append(
+            format_event(published.version, "patch", published.encode_patch("spectator"))
+        )
+        self.latest = published
+        self._snapshot = None
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def frames_since(self, cursor: int | None) -> str:
+        """Everything a watcher that was last sent version `cursor` needs to catch up."""
+        version = self.latest.version
+        if cursor == version:
+            return ""
+        first_base_version = version - len(self._patches)
+        if cursor is not None and first_base_version <= cursor < version:
+            return "".join(list(self._patches)[cursor - first_base_version :])
+        if self._snapshot is None:
+            self._snapshot = format_event(
+                version, "snapshot", self.latest.encode_snapshot("spectator")
+            )
+        return self._snapshot
+
+    async def watch(self, last_event_id: int | None, min_interval: float) -> AsyncIterator[str]:
+        """
+        The event stream of one watcher, starting after `last_event_id`. Frames are sent at
+        most once every `min_interval` seconds, with every patch published in between.
+        """
+        if last_event_id is not None:
+            version = self.latest.version
+            resumable = version - len(self._patches) <= last_event_id <= version
+            (_RESUMED_WITH_PATCHES if resumable else _RESUMED_WITH_SNAPSHOT).inc()
+
+        self.num_watchers += 1
+        STREAM_WATCHERS.inc()
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            cursor = last_event_id
+            while not self.closed:
+                frames = self.frames_since(cursor)
+                cursor = self.latest.version
+                if frames:
+                    sent_at = time.monotonic()
+                    yield frames
+                    delay = sent_at + min_interval - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                if self.latest.version == cursor and not self.closed:
+                    changed = self._changed
+                    try:
+                        async with asyncio.timeout(STREAM_KEEPALIVE_SECONDS):
+                            await changed.wait()
+                    except TimeoutError:
+                        yield ": keepalive\n\n"
+        finally:
+            self.num_watchers -= 1
+            STREAM_WATCHERS.dec()
+
+    def close(self):
+        """Ends every watcher's stream, e.g. once the game is purged."""
+        self.closed = True
+        self._changed.set()
@@ -0,0 +1,225 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Iterator, Literal
+
+from utils.serialization import to_json_data
+
+
+@dataclass(slots=True)
+class SpectatorTile:
+    player_id: str
+    player_name: str
+    direction: int
+
+
+@dataclass(slots=True)
+class Tile:
+    # frogs on this tile from bottom to top
+    frogs: list[int] = field(default_factory=list)
+    can_spectator_tile_be_placed: bool = True
+    spectator_tile: SpectatorTile | None = None
+
+    @property
+    def has_frogs(self) -> bool:
+        return len(self.frogs) > 0
+
+    @property
+    def has_spectator_tile(self) -> bool:
+        return self.spectator_tile is not None
+
+
+class Track:
+    """
+    The board: a stack of frogs per tile, plus frog -> (tile, height) index arrays and
+    the ranking of the ranked (forward) frogs, all kept in sync as piles move.
+    Where a spectator tile can be placed is kept as a bitmask of tiles, and only the tiles
+    around a frog leaving or landing or a spectator tile being placed are rechecked.
+
+    Indexing and iterating a Track gives its Tiles, and its JSON view is the list of tiles,
+    so it reads like the plain list of tiles it replaces.
+    """
+
+    __slots__ = (
+        "tiles",
+        "frog_tiles",
+        "frog_heights",
+        "_ranking",
+        "_is_ranked",
+        "_spectator_tile_placements",
+    )
+
+    def __init__(self, num_tiles: int, num_frogs: int = 0):
+        self.tiles = [Tile() for _ in range(num_tiles)]
+        # -1 until the frog is placed
+        self.frog_tiles = [-1] * num_frogs
+        self.frog_heights = [-1] * num_frogs
+        # ranked frogs from first to last: further along, or higher up the same stack, is ahead
+        self._ranking: list[int] = []
+        self._is_ranked = [False] * num_frogs
+        # bit i is set when a spectator tile can be placed on tile i
+        self._spectator_tile_placements = 0
+        for tile_idx in range(num_tiles):
+            self._update_spectator_tile_placement(tile_idx)
+
+    # --- Container Dunder Methods ---
+
+    def __len__(self) -> int:
+        return len(self.tiles)
+
+    def __getitem__(self, tile_idx: int) -> Tile:
+        return self.tiles[tile_idx]
+
+    def __iter__(self) -> Iterator[Tile]:
+        return iter(self.tiles)
+
+    def __reversed__(self) -> Iterator[Tile]:
+        return reversed(self.tiles)
+
+    def __repr__(self) -> str:
+        return f"<Track object with {len(self.tiles)} tile(s)>"
+
+    def to_json_data(self) -> list[dict]:
+        return [to_json_data(tile) for tile in self.tiles]
+
+    # --- Frogs ---
+
+    @property
+    def ranking(self) -> list[int]:
+        """Ranked frogs from first to last. Do not modify the returned list."""
+        return self._ranking
+
+    def position(self, frog_idx: int) -> tuple[int, int]:
+        """Returns the (tile, height) of a frog, where height 0 is the bottom of the stack."""
+        tile_idx = self.frog_tiles[frog_idx]
+        if tile_idx < 0:
+            raise ValueError("Frog not found on track")
+        return tile_idx, self.frog_heights[frog_idx]
+
+    def place_frog(self, frog_idx: int, tile_idx: int, ranked: bool = True):
+        """Places a frog that isn't on the track yet on top of a tile."""
+        assert self.frog_tiles[frog_idx] < 0, "Frog is already on the track"
+        stack = self.tiles[tile_idx].frogs
+        self.frog_tiles[frog_idx] = tile_idx
+        self.frog_heights[frog_idx] = len(stack)
+        stack.append(frog_idx)
+        if len(stack) == 1:
+            self._update_spectator_tile_placement(tile_idx)
+
+        self._is_ranked[frog_idx] = ranked
+        if ranked:
+            self._insert_ranked([frog_idx], tile_idx)
+
+    def move_pile(self, frog_idx: int, distance: int) -> int:
+        """
+        Moves a frog and every frog on top of it by `distance` tiles, clamped to the track,
+        landing on top of the destination stack. Returns the destination tile.
+        """
+        from_tile, height = self.position(frog_idx)
+        to_tile = from_tile + distance
+        if to_tile < 0:
+            to_tile = 0
+        elif to_tile >= len(self.tiles):
+            to_tile = len(self.tiles) - 1
+
+        from_stack = self.tiles[from_tile].frogs
+        pile = from_stack[height:]
+        del from_stack[height:]
+
+        to_stack = self.tiles[to_tile].frogs
+        frog_tiles, frog_heights, is_ranked = (
+            self.frog_tiles,
+            self.frog_heights,
+            self._is_ranked,
+        )
+        ranked_pile = []
+        for pile_height, pile_frog in enumerate(pile, start=len(to_stack)):
+            frog_tiles[pile_frog] = to_tile
+            frog_heights[pile_frog] = pile_height
+            if is_ranked[pile_frog]:
+                ranked_pile.append(pile_frog)
+        was_empty = len(to_stack) == 0
+        to_stack.extend(pile)
+
+        if to_tile != from_tile:
+            if height == 0:
+                self._update_spectator_tile_placement(from_tile)
+            if was_empty:
+                self._update_spectator_tile_placement(to_tile)
+
+        if ranked_pile:
+            # the pile is a contiguous run of the ranking, its top frog first
+            start = self._ranking.index(ranked_pile[-1])
+            del self._ranking[start : start + len(ranked_pile)]
+            self._insert_ranked(ranked_pile, to_tile)
+        return to_tile
+
+    def _insert_ranked(self, pile: list[int], to_tile: int):
+        """Inserts a bottom-to-top pile that just landed on top of `to_tile` into the ranking."""
+        frog_tiles = self.frog_tiles
+        # ahead of every frog already on to_tile, behind every frog further along
+        idx = bisect_left(self._ranking, -to_tile, key=lambda f: -frog_tiles[f])
+        self._ranking[idx:idx] = reversed(pile)
+
+    # --- Spectator Tiles ---
+
+    def can_place_spectator_tile(self, tile_idx: int) -> bool:
+        # tile_idx comes straight from the client, and a negative shift raises
+        if not 0 <= tile_idx < len(self.tiles):
+            return False
+        return bool(self._spectator_tile_placements >> tile_idx & 1)
+
+    def spectator_tile_placements(self) -> list[int]:
+        """Returns every tile a spectator tile can be placed on right now."""
+        placements = []
+        mask = self._spectator_tile_placements
+        while mask:
+            lowest = mask & -mask
+            placements.append(lowest.bit_length() - 1)
+            mask ^= lowest
+        return placements
+
+    def place_spectator_tile(
+        self,
+        tile_idx: int,
+        player_id: str,
+        player_name: str,
+        direction: Literal["forward", "backward"],
+    ):
+        self.tiles[tile_idx].spectator_tile = SpectatorTile(
+            player_id, player_name, 1 if direction == "forward" else -1
+        )
+        self._update_spectator_tile_placements_around(tile_idx)
+
+    def clear_spectator_tiles(self):
+        for tile_idx, tile in enumerate(self.tiles):
+            if tile.has_spectator_tile:
+                tile.spectator_tile = None
+                self._update_spectator_tile_placements_around(tile_idx)
+
+    def _update_spectator_tile_placements_around(self, tile_idx: int):
+        for neighbour_idx in range(
+            max(tile_idx - 1, 0), min(tile_idx + 2, len(self.tiles))
+        ):
+            self._update_spectator_tile_placement(neighbour_idx)
+
+    def _update_spectator_tile_placement(self, tile_idx: int):
+        """
+        There can only be one spectator tile at each tile
+        There cannot be a spectator tile within 1 tile of the placement
+        There cannot be a frog on the placement
+        There cannot be a spectator tile on the first or last tile (start and finish line)
+        """
+        tiles = self.tiles
+        tile = tiles[tile_idx]
+        can_place = (
+            0 < tile_idx < len(tiles) - 1
+            and not tile.frogs
+            and tile.spectator_tile is None
+            and tiles[tile_idx - 1].spectator_tile is None
+            and tiles[tile_idx + 1].spectator_tile is None
+        )
+        tile.can_spectator_tile_be_placed = can_place
+        if can_place:
+            self._spectator_tile_placements |= 1 << tile_idx
+        else:
+            self._spectator_tile_placements &= ~(1 << tile_idx)
@@ -1,13 +1,16 @@
 from dataclasses import dataclass
 from typing import Literal
 
+from utils.ring_buffer import RingBuffer
+from utils.serialization import to_json_data
 
-@dataclass
+
+@dataclass(slots=True)
 class Update:
     player_id: str
 
 
-@dataclass
+@dataclass(slots=True)
 class PlayerMoveFrogUpdate(Update):
     frog_idx: int
     from_tile: int
@@ -15,26 +18,26 @@ class PlayerMoveFrogUpdate(Update):
     type: Literal["player_move_frog"] = "player_move_frog"
 
 
-@dataclass
+@dataclass(slots=True)
 class PlayerLegBetUpdate(Update):
     frog_idx: int
     type: Literal["player_leg_bet"] = "player_leg_bet"
 
 
-@dataclass
+@dataclass(slots=True)
 class PlayerOverallBetUpdate(Update):
     bet_type: Literal["winner", "loser"]
     type: Literal["player_overall_bet"] = "player_overall_bet"
 
 
-@dataclass
+@dataclass(slots=True)
 class PlayerSpectatorTileUpdate(Update):
     tile_idx: int
     direction: int
     type: Literal["player_spectator_tile"] = "player_spectator_tile"
 
 
-@dataclass
+@dataclass(slots=True)
 class SpectatorTileWinningsUpdate(Update):
     frog_idx: int
     from_tile: int
@@ -42,7 +45,7 @@ class SpectatorTileWinningsUpdate(Update):
     type: Literal["spectator_tile_winnings"] = "spectator_tile_winnings"
 
 
-@dataclass
+@dataclass(slots=True)
 class LegBetWinningsUpdate(Update):
     frog_idx: int
     frog_placing: int
@@ -50,7 +53,7 @@ class LegBetWinningsUpdate(Update):
     type: Literal["leg_bet_winnings"] = "leg_bet_winnings"
 
 
-@dataclass
+@dataclass(slots=True)
 class OverallBetWinningsUpdate(Update):
     bet_type: Literal["winner", "loser"]
     frog_idx: int
@@ -58,8 +61,20 @@ class OverallBetWinningsUpdate(Update):
     type: Literal["overall_bet_winnings"] = "overall_bet_winnings"
 
 
-@dataclass
+@dataclass(slots=True)
 class EndGameUpdate(Update):
     player_rankings: list[str]
     winning_frog_idx: int
     type: Literal["end_game_update"] = "end_game_update"
+
+
+class UpdateLog(RingBuffer[Update]):
+    """
+    The bounded log of updates of a game. Each serialized update carries its sequence number,
+    so clients can ask for only the updates after the last one they have seen.
+    """
+
+    __slots__ = ()
+
+    def to_json_data(self) -> list[dict]:
+        return [{**to_json_data(update), "seq": seq} for seq, update in self.items()]
@@ -0,0 +1,206 @@
+"""
+Per-game write-ahead log of accepted events, so live games survive a restart of the backend.
+
+Every game has one append-only file `<game_code>.wal` of JSON lines: a header with the game's seed,
+then each event in the order the game applied it. All of a game's randomness comes from its seed,
+so replaying the events through Game.process_event rebuilds the same game.
+
+Appending only buffers the line in memory. One flusher task writes and fsyncs every game with
+pending lines in a single pass on a worker thread (group commit), so the event loop never waits
+on the disk and one commit covers every event since the last one. An applied event can only be
+lost if the process dies before the next commit, at most `commit_interval` seconds later.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+import logging
+import os
+import time
+
+import orjson
+
+from game_state.events import BaseEvent, Event, EventAdapter
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMMIT_INTERVAL = 0.005
+WAL_SUFFIX = ".wal"
+
+
+@dataclass(slots=True)
+class RecoveredGame:
+    game_code: str
+    seed: int
+    events: list[Event] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class CommitStats:
+    num_commits: int = 0
+    num_records: int = 0
+    num_bytes: int = 0
+    # time spent writing and fsyncing on the worker thread
+    commit_seconds: float = 0.0
+    max_commit_seconds: float = 0.0
+
+
+class WriteAheadLog:
+    __slots__ = (
+        "directory",
+        "commit_interval",
+        "stats",
+        "_pending",
+        "_created",
+        "_removed",
+        "_commit_lock",
+    )
+
+    def __init__(
+        self, directory: str, commit_interval: float = DEFAULT_COMMIT_INTERVAL
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.stats = CommitStats()
+        # lines not written yet, per game
+        self._pending: dict[str, list[bytes]] = {}
+        # games whose file is started over by the next commit
+        self._created: set[str] = set()
+        # games whose file is deleted by the next commit
+        self._removed: set[str] = set()
+        self._commit_lock = asyncio.Lock()
+
+    def _path(self, game_code: str) -> str:
+        return os.path.join(self.directory, f"{game_code}{WAL_SUFFIX}")
+
+    # --- Logging ---
+
+    def create(self, game_code: str, seed: int):
+        """Starts the log of a new game, replacing any old log with the same game code."""
+        self._removed.discard(game_code)
+        self._created.add(game_code)
+        self._pending[game_code] = [
+            orjson.dumps({"game_code": game_code, "seed": seed}) + b"\n"
+        ]
+
+    def append(self, game_code: str, event: BaseEvent):
+        """Logs an event of the game. Never blocks, the line is written by the next commit."""
+        line = event.model_dump_json(by_alias=True).encode() + b"\n"
+        pending = self._pending.get(game_code)
+        if pending is None:
+            self._pending[game_code] = [line]
+        else:
+            pending.append(line)
+
+    def remove(self, game_code: str):
+        """Deletes the log of a game that is over, with the next commit."""
+        self._pending.pop(game_code, None)
+        self._created.discard(game_code)
+        self._removed.add(game_code)
+
+    # --- Group Commit ---
+
+    async def commit(self):
+        """Writes and fsyncs everything logged so far."""
+        async with self._commit_lock:
+            if not self._pending and not self._removed:
+                return
+            pending, created, removed = self._pending, self._created, self._removed
+            self._pending, self._created, self._removed = {}, set(), set()
+            write = asyncio.create_task(
+                asyncio.to_thread(self._write, pending, created, removed)
+            )
+            try:
+                await asyncio.shield(write)
+            except asyncio.CancelledError:
+                # the lines are already taken, so let the write finish before the next commit
+                await write
+                raise
+
+    def _write(
+        self, pending: dict[str, list[bytes]], created: set[str], removed: set[str]
+    ):
+        start = time.perf_counter()
+        num_bytes = num_records = 0
+        for game_code in removed:
+            try:
+                os.remove(self._path(game_code))
+            except FileNotFoundError:
+                pass
+        for game_code, lines in pending.items():
+            data = b"".join(lines)
+            with open(self._path(game_code), "wb" if game_code in created else "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            num_bytes += len(data)
+            num_records += len(lines)
+        if created or removed:
+            # make new and deleted files durable too
+            dir_fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+        elapsed = time.perf_counter() - start
+        stats = self.stats
+        stats.num_commits += 1
+        stats.num_records += num_records
+        stats.num_bytes += num_bytes
+        stats.commit_seconds += elapsed
+        stats.max_commit_seconds = max(stats.max_commit_seconds, elapsed)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.commit_interval)
+            try:
+                await self.commit()
+            except OSError:
+                logger.exception("Failed to commit the write-ahead log")
+
+    async def close(self):
+        await self.commit()
+
+    # --- Recovery ---
+
+    def recover(self) -> list[RecoveredGame]:
+        """
+        Reads back every game in the log directory. A torn last line, from a crash in the
+        middle of a write, is cut off the file so later appends start on a fresh line.
+        """
+        games = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(WAL_SUFFIX):
+                game = self._recover_game(os.path.join(self.directory, name))
+                if game is not None:
+                    games.append(game)
+        return games
+
+    def _recover_game(self, path: str) -> RecoveredGame | None:
+        with open(path, "rb") as f:
+            data = f.read()
+
+        lines = data.split(b"\n")
+        # everything up to the last newline was written whole
+        valid_length = len(data) - len(lines[-1])
+        try:
+            header = orjson.loads(lines[0])
+            game = RecoveredGame(header["game_code"], header["seed"])
+        except (orjson.JSONDecodeError, KeyError, TypeError):
+            logger.error(f"Discarding write-ahead log {path} without a valid header")
+            os.remove(path)
+            return None
+
+        for line_number, line in enumerate(lines[1:-1], start=2):
+            try:
+                game.events.append(EventAdapter.validate_json(line))
+            except ValueError as e:
+                logger.error(f"Skipping event on line {line_number} of {path}: {e}")
+
+        if valid_length < len(data):
+            logger.warning(f"Cutting a torn line off write-ahead log {path}")
+            with open(path, "r+b") as f:
+                f.truncate(valid_length)
+        return game
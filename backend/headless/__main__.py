@@ -0,0 +1,84 @@
+"""
+Plays complete games between bots without the server, as fast as possible.
+
+    python -m headless --games 1000 --players 4 --seed 0 --profile
+    python -m headless --games 100 --bot lookahead
+"""
+
+import argparse
+import random
+
+from game_state.bots import BOTS
+from headless.bots import make_bot
+from headless.driver import run_simulation
+from headless.profiler import MethodProfiler
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m headless", description=__doc__)
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--bot", choices=list(BOTS), default="random", help="how well every bot plays"
+    )
+    parser.add_argument(
+        "--tiles", type=int, default=None, help="number of tiles, including the finish"
+    )
+    parser.add_argument("--frogs", type=int, default=None, help="number of forward frogs")
+    parser.add_argument("--backward-frogs", type=int, default=None)
+    parser.add_argument(
+        "--profile", action="store_true", help="show time spent per GameState method"
+    )
+    args = parser.parse_args()
+
+    settings = {}
+    if args.tiles is not None:
+        settings["num_tiles"] = args.tiles
+    if args.frogs is not None:
+        settings["num_frogs"] = args.frogs
+        settings["num_frogs_per_round"] = args.frogs
+    if args.backward_frogs is not None:
+        settings["num_backward_frogs"] = args.backward_frogs
+
+    bot_rng = random.Random(args.seed)
+
+    def make_bots():
+        return [make_bot(args.bot, bot_rng) for _ in range(args.players)]
+
+    # the other bots read the leg odds, which the server keeps up to date
+    leg_odds = args.bot != "random"
+
+    profiler = MethodProfiler() if args.profile else None
+    if profiler is not None:
+        with profiler:
+            stats = run_simulation(
+                make_bots,
+                args.games,
+                seed=args.seed,
+                settings=settings,
+                leg_odds=leg_odds,
+            )
+    else:
+        stats = run_simulation(
+            make_bots, args.games, seed=args.seed, settings=settings, leg_odds=leg_odds
+        )
+
+    print(f"games:        {stats.num_games} ({stats.num_finished_games} finished)")
+    print(f"events:       {stats.num_events}")
+    print(f"elapsed:      {stats.elapsed_seconds:.2f} s")
+    print(f"games/sec:    {stats.games_per_second:.1f}")
+    print(f"events/sec:   {stats.events_per_second:.0f}")
+    print(
+        "winning frogs: "
+        + ", ".join(
+            f"{frog_idx}: {count}" for frog_idx, count in sorted(stats.winning_frogs.items())
+        )
+    )
+    if profiler is not None:
+        print()
+        print(profiler.report(stats.elapsed_seconds))
+
+
+if __name__ == "__main__":
+    main()
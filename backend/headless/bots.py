@@ -0,0 +1,22 @@
+from typing import Iterable
+
+# the server plays the same bots, so they live with the game rules
+from game_state.bots import Bot, GreedyBot, LookaheadBot, RandomBot, make_bot
+from game_state.events import BaseEvent, EventAdapter
+from game_state.state import GameState
+
+
+class ScriptedBot:
+    """
+    Plays a fixed script of websocket messages, e.g. {"type": "leg_bet", "frogIdx": 2},
+    then moves a frog on every turn once the script runs out.
+    """
+
+    def __init__(self, script: Iterable[dict]):
+        self._script = iter(script)
+
+    def choose_event(self, game_state: GameState, websocket_id: str) -> BaseEvent:
+        message = next(self._script, {"type": "move_frog"})
+        return EventAdapter.validate_python(
+            {**message, "gameCode": game_state.game_code, "websocketId": websocket_id}
+        )
@@ -0,0 +1,126 @@
+from dataclasses import dataclass, field
+import random
+import time
+from typing import Callable
+
+from game_state.engine import apply_event
+from game_state.events import (
+    BaseEvent,
+    MoveFrogEvent,
+    PlayerJoinEvent,
+    SpectatorTileEvent,
+    StartGameEvent,
+)
+from game_state.odds import calculate_leg_odds
+from game_state.state import GameState
+from headless.bots import Bot
+
+# stops a game whose bots never move a frog, e.g. a script that only places bets
+DEFAULT_MAX_EVENTS_PER_GAME = 10_000
+
+
+@dataclass
+class GameResult:
+    game_state: GameState
+    num_events: int
+    finished: bool
+
+
+@dataclass
+class SimulationStats:
+    num_games: int = 0
+    num_finished_games: int = 0
+    num_events: int = 0
+    elapsed_seconds: float = 0.0
+    winning_frogs: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def games_per_second(self) -> float:
+        return self.num_games / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def events_per_second(self) -> float:
+        return self.num_events / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+def play_game(
+    bots: list[Bot],
+    game_code: str = "000000",
+    settings: dict | None = None,
+    max_events: int = DEFAULT_MAX_EVENTS_PER_GAME,
+    on_event: Callable[[GameState, BaseEvent], None] | None = None,
+    leg_odds: bool = False,
+) -> GameResult:
+    """
+    Plays one complete game between `bots` through the same rules as the server, without any I/O.
+    `settings` overrides GameState fields such as num_tiles and num_frogs.
+    `on_event` is called after every event is applied, e.g. to record or check the game.
+    With `leg_odds`, the leg odds are kept up to date like Game does, for bots that read them.
+    """
+    game_state = GameState(game_code=game_code, **(settings or {}))
+    websocket_ids = {}
+    num_events = 0
+
+    def apply(event: BaseEvent):
+        nonlocal num_events
+        apply_event(game_state, event)
+        num_events += 1
+        if leg_odds and isinstance(
+            event, (StartGameEvent, MoveFrogEvent, SpectatorTileEvent)
+        ):
+            game_state.leg_odds = calculate_leg_odds(game_state)
+        if on_event is not None:
+            on_event(game_state, event)
+
+    for i, bot in enumerate(bots):
+        websocket_id = f"bot-{i}"
+        websocket_ids[game_state._get_player_id(websocket_id)] = (websocket_id, bot)
+        apply(
+            PlayerJoinEvent(
+                game_code=game_code, websocket_id=websocket_id, player_name=f"bot{i}"
+            )
+        )
+    apply(StartGameEvent(game_code=game_code, websocket_id="bot-0"))
+
+    while game_state.state == "game" and num_events < max_events:
+        websocket_id, bot = websocket_ids[game_state.current_turn]
+        apply(bot.choose_event(game_state, websocket_id))
+
+    return GameResult(
+        game_state=game_state,
+        num_events=num_events,
+        finished=game_state.state == "ended",
+    )
+
+
+def run_simulation(
+    make_bots: Callable[[], list[Bot]],
+    num_games: int,
+    seed: int | None = None,
+    settings: dict | None = None,
+    max_events: int = DEFAULT_MAX_EVENTS_PER_GAME,
+    leg_odds: bool = False,
+) -> SimulationStats:
+    """
+    Plays `num_games` games back to back, each between a fresh set of bots from `make_bots`.
+    Each game's seed is drawn from the global `random` module, so `seed` seeds it for reproducible runs.
+    """
+    if seed is not None:
+        random.seed(seed)
+
+    stats = SimulationStats()
+    start = time.perf_counter()
+    for _ in range(num_games):
+        result = play_game(
+            make_bots(), settings=settings, max_events=max_events, leg_odds=leg_odds
+        )
+        stats.num_games += 1
+        stats.num_events += result.num_events
+        if result.finished:
+            stats.num_finished_games += 1
+            winning_frog = result.game_state.frog_order[0]
+            stats.winning_frogs[winning_frog] = (
+                stats.winning_frogs.get(winning_frog, 0) + 1
+            )
+    stats.elapsed_seconds = time.perf_counter() - start
+    return stats
@@ -0,0 +1,121 @@
+from dataclasses import dataclass
+import functools
+import time
+
+from game_state.state import GameState
+
+DEFAULT_PROFILED_METHODS = (
+    "move_frog",
+    "_move_frog",
+    "_use_spectator_tile",
+    "_next_turn",
+    "_next_round",
+    "_end_game",
+    "_calculate_leg_bets",
+    "_calculate_overall_bets",
+    "_calculate_stats",
+    "_reset_leg_bets",
+    "_reset_spectator_tiles",
+    "_get_frog_position",
+    "frog_order",
+    "make_leg_bet",
+    "make_overall_bet",
+    "place_spectator_tile",
+    "is_valid_spectator_tile_placement",
+    "spectator_tile_placements",
+    "check_turn",
+    "create_players",
+    "create_track",
+    "create_frogs",
+    "start_game",
+    "reset_game",
+)
+
+
+@dataclass
+class MethodStats:
+    name: str
+    calls: int = 0
+    # including the time spent in other profiled methods it called
+    total_seconds: float = 0.0
+    self_seconds: float = 0.0
+
+
+class MethodProfiler:
+    """
+    Times GameState methods (and properties) while active, by swapping them for timing wrappers on the class.
+
+        with MethodProfiler() as profiler:
+            ...
+        print(profiler.report())
+    """
+
+    def __init__(self, cls: type = GameState, names=DEFAULT_PROFILED_METHODS):
+        self._cls = cls
+        self._names = names
+        self._originals: dict[str, object] = {}
+        # time spent in profiled callees of every active call, innermost last
+        self._child_seconds: list[float] = []
+        self.stats: dict[str, MethodStats] = {name: MethodStats(name) for name in names}
+
+    def _wrap(self, name: str, fn):
+        stats = self.stats[name]
+        child_seconds = self._child_seconds
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            child_seconds.append(0.0)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = child_seconds.pop()
+                stats.calls += 1
+                stats.total_seconds += elapsed
+                stats.self_seconds += elapsed - children
+                if child_seconds:
+                    child_seconds[-1] += elapsed
+
+        return wrapper
+
+    def __enter__(self) -> "MethodProfiler":
+        for name in self._names:
+            original = self._cls.__dict__[name]
+            self._originals[name] = original
+            if isinstance(original, property):
+                wrapped = property(self._wrap(name, original.fget))
+            elif isinstance(original, staticmethod):
+                wrapped = staticmethod(self._wrap(name, original.__func__))
+            else:
+                wrapped = self._wrap(name, original)
+            setattr(self._cls, name, wrapped)
+        return self
+
+    def __exit__(self, *exc_info):
+        for name, original in self._originals.items():
+            setattr(self._cls, name, original)
+        self._originals.clear()
+
+    def report(self, total_seconds: float | None = None) -> str:
+        rows = sorted(
+            (stats for stats in self.stats.values() if stats.calls > 0),
+            key=lambda stats: stats.self_seconds,
+            reverse=True,
+        )
+        lines = [
+            f"{'method':<40} {'calls':>10} {'total (ms)':>12} {'self (ms)':>12}"
+            f" {'per call (us)':>14} {'self %':>7}"
+        ]
+        for stats in rows:
+            share = (
+                f"{stats.self_seconds / total_seconds * 100:>6.1f}%"
+                if total_seconds
+                else f"{'':>7}"
+            )
+            lines.append(
+                f"{stats.name:<40} {stats.calls:>10} {stats.total_seconds * 1e3:>12.1f}"
+                f" {stats.self_seconds * 1e3:>12.1f}"
+                f" {stats.total_seconds / stats.calls * 1e6:>14.1f} {share}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,179 @@
+"""
+Load test of the real HTTP and websocket endpoints: N games x M players x S spectators.
+
+Each game is hosted with /leapfrog/host and joined with create-player and create-spectator, then
+every client connects to /leapfrog/game/{code}. Players take random legal turns after a random
+think time, and the host restarts the game once it ends. Latency is from a player sending an
+event to each player of its game getting the state with it, and separately to each spectator.
+
+Without --url, the backend is started on a free localhost port, as `main:app` or with --shards
+as a cluster.py deployment, or with --in-process in a thread of this process.
+
+    python -m loadtest --games 100 --players 4 --spectators 2 --duration 30
+    python -m loadtest --url http://127.0.0.1:8000 --max-p99-ms 250 --max-errors 0
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import random
+import sys
+import time
+
+import httpx
+
+from loadtest.client import LoadGame, LoadStats
+from loadtest.server import in_process_server, local_server
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else float("nan")
+
+
+async def run_load(url: str, args) -> tuple[LoadStats, float]:
+    stats = LoadStats()
+    rng = random.Random(args.seed)
+    async with httpx.AsyncClient(base_url=url, timeout=10.0) as http:
+        games = [
+            LoadGame(
+                http,
+                url.replace("http", "ws", 1),
+                stats,
+                args.players,
+                args.spectators,
+                args.think_time,
+                args.protocol,
+                args.encoding,
+                args.compression,
+                random.Random(rng.getrandbits(64)),
+            )
+            for _ in range(args.games)
+        ]
+        # joining is not what is measured, but thousands of connects at once would time out
+        setup_slots = asyncio.Semaphore(args.setup_concurrency)
+
+        async def setup(game: LoadGame) -> bool:
+            async with setup_slots:
+                return await game.setup()
+
+        ready = await asyncio.gather(*(setup(game) for game in games))
+        games = [game for game, ok in zip(games, ready) if ok]
+        # the snapshots sent on connect
+        stats.broadcasts = stats.broadcast_bytes = 0
+
+        start = time.perf_counter()
+        await asyncio.gather(*(game.start() for game in games))
+        await asyncio.sleep(args.duration)
+        elapsed = time.perf_counter() - start
+
+        for game in games:
+            game.stopped = True
+        # everything sent by now has `timeout` seconds to reach every client
+        await asyncio.sleep(args.timeout)
+        for game in games:
+            game.count_missed(before=float("inf"))
+        await asyncio.gather(*(game.close() for game in games))
+    return stats, elapsed
+
+
+def format_latencies(latencies: list[float]) -> str:
+    return (
+        f"p50 {percentile(latencies, 0.5) * 1e3:.1f}"
+        f", p95 {percentile(latencies, 0.95) * 1e3:.1f}"
+        f", p99 {percentile(latencies, 0.99) * 1e3:.1f}"
+        f", max {max(latencies, default=float('nan')) * 1e3:.1f}"
+        f" ({len(latencies)} samples)"
+    )
+
+
+def report(stats: LoadStats, elapsed: float, args) -> list[str]:
+    """Prints the results and returns the release gates they failed."""
+    latencies = stats.latencies
+    num_errors = sum(stats.errors.values())
+    print(
+        f"clients:       {args.games} games x ({args.players} players"
+        f" + {args.spectators} spectators), {args.protocol} protocol, {args.encoding}"
+        + (f", {args.compression}" if args.compression else "")
+    )
+    print(f"events:        {stats.events_sent} ({stats.events_sent / elapsed:.0f}/s)")
+    print(f"broadcasts:    {stats.broadcasts} ({stats.broadcasts / elapsed:.0f}/s)")
+    print(
+        f"bytes/bc:      {stats.broadcast_bytes / max(stats.broadcasts, 1):.0f}"
+        f" ({stats.broadcast_bytes / elapsed / 1e6:.2f} MB/s)"
+    )
+    print(f"latency ms:    {format_latencies(latencies)}")
+    if stats.spectator_latencies:
+        print(f"spectators ms: {format_latencies(stats.spectator_latencies)}")
+    print(
+        f"errors:        {num_errors}"
+        + "".join(f", {kind} {count}" for kind, count in sorted(stats.errors.items()))
+    )
+
+    failed = []
+    if args.max_p99_ms is not None and not (
+        percentile(latencies, 0.99) * 1e3 <= args.max_p99_ms
+    ):
+        failed.append(f"p99 latency over {args.max_p99_ms} ms")
+    if args.max_errors is not None and num_errors > args.max_errors:
+        failed.append(f"more than {args.max_errors} errors")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description=__doc__)
+    parser.add_argument("--url", help="base url of a running backend, e.g. http://127.0.0.1:8000")
+    parser.add_argument(
+        "--in-process", action="store_true", help="run the backend in a thread of this process"
+    )
+    parser.add_argument(
+        "--shards", type=int, default=1, help="shards of the backend started without --url"
+    )
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--spectators", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of play")
+    parser.add_argument(
+        "--think-time", type=float, default=1.0, help="mean seconds before a player's turn"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=5.0,
+        help="seconds an event's state has to reach every client before it counts as missed",
+    )
+    parser.add_argument("--protocol", choices=["full", "delta"], default="full")
+    parser.add_argument("--encoding", choices=["json", "msgpack"], default="json")
+    parser.add_argument(
+        "--compression",
+        choices=["zlib"],
+        default=None,
+        help="shared zlib compression instead of permessage-deflate on every socket",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--setup-concurrency", type=int, default=50)
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="fail above this p99")
+    parser.add_argument("--max-errors", type=int, default=None, help="fail above this many errors")
+    args = parser.parse_args()
+
+    # the backend's per-event logging, when it runs in this process
+    logging.disable(logging.INFO)
+
+    if args.url is not None:
+        server = contextlib.nullcontext(args.url.rstrip("/"))
+    elif args.in_process:
+        server = in_process_server()
+    else:
+        server = local_server(args.shards)
+    with server as url:
+        stats, elapsed = asyncio.run(run_load(url, args))
+
+    failed = report(stats, elapsed, args)
+    if failed:
+        print("FAILED: " + ", ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
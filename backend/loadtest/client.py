@@ -0,0 +1,303 @@
+import asyncio
+from dataclasses import dataclass, field
+import hashlib
+import random
+import time
+import zlib
+
+import httpx
+import orjson
+import ormsgpack
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+from api.requests import MSGPACK_SUBPROTOCOL
+from game_state.snapshot import apply_patch
+
+
+@dataclass
+class LoadStats:
+    """What every simulated client saw, in one place since they all run on one event loop."""
+
+    events_sent: int = 0
+    broadcasts: int = 0
+    broadcast_bytes: int = 0
+    # seconds from a client sending an event to each player of its game getting the state with it,
+    # and to each spectator, who only gets sampled states
+    latencies: list[float] = field(default_factory=list)
+    spectator_latencies: list[float] = field(default_factory=list)
+    errors: dict[str, int] = field(default_factory=dict)
+
+    def error(self, kind: str, count: int = 1):
+        self.errors[kind] = self.errors.get(kind, 0) + count
+
+
+@dataclass
+class SentEvent:
+    sent_at: float
+    num_received: int = 0
+
+
+class LoadGame:
+    """
+    One game driven through the real endpoints: its players take legal turns, the host restarts
+    it once it ends, and every client records when it gets the state with each event in it.
+
+    Every turn adds at least one update to the game's update log, whose sequence numbers keep
+    counting across restarts, so an event is identified by the seq of the first update it adds.
+    """
+
+    def __init__(
+        self,
+        http: httpx.AsyncClient,
+        ws_url: str,
+        stats: LoadStats,
+        num_players: int,
+        num_spectators: int,
+        think_time: float,
+        protocol: str,
+        encoding: str,
+        compression: str | None,
+        rng: random.Random,
+    ):
+        self._http = http
+        self._ws_url = ws_url
+        self._stats = stats
+        self._num_players = num_players
+        self._num_spectators = num_spectators
+        self._think_time = think_time
+        self._protocol = protocol
+        self._use_msgpack = encoding == "msgpack"
+        self._compression = compression
+        self._rng = rng
+        self.game_code = ""
+        self.clients: list["LoadClient"] = []
+        self._sent: dict[int, SentEvent] = {}
+        # the last update seq of the last ended play-through the host restarted
+        self._restarted_seq = -1
+        # set once the run is over, so no more events are sent
+        self.stopped = False
+
+    async def setup(self) -> bool:
+        """Hosts the game and joins and connects every client. Returns whether all of it worked."""
+        try:
+            response = await self._http.post("/leapfrog/host")
+            response.raise_for_status()
+            self.game_code = response.json()["game_code"]
+            websocket_ids = []
+            for i in range(self._num_players):
+                response = await self._http.post(
+                    f"/leapfrog/game/{self.game_code}/create-player",
+                    json={"name": f"load{i}"},
+                )
+                response.raise_for_status()
+                websocket_ids.append((response.json()["websocket_id"], True))
+            for _ in range(self._num_spectators):
+                response = await self._http.post(
+                    f"/leapfrog/game/{self.game_code}/create-spectator"
+                )
+                response.raise_for_status()
+                websocket_ids.append((response.json()["websocket_id"], False))
+        except (httpx.HTTPError, KeyError, ValueError):
+            self._stats.error("http")
+            return False
+
+        self.clients = [
+            LoadClient(self, websocket_id, is_player)
+            for websocket_id, is_player in websocket_ids
+        ]
+        connected = await asyncio.gather(*(client.connect() for client in self.clients))
+        return all(connected)
+
+    async def start(self):
+        await self.clients[0].send({"type": "start_game"})
+
+    async def _restart(self):
+        if self.stopped:
+            return
+        await self.clients[0].send({"type": "end_game"})
+        await self.start()
+
+    def count_missed(self, before: float):
+        """Counts every client that never got the state of an event sent before `before`."""
+        for seq, sent in list(self._sent.items()):
+            if sent.sent_at < before:
+                self._stats.error("missed_broadcast", len(self.clients) - sent.num_received)
+                del self._sent[seq]
+
+    async def close(self):
+        await asyncio.gather(*(client.close() for client in self.clients))
+
+    def on_state(self, client: "LoadClient", game_state: dict, last_seq: int):
+        now = time.perf_counter()
+        latencies = (
+            self._stats.latencies if client.is_player else self._stats.spectator_latencies
+        )
+        for seq in range(client.last_seq + 1, last_seq + 1):
+            sent = self._sent.get(seq)
+            if sent is not None:
+                sent.num_received += 1
+                latencies.append(now - sent.sent_at)
+                if sent.num_received == len(self.clients):
+                    del self._sent[seq]
+        client.last_seq = max(client.last_seq, last_seq)
+
+        if game_state["state"] == "ended":
+            if client is self.clients[0] and self._restarted_seq != client.last_seq:
+                self._restarted_seq = client.last_seq
+                asyncio.create_task(self._restart())
+        elif (
+            client.is_player
+            and game_state["state"] == "game"
+            and game_state["current_turn"] == client.player_id
+            and client.acted_seq != client.last_seq
+        ):
+            client.acted_seq = client.last_seq
+            asyncio.create_task(self._take_turn(client, game_state, client.last_seq + 1))
+
+    async def _take_turn(self, client: "LoadClient", game_state: dict, seq: int):
+        await asyncio.sleep(self._rng.expovariate(1 / self._think_time))
+        if self.stopped:
+            return
+        event = self._choose_event(client, game_state)
+        self._sent[seq] = SentEvent(time.perf_counter())
+        await client.send(event)
+
+    def _choose_event(self, client: "LoadClient", game_state: dict) -> dict:
+        """A random legal action, like RandomBot, from the JSON state the client got."""
+        rng = self._rng
+        player = game_state["players"][client.player_id]
+        bettable_frogs = [
+            idx for idx, leg_bets in enumerate(game_state["leg_bets"]) if leg_bets
+        ]
+        unbet_frogs = [
+            idx for idx, bet in enumerate(player["overall_bets"]) if bet == "none"
+        ]
+        roll = rng.random()
+        if bettable_frogs and roll < 0.25:
+            return {"type": "leg_bet", "frogIdx": rng.choice(bettable_frogs)}
+        if unbet_frogs and roll < 0.3:
+            return {
+                "type": "overall_bet",
+                "frogIdx": rng.choice(unbet_frogs),
+                "betType": rng.choice(["winner", "loser"]),
+            }
+        return {"type": "move_frog"}
+
+
+class LoadClient:
+    """One player or spectator websocket of a LoadGame."""
+
+    def __init__(self, game: LoadGame, websocket_id: str, is_player: bool):
+        self.game = game
+        self.websocket_id = websocket_id
+        self.is_player = is_player
+        # same as GameState._get_player_id
+        self.player_id = hashlib.sha256(websocket_id.encode()).hexdigest()[:8]
+        # the highest update seq the client has seen, and the one it last took a turn at
+        self.last_seq = -1
+        self.acted_seq = -2
+        self.connected = asyncio.Event()
+        self._websocket: ClientConnection | None = None
+        self._task: asyncio.Task | None = None
+        self._game_state: dict | None = None
+        self._version: int | None = None
+        self._closing = False
+
+    async def connect(self) -> bool:
+        game = self.game
+        query = f"websocket_id={self.websocket_id}"
+        if game._protocol == "delta":
+            query += "&protocol=delta"
+        if game._compression is not None:
+            query += f"&compression={game._compression}"
+        try:
+            self._websocket = await connect(
+                f"{game._ws_url}/leapfrog/game/{game.game_code}?{query}",
+                subprotocols=[MSGPACK_SUBPROTOCOL] if game._use_msgpack else None,
+                # frames are already compressed, or not when compression would not pay
+                compression=None if game._compression is not None else "deflate",
+                max_size=None,
+            )
+        except (OSError, InvalidHandshake, asyncio.TimeoutError):
+            game._stats.error("connect")
+            return False
+        if game._use_msgpack and self._websocket.subprotocol != MSGPACK_SUBPROTOCOL:
+            game._stats.error("connect")
+            await self._websocket.close()
+            return False
+        self._task = asyncio.create_task(self._receive())
+        # the snapshot sent on connect
+        await self.connected.wait()
+        return True
+
+    async def send(self, message: dict):
+        """Sends an event the way the frontend does, see frontend/src/api/events.ts."""
+        message = {
+            **message,
+            "gameCode": self.game.game_code,
+            "websocketId": self.websocket_id,
+        }
+        try:
+            await self._websocket.send(self._dumps(message))
+        except ConnectionClosed:
+            self.game._stats.error("send")
+            return
+        self.game._stats.events_sent += 1
+
+    async def _receive(self):
+        stats = self.game._stats
+        try:
+            async for message in self._websocket:
+                stats.broadcasts += 1
+                stats.broadcast_bytes += len(message)
+                # zlib streams start with 0x78, MessagePack messages are maps (0x80-0x8f)
+                if isinstance(message, bytes) and message[:1] == b"\x78":
+                    message = zlib.decompress(message)
+                if self.game._use_msgpack:
+                    self._read(ormsgpack.unpackb(message))
+                else:
+                    self._read(orjson.loads(message))
+        except ConnectionClosed:
+            pass
+        if not self._closing:
+            stats.error("disconnect")
+        self.connected.set()
+
+    def _dumps(self, message: dict) -> str | bytes:
+        if self.game._use_msgpack:
+            return ormsgpack.packb(message)
+        return orjson.dumps(message).decode()
+
+    def _read(self, message: dict):
+        # MessagePack states leave out the frogs and settings, which turns don't depend on,
+        # so the "static" block that comes with them when they change is not kept
+        if message.get("kind") == "patch":
+            if message["base_version"] != self._version:
+                self.game._stats.error("resync")
+                asyncio.create_task(self._resync())
+                return
+            self._game_state = apply_patch(self._game_state, message["patch"])
+            self._version = message["version"]
+            updates = message["updates"]
+        else:
+            # a full state, or a delta snapshot
+            self._game_state = message["game_state"]
+            self._version = message.get("version")
+            updates = self._game_state["updates"]
+        self.connected.set()
+        last_seq = updates[-1]["seq"] if updates else self.last_seq
+        self.game.on_state(self, self._game_state, last_seq)
+
+    async def _resync(self):
+        try:
+            await self._websocket.send(self._dumps({"type": "resync"}))
+        except ConnectionClosed:
+            pass
+
+    async def close(self):
+        self._closing = True
+        if self._websocket is not None:
+            await self._websocket.close()
+        if self._task is not None:
+            await self._task
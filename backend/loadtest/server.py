@@ -0,0 +1,112 @@
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Iterator
+
+import httpx
+import uvicorn
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STARTUP_TIMEOUT_SECONDS = 30.0
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, timeout: float = DEFAULT_STARTUP_TIMEOUT_SECONDS):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            httpx.get(f"{url}/docs", timeout=1.0)
+            return
+        except httpx.TransportError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server at {url} did not start in {timeout} s")
+            time.sleep(0.1)
+
+
+@contextlib.contextmanager
+def local_server(shards: int = 1, env: dict[str, str] | None = None) -> Iterator[str]:
+    """
+    Runs the backend on a free localhost port in child processes, a single `main:app` or a
+    cluster.py deployment with `shards` shards, and yields its base url.
+    """
+    port = free_port()
+    shard_base_port = free_port()
+    if shards > 1:
+        command = [
+            sys.executable,
+            "cluster.py",
+            "--shards",
+            str(shards),
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--shard-base-port",
+            str(shard_base_port),
+        ]
+    else:
+        command = [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ]
+    process = subprocess.Popen(
+        command,
+        cwd=BACKEND_DIR,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(url)
+        if shards > 1:
+            # the router answers before every shard is up
+            for shard_index in range(shards):
+                wait_until_ready(f"http://127.0.0.1:{shard_base_port + shard_index}")
+        yield url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+@contextlib.contextmanager
+def in_process_server() -> Iterator[str]:
+    """
+    Runs `main:app` on a free localhost port in a thread of this process and yields its base url.
+    The server shares the interpreter with the load generator, so latencies are pessimistic.
+    """
+    port = free_port()
+    sys.path.insert(0, BACKEND_DIR)
+    server = uvicorn.Server(
+        uvicorn.Config("main:app", host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(url)
+        yield url
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
@@ -1,18 +1,43 @@
 from contextlib import asynccontextmanager
 import random
 import re
-from fastapi import APIRouter, Depends, FastAPI, Response, WebSocket, status
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import (
+    APIRouter,
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Request,
+    Response,
+    WebSocket,
+    status,
+)
+from fastapi.responses import StreamingResponse
 import asyncio
 import logging
+import os
+import secrets
 import threading
 import uuid
 
-import starlette
-
-from api.requests import CreatePlayerRequest, JoinGameRequest
-from game_state.events import Event, EventAdapter, PlayerJoinEvent, SpectatorJoinEvent
-from game_state.game import GameManager
+from pydantic import ValidationError
+
+from api.cors import add_cors
+from api.requests import (
+    MAX_MESSAGE_BYTES,
+    MSGPACK_SUBPROTOCOL,
+    CreatePlayerRequest,
+    JoinGameRequest,
+    ResyncRequest,
+    is_too_big,
+    parse_client_message,
+)
+from game_state.events import PlayerJoinEvent, SpectatorJoinEvent
+from game_state.game import EventBatching, GameManager
+from game_state.wal import WriteAheadLog
+from utils.metrics import CONTENT_TYPE, REGISTRY
+from utils.profiling import SamplingProfiler, StallDetector
+from utils.sharding import shard_for
 
 
 logging.basicConfig(
@@ -20,15 +45,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# in a sharded deployment (see cluster.py) this process only owns the game codes of its shard
+SHARD_INDEX = int(os.environ.get("SHARD_INDEX", 0))
+NUM_SHARDS = int(os.environ.get("NUM_SHARDS", 1))
+# race odds worker processes of this shard, so that all the shards together start one per CPU
+# rather than one per CPU each
+RACE_ODDS_WORKERS = max((os.cpu_count() or 1) // NUM_SHARDS, 1)
+# directory of the write-ahead logs that games are recovered from on startup, off when unset
+WAL_DIR = os.environ.get("WAL_DIR")
+# how games turn queued events into broadcasts, see EventBatching
+EVENT_BATCHING = EventBatching(
+    mode=os.environ.get("EVENT_BATCHING", "adaptive"),
+    tick_interval=float(os.environ.get("TICK_INTERVAL_MS", 50)) / 1000,
+)
+# how long server-side bots wait before taking their turn
+BOT_DELAY = float(os.environ.get("BOT_DELAY_MS", 1000)) / 1000
+# bearer token of the /admin endpoints, which don't exist when it is unset
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+# event loop stalls longer than this are logged from startup, off when unset
+SLOW_CALLBACK_MS = os.environ.get("SLOW_CALLBACK_MS")
+MAX_PROFILE_SECONDS = 600
+# games a memory report walks at most, one event loop step each
+MAX_MEMORY_SAMPLE = 100
+# spectators get at most this many states a second, and a game takes at most MAX_SPECTATORS
+# spectator websockets at a time, see SpectatorTier
+SPECTATOR_MAX_RATE = float(os.environ.get("SPECTATOR_UPDATES_PER_SECOND", 2))
+MAX_SPECTATORS = int(os.environ.get("MAX_SPECTATORS", 2000))
+
+
+def make_wal() -> WriteAheadLog | None:
+    if not WAL_DIR:
+        return None
+    if NUM_SHARDS > 1:
+        return WriteAheadLog(os.path.join(WAL_DIR, f"shard-{SHARD_INDEX}"))
+    return WriteAheadLog(WAL_DIR)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Lifespan setup started")
 
-    manager = GameManager()
+    wal = make_wal()
+    manager = GameManager(
+        race_odds_workers=RACE_ODDS_WORKERS,
+        wal=wal,
+        batching=EVENT_BATCHING,
+        bot_delay=BOT_DELAY,
+        spectator_max_rate=SPECTATOR_MAX_RATE,
+        max_spectators=MAX_SPECTATORS,
+    )
+    await manager.recover_games()
     app.state.state_manager = manager
-    game_loop_task = asyncio.create_task(manager.run())
     purge_task = asyncio.create_task(manager.purge_games())
+    background_tasks = [purge_task]
+    if wal is not None:
+        background_tasks.append(asyncio.create_task(wal.run()))
+    app.state.profiler = SamplingProfiler()
+    app.state.stall_detector = StallDetector()
+    if SLOW_CALLBACK_MS:
+        app.state.stall_detector.start(float(SLOW_CALLBACK_MS) / 1000)
 
     logger.info("Lifespan setup completed")
 
@@ -36,14 +111,20 @@ async def lifespan(app: FastAPI):
 
     logger.info("Lifespan teardown started")
 
-    game_loop_task.cancel()
-    purge_task.cancel()
+    app.state.profiler.stop()
+    app.state.stall_detector.stop()
+    for task in background_tasks:
+        task.cancel()
 
     try:
-        await asyncio.gather(game_loop_task, purge_task, return_exceptions=True)
+        await asyncio.gather(*background_tasks, return_exceptions=True)
     except asyncio.CancelledError:
         pass
 
+    if wal is not None:
+        # the logs are kept, so the next start picks the games back up
+        await wal.close()
+    manager.shutdown()
     if hasattr(app.state, "state_manager"):
         del app.state.state_manager
 
@@ -52,28 +133,7 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(lifespan=lifespan)
 
-import os
-
-# Determine CORS origins via ALLOWED_ORIGINS env var (comma separated). Fall back to common dev origins.
-_allowed = os.environ.get("ALLOWED_ORIGINS")
-if _allowed:
-    origins = [s.strip() for s in _allowed.split(",") if s.strip()]
-else:
-    origins = [
-        "http://localhost",
-        "http://localhost:3000",  # Common React dev port
-        "http://localhost:5173",  # Common Vite dev port (matching your error)
-        "http://127.0.0.1:5173",
-        "http://127.0.0.1",
-    ]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,  # Allow the specific origins defined above
-    allow_credentials=True,  # Allow cookies/authorization headers
-    allow_methods=["*"],  # Allow all methods (GET, POST, etc.)
-    allow_headers=["*"],  # Allow all headers
-)
+add_cors(app)
 
 
 prefix_router = APIRouter(prefix="/leapfrog")
@@ -116,6 +176,14 @@ async def join_game(
     }
 
 
+def generate_game_code() -> str:
+    """A random game code owned by this shard, so the router sends its requests back here."""
+    while True:
+        game_code = f"{random.randint(0, 999999):06d}"
+        if shard_for(game_code, NUM_SHARDS) == SHARD_INDEX:
+            return game_code
+
+
 @prefix_router.post("/host", status_code=status.HTTP_201_CREATED)
 async def host_game(
     response: Response, state_manager: GameManager = Depends(get_state_manager)
@@ -123,7 +191,7 @@ async def host_game(
     """Creates a new game and returns the game code. Fails if unable to generate a unique game_code after num_tries"""
     num_tries = 5
     while num_tries > 0:
-        game_code = f"{random.randint(0, 999999):06d}"
+        game_code = generate_game_code()
         if await state_manager.create_game_state(game_code):
             break
 
@@ -162,6 +230,9 @@ async def create_player(
     if game_state.state != "lobby":
         return {"success": False, "message": "Game is currently ongoing."}
 
+    if game_state.is_full:
+        return {"success": False, "message": "The game has too many players already."}
+
     websocket_id = str(uuid.uuid4())[:8]
     await state_manager.add_event(
         PlayerJoinEvent(
@@ -188,6 +259,8 @@ async def create_spectator(
         return {"success": False, "message": f"Game code {game_code} does not exist"}
 
     websocket_id = str(uuid.uuid4())[:8]
+    if not await state_manager.reserve_spectator(game_code, websocket_id):
+        return {"success": False, "message": "The game has too many spectators already."}
     await state_manager.add_event(
         SpectatorJoinEvent(gameCode=game_code, websocket_id=websocket_id)
     )
@@ -198,6 +271,32 @@ async def create_spectator(
     }
 
 
+@prefix_router.get("/game/{game_code}/stream", status_code=status.HTTP_200_OK)
+async def stream_game(
+    game_code: str,
+    response: Response,
+    last_event_id: str | None = Header(None),
+    state_manager: GameManager = Depends(get_state_manager),
+):
+    """
+    Server-Sent Events for read-only watchers: a spectator snapshot, then a patch for every
+    version, sent at most SPECTATOR_UPDATES_PER_SECOND times a second. Event ids are versions,
+    so EventSource resumes after the last one it got with `Last-Event-ID`.
+    """
+    frame_buffer = state_manager.get_frame_buffer(game_code)
+    if frame_buffer is None:
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return {"success": False, "message": f"Game code {game_code} does not exist"}
+
+    cursor = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    return StreamingResponse(
+        frame_buffer.watch(cursor, 1 / SPECTATOR_MAX_RATE),
+        media_type="text/event-stream",
+        # stops nginx from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # @prefix_router.post("/game/{game_code}/kick-player", status_code=status.HTTP_200_OK)
 # async def kick_player(
 #     game_code: str,
@@ -213,15 +312,101 @@ async def create_spectator(
 #         return {"success": False, "message": "Cannot kick players during game."}
 
 
-async def send_game_state(
-    websocket: WebSocket, state_manager: GameManager, game_code: str, websocket_id: str
+def require_admin(authorization: str | None = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    if authorization is None or not secrets.compare_digest(
+        authorization.encode(), f"Bearer {ADMIN_TOKEN}".encode()
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+
+
+admin_router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@admin_router.get("/metrics", status_code=status.HTTP_200_OK)
+async def metrics(state_manager: GameManager = Depends(get_state_manager)):
+    """
+    Every metric in utils/metrics.py, in the Prometheus text format. It is behind the admin
+    token since the queue depth gauges are labelled by game code, which is all it takes to join.
+    """
+    state_manager.collect_metrics()
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@admin_router.get("/memory", status_code=status.HTTP_200_OK)
+async def memory_report(
+    sample: int = MAX_MEMORY_SAMPLE,
+    state_manager: GameManager = Depends(get_state_manager),
 ):
-    game_state = await state_manager.get_game_state(game_code)
-    if game_state is None:
-        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-        return
-    print("ws", game_state)
-    await websocket.send_json(game_state.make_websocket_response(websocket_id))
+    """Approximate bytes per game by component, averaged over up to `sample` games."""
+    sample = min(max(sample, 1), MAX_MEMORY_SAMPLE)
+    return await state_manager.memory_report(sample=sample)
+
+
+@admin_router.post("/profiler/start", status_code=status.HTTP_200_OK)
+async def start_profiler(
+    request: Request, response: Response, seconds: float = 30, interval_ms: float = 5
+):
+    """Samples the event loop's stack every `interval_ms` for `seconds`."""
+    profiler: SamplingProfiler = request.app.state.profiler
+    if profiler.running:
+        response.status_code = status.HTTP_409_CONFLICT
+        return {"success": False, "message": "The profiler is already running"}
+    if not 0 < seconds <= MAX_PROFILE_SECONDS or interval_ms < 1:
+        response.status_code = status.HTTP_400_BAD_REQUEST
+        return {
+            "success": False,
+            "message": f"Profile for up to {MAX_PROFILE_SECONDS} s, sampling at most every 1 ms",
+        }
+    # endpoints run on the event loop's thread
+    profiler.start(threading.get_ident(), seconds, interval_ms / 1000)
+    return {"success": True, "message": f"Profiling for {seconds} s"}
+
+
+@admin_router.post("/profiler/stop", status_code=status.HTTP_200_OK)
+async def stop_profiler(request: Request):
+    profiler: SamplingProfiler = request.app.state.profiler
+    profiler.stop()
+    return {"success": True, "num_samples": profiler.num_samples}
+
+
+@admin_router.get("/profiler/profile", status_code=status.HTTP_200_OK)
+async def download_profile(request: Request):
+    """The samples of the last (or current) run as folded stacks, e.g. for flamegraph.pl."""
+    profiler: SamplingProfiler = request.app.state.profiler
+    return Response(
+        profiler.folded(),
+        media_type="text/plain",
+        headers={"Content-Disposition": 'attachment; filename="profile.folded"'},
+    )
+
+
+@admin_router.post("/slow-callbacks/start", status_code=status.HTTP_200_OK)
+async def start_stall_detector(
+    request: Request, response: Response, threshold_ms: float = 100
+):
+    """Logs every time the event loop is blocked for longer than `threshold_ms`."""
+    if threshold_ms < 1:
+        response.status_code = status.HTTP_400_BAD_REQUEST
+        return {"success": False, "message": "The threshold must be at least 1 ms"}
+    request.app.state.stall_detector.start(threshold_ms / 1000)
+    return {"success": True, "message": f"Logging event loop stalls over {threshold_ms} ms"}
+
+
+@admin_router.post("/slow-callbacks/stop", status_code=status.HTTP_200_OK)
+async def stop_stall_detector(request: Request):
+    stall_detector: StallDetector = request.app.state.stall_detector
+    stall_detector.stop()
+    return {"success": True, "num_stalls": stall_detector.num_stalls}
+
+
+def parse_updates_cursor(value) -> int | None:
+    """Sequence number of the last update a client already has, if it sent a valid one."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 
 @prefix_router.websocket("/game/{game_code}")
@@ -235,30 +420,83 @@ async def game_websocket(
         return
 
     websocket_id = websocket.query_params["websocket_id"]
-    await websocket.accept()
-    await state_manager.add_websocket(
-        game_code=game_code, websocket_id=websocket_id, websocket=websocket
-    )
+    # "delta" clients get a versioned snapshot on connect and patches after that
+    use_delta = websocket.query_params.get("protocol") == "delta"
+    # "zlib" clients get all but small messages as compressed binary frames
+    use_compression = websocket.query_params.get("compression") == "zlib"
+    updates_cursor = parse_updates_cursor(websocket.query_params.get("updates_cursor"))
+    # clients that don't offer the MessagePack subprotocol keep getting JSON
+    use_msgpack = MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", ())
+    await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if use_msgpack else None)
+    # the websocket's writer sends the current state as soon as it is registered
+    if not await state_manager.add_websocket(
+        game_code=game_code,
+        websocket_id=websocket_id,
+        websocket=websocket,
+        use_delta=use_delta,
+        updates_cursor=updates_cursor if use_delta else None,
+        use_msgpack=use_msgpack,
+        use_compression=use_compression,
+    ):
+        # the game doesn't exist, or it has as many spectators as it takes
+        game_exists = await state_manager.get_game_state(game_code) is not None
+        await websocket.close(
+            code=status.WS_1013_TRY_AGAIN_LATER
+            if game_exists
+            else status.WS_1008_POLICY_VIOLATION
+        )
+        return
+
+    try:
+        await receive_messages(websocket, game_code, websocket_id, use_msgpack, state_manager)
+    finally:
+        await state_manager.release_websocket(game_code, websocket_id, websocket)
 
-    await send_game_state(websocket, state_manager, game_code, websocket_id)
 
+async def receive_messages(
+    websocket: WebSocket,
+    game_code: str,
+    websocket_id: str,
+    use_msgpack: bool,
+    state_manager: GameManager,
+):
+    """Handles a registered websocket's messages until it disconnects."""
     while True:
-        try:
-            event_dict = await websocket.receive_json()
-        except starlette.websockets.WebSocketDisconnect:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
             logger.info(f"Player {websocket_id} disconnected normally.")
             return
+        # parsed straight from the frame, without decoding it to a dict first
+        raw = message.get("text") or message.get("bytes") or b""
+        if is_too_big(raw):
+            logger.warning(
+                f"Closing {websocket_id}, it sent a message over {MAX_MESSAGE_BYTES} bytes"
+            )
+            await websocket.close(code=status.WS_1009_MESSAGE_TOO_BIG)
+            return
         try:
-            print(event_dict)
-            parsed_event: Event = EventAdapter.validate_python(
-                event_dict, by_alias=True
+            parsed = parse_client_message(raw, use_msgpack)
+        except ValidationError as e:
+            logger.warning(
+                f"Rejected a message from {websocket_id}: {e.errors(include_url=False)[0]['msg']}"
+            )
+            continue
+        except ValueError as e:
+            # not MessagePack
+            logger.warning(f"Rejected a message from {websocket_id}: {e!r}")
+            continue
+
+        if isinstance(parsed, ResyncRequest):
+            # client missed a version, send it a full snapshot again
+            await state_manager.resync_websocket(
+                game_code, websocket_id, parsed.updatesCursor
             )
-            print(parsed_event)
-            parsed_event.websocket_id = websocket_id
-            await state_manager.add_event(parsed_event)
-        except Exception as e:
-            logger.error(f"Failed to parse event: {e}")
             continue
+        # events act for this websocket in this game, whatever the message says
+        parsed.websocket_id = websocket_id
+        parsed.game_code = game_code
+        await state_manager.add_event(parsed)
 
 
 app.include_router(prefix_router)
+app.include_router(admin_router)
@@ -0,0 +1,235 @@
+"""
+Front router for a sharded deployment (see cluster.py).
+
+Every game lives in exactly one shard process, picked from its game code with shard_for.
+The router keeps no game state, it only forwards HTTP requests and websocket traffic to the
+owning shard, so it can itself run as several uvicorn workers.
+
+Shards are configured with SHARD_URLS, a comma separated list of base urls in shard index order.
+"""
+
+from contextlib import asynccontextmanager
+import asyncio
+import itertools
+import logging
+import os
+
+from fastapi import APIRouter, FastAPI, Request, Response, WebSocket, status
+from fastapi.responses import StreamingResponse
+import httpx
+import starlette
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+from api.cors import add_cors
+from utils.sharding import shard_for
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# hop-by-hop and recomputed headers that must not be copied between the two connections
+_SKIPPED_HEADERS = {"host", "content-length", "connection", "transfer-encoding"}
+
+
+def get_shard_urls() -> list[str]:
+    shard_urls = [
+        url.strip().rstrip("/")
+        for url in os.environ.get("SHARD_URLS", "").split(",")
+        if url.strip()
+    ]
+    if not shard_urls:
+        raise RuntimeError("SHARD_URLS is not set")
+    return shard_urls
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.shard_urls = get_shard_urls()
+    app.state.http_client = httpx.AsyncClient(timeout=10.0)
+    # new games are spread over the shards in turn
+    app.state.next_host_shard = itertools.count()
+    logger.info(f"Routing to {len(app.state.shard_urls)} shard(s)")
+
+    yield
+
+    await app.state.http_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+add_cors(app)
+
+
+prefix_router = APIRouter(prefix="/leapfrog")
+
+
+def shard_url_for(game_code: str) -> str:
+    shard_urls = app.state.shard_urls
+    return shard_urls[shard_for(game_code, len(shard_urls))]
+
+
+async def forward(request: Request, shard_url: str, path: str | None = None) -> Response:
+    """Sends the request on to a shard, at the same path unless `path` is given."""
+    response = await app.state.http_client.request(
+        request.method,
+        f"{shard_url}{path or request.url.path}",
+        params=request.query_params,
+        content=await request.body(),
+        headers={
+            key: value
+            for key, value in request.headers.items()
+            if key.lower() not in _SKIPPED_HEADERS
+        },
+    )
+    return Response(
+        content=response.content,
+        status_code=response.status_code,
+        headers={
+            key: value
+            for key, value in response.headers.items()
+            if key.lower() not in _SKIPPED_HEADERS
+        },
+    )
+
+
+@prefix_router.post("/host")
+async def host_game(request: Request):
+    """The shard that hosts the game picks a game code it owns."""
+    shard_urls = app.state.shard_urls
+    shard_url = shard_urls[next(app.state.next_host_shard) % len(shard_urls)]
+    return await forward(request, shard_url)
+
+
+@prefix_router.get("/game/{game_code}/stream")
+async def stream_game(game_code: str, request: Request):
+    """Relays the shard's event stream as it comes, which `forward` would read to the end first."""
+    upstream_request = app.state.http_client.build_request(
+        "GET",
+        f"{shard_url_for(game_code)}{request.url.path}",
+        params=request.query_params,
+        headers={
+            key: value
+            for key, value in request.headers.items()
+            if key.lower() not in _SKIPPED_HEADERS
+        },
+        # a watched game can go quiet for longer than any read timeout
+        timeout=httpx.Timeout(10.0, read=None),
+    )
+    upstream = await app.state.http_client.send(upstream_request, stream=True)
+
+    async def relay():
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await upstream.aclose()
+
+    return StreamingResponse(
+        relay(),
+        status_code=upstream.status_code,
+        headers={
+            key: value
+            for key, value in upstream.headers.items()
+            if key.lower() not in _SKIPPED_HEADERS
+        },
+    )
+
+
+@prefix_router.api_route("/game/{game_code}/{path:path}", methods=["GET", "POST"])
+async def game_request(game_code: str, path: str, request: Request):
+    return await forward(request, shard_url_for(game_code))
+
+
+@prefix_router.websocket("/game/{game_code}")
+async def game_websocket(websocket: WebSocket, game_code: str):
+    shard_url = shard_url_for(game_code).replace("http", "ws", 1)
+    query = f"?{websocket.url.query}" if websocket.url.query else ""
+    try:
+        upstream = await connect(
+            f"{shard_url}{websocket.url.path}{query}",
+            subprotocols=websocket.scope.get("subprotocols") or None,
+            compression=None,
+        )
+    except (OSError, InvalidHandshake) as e:
+        logger.error(f"Could not reach shard {shard_url} for game {game_code}: {e}")
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    await websocket.accept(subprotocol=upstream.subprotocol)
+
+    async def client_to_shard():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("text") is not None:
+                await upstream.send(message["text"])
+            elif message.get("bytes") is not None:
+                await upstream.send(message["bytes"])
+
+    async def shard_to_client():
+        async for message in upstream:
+            if isinstance(message, str):
+                await websocket.send_text(message)
+            else:
+                await websocket.send_bytes(message)
+
+    pumps = [
+        asyncio.create_task(client_to_shard()),
+        asyncio.create_task(shard_to_client()),
+    ]
+    try:
+        await asyncio.wait(pumps, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for pump in pumps:
+            pump.cancel()
+        await asyncio.gather(*pumps, return_exceptions=True)
+        # pass the shard's close code on, e.g. 1008 for an unknown game
+        close_code = upstream.close_code or status.WS_1000_NORMAL_CLOSURE
+        await upstream.close()
+        try:
+            await websocket.close(code=close_code)
+        except (RuntimeError, starlette.websockets.WebSocketDisconnect, ConnectionClosed):
+            # the client is already gone
+            pass
+
+
+@app.get("/admin/memory")
+async def memory_report(request: Request, response: Response):
+    """Every shard's memory report, in shard index order. The shards check the admin token."""
+    headers = {}
+    if "authorization" in request.headers:
+        headers["authorization"] = request.headers["authorization"]
+    reports = await asyncio.gather(
+        *(
+            app.state.http_client.get(
+                f"{shard_url}{request.url.path}",
+                params=request.query_params,
+                headers=headers,
+            )
+            for shard_url in app.state.shard_urls
+        )
+    )
+    for report in reports:
+        if report.status_code != status.HTTP_200_OK:
+            response.status_code = report.status_code
+            return report.json()
+    return {"shards": [report.json() for report in reports]}
+
+
+@app.api_route("/admin/shards/{shard_index}/{path:path}", methods=["GET", "POST"])
+async def shard_admin(shard_index: int, path: str, request: Request, response: Response):
+    """
+    One shard's /admin endpoint, e.g. its /metrics or profiler, which are per process and so
+    are not merged across shards. The shard checks the admin token.
+    """
+    shard_urls = app.state.shard_urls
+    if not 0 <= shard_index < len(shard_urls):
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return {"success": False, "message": f"There is no shard {shard_index}"}
+    return await forward(request, shard_urls[shard_index], f"/admin/{path}")
+
+
+app.include_router(prefix_router)
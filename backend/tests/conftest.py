@@ -0,0 +1,38 @@
+import pytest
+
+from game_state.engine import apply_event
+from game_state.events import PlayerJoinEvent, StartGameEvent
+from game_state.state import GameState
+
+
+GAME_CODE = "TEST"
+
+
+def join(game_state: GameState, websocket_id: str, name: str | None = None):
+    apply_event(
+        game_state,
+        PlayerJoinEvent(
+            game_code=game_state.game_code,
+            websocket_id=websocket_id,
+            player_name=name or websocket_id,
+        ),
+    )
+
+
+def current_websocket_id(game_state: GameState) -> str:
+    return game_state.players[game_state.current_turn].connection.websocket_id
+
+
+@pytest.fixture
+def lobby() -> GameState:
+    """A lobby with two players, host first, and a fixed seed."""
+    game_state = GameState(game_code=GAME_CODE, seed=1)
+    join(game_state, "host")
+    join(game_state, "guest")
+    return game_state
+
+
+@pytest.fixture
+def game(lobby: GameState) -> GameState:
+    apply_event(lobby, StartGameEvent(game_code=GAME_CODE, websocket_id="host"))
+    return lobby
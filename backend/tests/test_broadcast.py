@@ -0,0 +1,158 @@
+import asyncio
+import zlib
+
+import orjson
+
+from fastapi import status
+
+from game_state.broadcast import ClientWriter
+from game_state.snapshot import PublishedState
+from game_state.state import GameState
+
+
+class FakeWebSocket:
+    """Records what is sent. Sends wait for `unblocked`, and the next `hang_sends` never finish."""
+
+    def __init__(self, blocked: bool = False, hang_sends: int = 0):
+        self.sent: list[dict] = []
+        self.closed_with: int | None = None
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+        self.hang_sends = hang_sends
+
+    async def _send(self, message):
+        if self.hang_sends > 0:
+            self.hang_sends -= 1
+            await asyncio.Future()
+        await self.unblocked.wait()
+        self.sent.append(message)
+
+    async def send_text(self, message: str):
+        await self._send(orjson.loads(message))
+
+    async def send_bytes(self, message: bytes):
+        await self._send(message)
+
+    async def close(self, code: int):
+        self.closed_with = code
+
+
+def publish_versions(game_state: GameState, num_versions: int) -> list[PublishedState]:
+    published = [PublishedState.initial(game_state)]
+    for _ in range(num_versions - 1):
+        published.append(published[-1].next(game_state))
+    return published
+
+
+async def wait_until(condition, timeout: float = 1.0):
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.001)
+
+
+def test_slow_client_only_gets_the_latest_state(lobby: GameState):
+    async def run():
+        websocket = FakeWebSocket(blocked=True)
+        writer = ClientWriter("host", websocket, use_delta=True, max_queue_size=2)
+        versions = publish_versions(lobby, 10)
+
+        writer.publish(versions[0])
+        # the writer is now stuck sending version 0
+        await asyncio.sleep(0)
+        for published in versions[1:]:
+            writer.publish(published)
+        assert writer.num_queued == 1
+        assert writer.num_coalesced == 8
+
+        websocket.unblocked.set()
+        await wait_until(lambda: len(websocket.sent) == 2)
+        await writer.close()
+        return websocket.sent
+
+    first, latest = asyncio.run(run())
+
+    assert (first["kind"], first["version"]) == ("snapshot", 0)
+    # the client missed versions in between, so it can't be sent a patch
+    assert (latest["kind"], latest["version"]) == ("snapshot", 9)
+
+
+def test_up_to_date_client_gets_patches(lobby: GameState):
+    async def run():
+        websocket = FakeWebSocket()
+        writer = ClientWriter("host", websocket, use_delta=True)
+        for num_sent, published in enumerate(publish_versions(lobby, 3), start=1):
+            writer.publish(published)
+            await wait_until(lambda: len(websocket.sent) == num_sent)
+        await writer.close()
+        return websocket.sent
+
+    sent = asyncio.run(run())
+
+    assert [message["kind"] for message in sent] == ["snapshot", "patch", "patch"]
+
+
+def test_timed_out_send_is_retried_as_a_snapshot(lobby: GameState):
+    async def run():
+        websocket = FakeWebSocket()
+        writer = ClientWriter("host", websocket, use_delta=True, send_timeout=0.01)
+        versions = publish_versions(lobby, 3)
+        writer.publish(versions[0])
+        await wait_until(lambda: len(websocket.sent) == 1)
+        websocket.hang_sends = 1
+        writer.publish(versions[1])
+        await wait_until(lambda: len(websocket.sent) == 2)
+        writer.publish(versions[2])
+        await wait_until(lambda: len(websocket.sent) == 3)
+        await writer.close()
+        return websocket.sent, writer
+
+    sent, writer = asyncio.run(run())
+
+    # the patch to version 1 timed out, so the client isn't known to have version 1
+    assert [(message["kind"], message["version"]) for message in sent] == [
+        ("snapshot", 0),
+        ("snapshot", 1),
+        ("patch", 2),
+    ]
+    assert writer._stalled_sends == 0
+
+
+def test_stalled_client_is_disconnected(lobby: GameState):
+    async def run():
+        websocket = FakeWebSocket(hang_sends=3)
+        writer = ClientWriter("host", websocket, send_timeout=0.01, max_stalled_sends=3)
+        writer.publish(publish_versions(lobby, 1)[0])
+        await asyncio.wait_for(writer._task, timeout=1.0)
+        # nothing is queued for a closed writer
+        writer.publish(publish_versions(lobby, 1)[0])
+        return websocket, writer
+
+    websocket, writer = asyncio.run(run())
+
+    assert websocket.sent == []
+    assert websocket.closed_with == status.WS_1013_TRY_AGAIN_LATER
+    assert writer.closed
+    assert writer.num_queued == 0
+
+
+def test_compressing_clients_share_one_frame(game: GameState):
+    async def run():
+        websockets = [FakeWebSocket() for _ in range(3)]
+        writers = [
+            ClientWriter(f"ws{i}", websocket, use_compression=True)
+            for i, websocket in enumerate(websockets)
+        ]
+        published = publish_versions(game, 1)[0]
+        for writer in writers:
+            writer.publish(published)
+        await wait_until(lambda: all(websocket.sent for websocket in websockets))
+        for writer in writers:
+            await writer.close()
+        return [websocket.sent[0] for websocket in websockets]
+
+    frames = asyncio.run(run())
+
+    assert frames[0] is frames[1] is frames[2]
+    message = orjson.loads(zlib.decompress(frames[0]))
+    assert message["game_state"]["game_code"] == game.game_code
@@ -0,0 +1,280 @@
+import pytest
+
+from game_state.constants import MAX_PLAYERS
+from game_state.engine import apply_event
+from game_state.events import (
+    AddBotEvent,
+    EndGameEvent,
+    LegBetEvent,
+    MoveFrogEvent,
+    OverallBetEvent,
+    SpectatorJoinEvent,
+    SpectatorLeaveEvent,
+    SpectatorTileEvent,
+    StartGameEvent,
+)
+from game_state.state import GameState
+
+from tests.conftest import GAME_CODE, current_websocket_id, join
+
+
+def other_websocket_id(game_state: GameState) -> str:
+    return next(
+        player.connection.websocket_id
+        for player_id, player in game_state.players.items()
+        if player_id != game_state.current_turn
+    )
+
+
+def test_first_player_to_join_hosts(lobby: GameState):
+    assert [conn.is_host for conn in lobby.connections] == [True, False]
+    assert lobby.state == "lobby"
+
+
+def test_host_adds_bots(lobby: GameState):
+    apply_event(lobby, AddBotEvent(game_code=GAME_CODE, websocket_id="host", strength="random"))
+
+    bot = lobby.connections[-1]
+    assert len(lobby.connections) == 3
+    assert bot.bot_strength == "random"
+    assert not bot.is_host
+
+
+@pytest.mark.parametrize("websocket_id", ["guest", "watcher", "stranger"])
+def test_only_the_host_adds_bots(lobby: GameState, websocket_id: str):
+    apply_event(lobby, SpectatorJoinEvent(game_code=GAME_CODE, websocket_id="watcher"))
+
+    apply_event(lobby, AddBotEvent(game_code=GAME_CODE, websocket_id=websocket_id))
+
+    assert len(lobby.connections) == 2
+
+
+def test_no_bots_once_the_game_started(game: GameState):
+    apply_event(game, AddBotEvent(game_code=GAME_CODE, websocket_id="host"))
+
+    assert len(game.connections) == 2
+
+
+def test_bots_up_to_max_players(lobby: GameState):
+    for _ in range(MAX_PLAYERS + 2):
+        apply_event(lobby, AddBotEvent(game_code=GAME_CODE, websocket_id="host"))
+
+    assert len(lobby.connections) == MAX_PLAYERS
+    assert lobby.is_full
+
+
+def test_players_up_to_max_players(lobby: GameState):
+    for i in range(MAX_PLAYERS):
+        join(lobby, f"player{i}")
+
+    assert len(lobby.connections) == MAX_PLAYERS
+    assert lobby.get_connection_type(f"player{MAX_PLAYERS - 3}") == "player"
+    assert lobby.get_connection_type(f"player{MAX_PLAYERS - 2}") == "unknown"
+
+
+def test_spectators_are_counted_not_listed(lobby: GameState):
+    apply_event(lobby, SpectatorJoinEvent(game_code=GAME_CODE, websocket_id="watcher"))
+    assert lobby.num_spectators == 1
+    assert lobby.get_connection_type("watcher") == "spectator"
+    assert all(conn.websocket_id != "watcher" for conn in lobby.connections)
+
+    apply_event(lobby, SpectatorLeaveEvent(game_code=GAME_CODE, websocket_id="watcher"))
+    assert lobby.num_spectators == 0
+    assert lobby.get_connection_type("watcher") == "unknown"
+
+
+def test_start_game(game: GameState):
+    assert game.state == "game"
+    assert game.current_round == 1
+    assert len(game.players) == 2
+    assert game.current_turn in game.players
+    assert len(game.unmoved_frogs) == game.num_frogs + game.num_backward_frogs
+    assert len(game.leg_bets) == game.num_frogs
+    # every frog starts on the track, forward ones ranked
+    assert all(tile_idx >= 0 for tile_idx in game.track.frog_tiles)
+    assert sorted(game.track.ranking) == list(range(game.num_frogs))
+
+
+def test_move_frog_passes_the_turn(game: GameState):
+    websocket_id = current_websocket_id(game)
+    num_unmoved = len(game.unmoved_frogs)
+
+    apply_event(game, MoveFrogEvent(game_code=GAME_CODE, websocket_id=websocket_id))
+
+    assert len(game.unmoved_frogs) == num_unmoved - 1
+    assert game.players[game._get_player_id(websocket_id)].gold > 0
+    assert game.current_turn != game._get_player_id(websocket_id)
+    assert game.turn_number == 1
+    assert game.notify_turn
+
+
+def test_events_out_of_turn_are_ignored(game: GameState):
+    websocket_id = other_websocket_id(game)
+    current_turn, num_unmoved = game.current_turn, len(game.unmoved_frogs)
+
+    apply_event(game, MoveFrogEvent(game_code=GAME_CODE, websocket_id=websocket_id))
+    apply_event(game, LegBetEvent(game_code=GAME_CODE, websocket_id=websocket_id, frog_idx=0))
+
+    assert game.current_turn == current_turn
+    assert len(game.unmoved_frogs) == num_unmoved
+    assert len(game.leg_bets[0]) == 5
+
+
+def test_leg_bet_takes_the_top_bet(game: GameState):
+    websocket_id = current_websocket_id(game)
+    top_bet = game.leg_bets[2][0]
+
+    apply_event(game, LegBetEvent(game_code=GAME_CODE, websocket_id=websocket_id, frog_idx=2))
+
+    assert game.leg_bets[2][0] is not top_bet
+    assert game.players[game._get_player_id(websocket_id)].leg_bets == [top_bet]
+
+
+def test_leg_ends_once_enough_frogs_moved(game: GameState):
+    for _ in range(game.num_frogs_per_round):
+        apply_event(
+            game, MoveFrogEvent(game_code=GAME_CODE, websocket_id=current_websocket_id(game))
+        )
+        if game.state != "game":
+            pytest.skip("the seed ends the race within the first leg")
+
+    assert game.current_round == 2
+    assert len(game.unmoved_frogs) == game.num_frogs + game.num_backward_frogs
+
+
+def test_game_runs_to_the_end_and_back_to_the_lobby(game: GameState):
+    for _ in range(1000):
+        if game.state != "game":
+            break
+        apply_event(
+            game, MoveFrogEvent(game_code=GAME_CODE, websocket_id=current_websocket_id(game))
+        )
+
+    assert game.state == "ended"
+    assert game.end_game_stats is not None
+    assert game.current_turn == ""
+
+    apply_event(game, EndGameEvent(game_code=GAME_CODE, websocket_id="host"))
+    assert game.state == "lobby"
+
+
+def leg_bet_event(game_state: GameState, frog_idx: int) -> LegBetEvent:
+    return LegBetEvent(
+        game_code=GAME_CODE, websocket_id=current_websocket_id(game_state), frog_idx=frog_idx
+    )
+
+
+@pytest.mark.parametrize("frog_idx", [-1, 5, 99])
+def test_leg_bet_on_no_frog_is_ignored(game: GameState, frog_idx: int):
+    current_turn = game.current_turn
+
+    apply_event(game, leg_bet_event(game, frog_idx))
+
+    assert game.current_turn == current_turn
+
+
+def test_leg_bet_without_bets_left_is_ignored(game: GameState):
+    for _ in range(len(game.leg_bets[0])):
+        apply_event(game, leg_bet_event(game, 0))
+    current_turn = game.current_turn
+
+    apply_event(game, leg_bet_event(game, 0))
+
+    assert game.leg_bets[0] == []
+    assert game.current_turn == current_turn
+
+
+def overall_bet_event(game_state: GameState, frog_idx: int) -> OverallBetEvent:
+    return OverallBetEvent(
+        game_code=GAME_CODE,
+        websocket_id=current_websocket_id(game_state),
+        frog_idx=frog_idx,
+        bet_type="winner",
+    )
+
+
+def test_overall_bet(game: GameState):
+    player_id = game.current_turn
+
+    apply_event(game, overall_bet_event(game, 3))
+
+    assert game.players[player_id].overall_bets[3] == "winner"
+    assert [bet.player_id for bet in game.overall_win_bets] == [player_id]
+
+
+@pytest.mark.parametrize("frog_idx", [-1, 5, 99])
+def test_overall_bet_on_no_frog_is_ignored(game: GameState, frog_idx: int):
+    current_turn = game.current_turn
+
+    apply_event(game, overall_bet_event(game, frog_idx))
+
+    assert game.current_turn == current_turn
+    assert game.overall_win_bets == []
+
+
+def test_second_overall_bet_on_a_frog_is_ignored(game: GameState):
+    player_id = game.current_turn
+    apply_event(game, overall_bet_event(game, 3))
+    # round the table back to the same player
+    while game.current_turn != player_id:
+        apply_event(game, overall_bet_event(game, 0))
+
+    apply_event(game, overall_bet_event(game, 3))
+
+    assert game.current_turn == player_id
+    assert len(game.overall_win_bets) == len(game.players)
+
+
+def spectator_tile_event(game_state: GameState, tile_idx: int) -> SpectatorTileEvent:
+    return SpectatorTileEvent(
+        game_code=GAME_CODE,
+        websocket_id=current_websocket_id(game_state),
+        tile_idx=tile_idx,
+        displacement=1,
+    )
+
+
+def test_spectator_tile(game: GameState):
+    tile_idx = game.spectator_tile_placements[0]
+    player_id = game.current_turn
+
+    apply_event(game, spectator_tile_event(game, tile_idx))
+
+    assert game.track[tile_idx].spectator_tile.player_id == player_id
+    assert game.players[player_id].has_spectator_tile
+    assert game.current_turn != player_id
+
+
+@pytest.mark.parametrize("tile_idx", [-1, -100, 0, 10_000])
+def test_spectator_tile_off_the_track_is_ignored(game: GameState, tile_idx: int):
+    current_turn = game.current_turn
+
+    apply_event(game, spectator_tile_event(game, tile_idx))
+
+    assert game.current_turn == current_turn
+    assert not any(tile.has_spectator_tile for tile in game.track)
+
+
+def test_spectator_tile_on_a_frog_is_ignored(game: GameState):
+    tile_idx = game.track.frog_tiles[0]
+    current_turn = game.current_turn
+
+    apply_event(game, spectator_tile_event(game, tile_idx))
+
+    assert game.current_turn == current_turn
+    assert not game.track[tile_idx].has_spectator_tile
+
+
+def test_same_seed_same_game(lobby: GameState):
+    replay = GameState(game_code=GAME_CODE, seed=lobby.seed)
+    for conn in lobby.connections:
+        join(replay, conn.websocket_id, conn.name)
+
+    for game_state in (lobby, replay):
+        apply_event(game_state, StartGameEvent(game_code=GAME_CODE, websocket_id="host"))
+        for _ in range(10):
+            websocket_id = current_websocket_id(game_state)
+            apply_event(game_state, MoveFrogEvent(game_code=GAME_CODE, websocket_id=websocket_id))
+
+    assert replay.track.frog_tiles == lobby.track.frog_tiles
+    assert replay.track.ranking == lobby.track.ranking
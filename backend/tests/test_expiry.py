@@ -0,0 +1,37 @@
+from utils.expiry import ExpiryHeap
+
+
+def test_pop_due_earliest_first():
+    heap = ExpiryHeap[str]()
+    for key, at in [("c", 3.0), ("a", 1.0), ("d", 4.0), ("b", 2.0)]:
+        heap.schedule(key, at)
+
+    assert heap.pop_due(3.0) == ["a", "b"]
+    assert len(heap) == 2
+    assert "a" not in heap and "c" in heap
+    assert heap.next_time() == 3.0
+
+
+def test_rescheduled_key_only_comes_up_once():
+    heap = ExpiryHeap[str]()
+    heap.schedule("a", 1.0)
+    heap.schedule("b", 2.0)
+    heap.schedule("a", 5.0)
+
+    assert heap.pop_due(3.0) == ["b"]
+    assert heap.next_time() == 5.0
+    assert heap.pop_due(10.0) == ["a"]
+    assert heap.pop_due(10.0) == []
+
+
+def test_discarded_key_never_comes_up():
+    heap = ExpiryHeap[str]()
+    heap.schedule("a", 1.0)
+    heap.schedule("b", 2.0)
+    heap.discard("a")
+    heap.discard("missing")
+
+    assert len(heap) == 1
+    assert heap.next_time() == 2.0
+    assert heap.pop_due(10.0) == ["b"]
+    assert heap.next_time() is None
@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+
+from game_state import game as game_module
+from game_state.events import LegBetEvent, MoveFrogEvent, PlayerJoinEvent, StartGameEvent
+from game_state.game import EventBatching, Game
+from game_state.state import GameState
+from game_state.wal import WriteAheadLog
+
+from tests.conftest import GAME_CODE
+
+
+class Published(list):
+    async def __call__(self, game_state: GameState):
+        self.append(game_state)
+
+
+def make_game(
+    wal: WriteAheadLog | None = None, batching: EventBatching | None = None
+) -> Game:
+    if wal is not None:
+        wal.create(GAME_CODE, seed=1)
+    return Game(
+        GAME_CODE,
+        GameState(game_code=GAME_CODE, seed=1),
+        Published(),
+        wal=wal,
+        batching=batching,
+    )
+
+
+async def run_events(game: Game, events: list) -> list[GameState]:
+    """Queues the events one at a time through Game.run and waits for each to be published."""
+    published = game._publish
+    task = asyncio.create_task(game.run())
+    for event in events:
+        num_published = len(published)
+        await game.add_event(event)
+        while len(published) == num_published:
+            await asyncio.sleep(0.001)
+    assert not task.done()
+    task.cancel()
+    return published
+
+
+JOIN = PlayerJoinEvent(game_code=GAME_CODE, websocket_id="host", player_name="Host")
+START = StartGameEvent(game_code=GAME_CODE, websocket_id="host")
+MOVE = MoveFrogEvent(game_code=GAME_CODE, websocket_id="host")
+
+
+def test_invalid_frog_index_doesnt_stop_the_game():
+    game = make_game()
+    bad_bet = LegBetEvent(game_code=GAME_CODE, websocket_id="host", frog_idx=99)
+
+    published = asyncio.run(run_events(game, [JOIN, START, bad_bet, MOVE]))
+
+    assert len(published) == 4
+    assert len(game._game_state.updates) > 0
+
+
+def test_failed_event_is_skipped_and_not_logged(tmp_path, monkeypatch):
+    wal = WriteAheadLog(str(tmp_path))
+    game = make_game(wal)
+    apply_event = game_module.apply_event
+
+    def failing_apply_event(game_state, event):
+        if isinstance(event, LegBetEvent):
+            raise RuntimeError("broken rule")
+        apply_event(game_state, event)
+
+    monkeypatch.setattr(game_module, "apply_event", failing_apply_event)
+    bad_bet = LegBetEvent(game_code=GAME_CODE, websocket_id="host", frog_idx=0)
+
+    published = asyncio.run(run_events(game, [JOIN, START, bad_bet, MOVE]))
+    asyncio.run(wal.commit())
+
+    assert len(published) == 4
+    [recovered] = wal.recover()
+    assert recovered.events == [JOIN, START, MOVE]
+
+
+@pytest.mark.parametrize("frog_idx", [-1, 99])
+def test_replay_matches_the_live_game(tmp_path, frog_idx: int):
+    wal = WriteAheadLog(str(tmp_path))
+    live = make_game(wal)
+    bad_bet = LegBetEvent(game_code=GAME_CODE, websocket_id="host", frog_idx=frog_idx)
+    events = [JOIN, START, MOVE, bad_bet, MOVE]
+    asyncio.run(run_events(live, events))
+    asyncio.run(wal.commit())
+
+    [recovered] = wal.recover()
+    replay = make_game()
+    for event in recovered.events:
+        asyncio.run(replay.process_event(event, replay=True))
+
+    assert replay._game_state.track.frog_tiles == live._game_state.track.frog_tiles
+    assert replay._game_state.turn_number == live._game_state.turn_number
+
+
+@pytest.mark.parametrize(
+    "mode, tick_interval", [("burst", 0.05), ("tick", 0), ("adaptive", -1)]
+)
+def test_invalid_event_batching(mode: str, tick_interval: float):
+    with pytest.raises(ValueError):
+        EventBatching(mode, tick_interval)
+
+
+async def run_burst(game: Game, events: list, wait: float) -> list[int]:
+    """Queues the events at once, and returns the turn number of every state published."""
+    turn_numbers = []
+
+    async def publish(game_state: GameState):
+        turn_numbers.append(game_state.turn_number)
+
+    game._publish = publish
+    task = asyncio.create_task(game.run())
+    for event in events:
+        await game.add_event(event)
+    await asyncio.sleep(wait)
+    task.cancel()
+    return turn_numbers
+
+
+def test_tick_batching_publishes_queued_events_together():
+    game = make_game(batching=EventBatching("tick", tick_interval=0.05))
+    events = [JOIN, START, MOVE, MOVE, MOVE]
+
+    turn_numbers = asyncio.run(run_burst(game, events, wait=0.2))
+
+    assert turn_numbers == [3]
+
+
+def test_event_batching_publishes_every_event():
+    game = make_game(batching=EventBatching("event"))
+    events = [JOIN, START, MOVE, MOVE, MOVE]
+
+    turn_numbers = asyncio.run(run_burst(game, events, wait=0.05))
+
+    assert turn_numbers == [0, 0, 1, 2, 3]
+
+
+def test_adaptive_batching_publishes_an_idle_game_at_once():
+    game = make_game(batching=EventBatching("adaptive", tick_interval=10))
+
+    async def run():
+        task = asyncio.create_task(run_burst(game, [JOIN], wait=0.05))
+        return await asyncio.wait_for(task, timeout=1)
+
+    # well within the tick
+    assert asyncio.run(run()) == [0]
+
+
+def test_adaptive_batching_coalesces_a_burst():
+    game = make_game(batching=EventBatching("adaptive", tick_interval=0.05))
+
+    async def run():
+        task = asyncio.create_task(run_burst(game, [], wait=0.2))
+        await game.add_event(JOIN)
+        # the first event goes out at once, the rest wait for a tick after it
+        await asyncio.sleep(0.01)
+        for event in [START, MOVE, MOVE]:
+            await game.add_event(event)
+        return await task
+
+    assert asyncio.run(run()) == [0, 2]
@@ -0,0 +1,114 @@
+import asyncio
+from itertools import count
+import time
+
+from game_state.events import PlayerJoinEvent
+from game_state.game import GameManager
+from utils.sharding import shard_for
+
+
+NUM_LOCK_SHARDS = 4
+
+
+def codes_by_shard(num_shards: int = NUM_LOCK_SHARDS) -> dict[int, list[str]]:
+    """Two game codes for every shard."""
+    codes: dict[int, list[str]] = {shard: [] for shard in range(num_shards)}
+    for i in count():
+        code = f"G{i:03}"
+        shard = codes[shard_for(code, num_shards)]
+        if len(shard) < 2:
+            shard.append(code)
+        if all(len(shard) == 2 for shard in codes.values()):
+            return codes
+
+
+async def with_manager(test, **kwargs):
+    manager = GameManager(num_lock_shards=NUM_LOCK_SHARDS, race_odds_workers=1, **kwargs)
+    try:
+        return await test(manager)
+    finally:
+        manager.shutdown()
+
+
+def test_shard_for_is_stable():
+    # crc32, so every process and restart agrees on the shard of a game
+    assert shard_for("ABCD", 64) == 37
+    assert all(0 <= shard_for(f"G{i}", 7) < 7 for i in range(100))
+
+
+def test_writes_only_wait_behind_their_own_shard():
+    codes = codes_by_shard()
+    (locked_code, same_shard_code), (other_shard_code, _) = codes[0], codes[1]
+
+    async def test(manager: GameManager):
+        await manager.create_game_state(locked_code)
+        async with manager._lock_for(locked_code):
+            assert await asyncio.wait_for(manager.create_game_state(other_shard_code), 1)
+
+            same_shard = asyncio.create_task(manager.create_game_state(same_shard_code))
+            await asyncio.sleep(0.01)
+            assert not same_shard.done()
+        assert await asyncio.wait_for(same_shard, 1)
+
+    asyncio.run(with_manager(test))
+
+
+def test_lookups_dont_take_the_lock():
+    game_code = codes_by_shard()[0][0]
+
+    async def test(manager: GameManager):
+        await manager.create_game_state(game_code)
+        async with manager._lock_for(game_code):
+            game_state = await asyncio.wait_for(manager.get_game_state(game_code), 1)
+            assert game_state.game_code == game_code
+            assert await asyncio.wait_for(manager.get_published_state(game_code), 1)
+            assert not await asyncio.wait_for(manager.is_websocket_exist(game_code, "host"), 1)
+            join = PlayerJoinEvent(game_code=game_code, websocket_id="host", player_name="Host")
+            assert await asyncio.wait_for(manager.add_event(join), 1)
+        assert await manager.get_game_state("NONE") is None
+        assert not await manager.add_event(
+            PlayerJoinEvent(game_code="NONE", websocket_id="host", player_name="Host")
+        )
+
+    asyncio.run(with_manager(test))
+
+
+def test_concurrent_creates_make_one_game():
+    game_code = codes_by_shard()[0][0]
+
+    async def test(manager: GameManager):
+        created = await asyncio.gather(
+            *(manager.create_game_state(game_code) for _ in range(3))
+        )
+        assert sorted(created) == [False, False, True]
+
+    asyncio.run(with_manager(test))
+
+
+def test_purge_only_removes_idle_games():
+    codes = codes_by_shard()
+    (idle_code, active_code), touched_code = codes[0], codes[1][0]
+
+    async def test(manager: GameManager):
+        for game_code in (idle_code, active_code, touched_code):
+            await manager.create_game_state(game_code)
+        an_hour_ago = time.time() - 60 * 60
+        for game_code in (idle_code, touched_code):
+            manager._games[game_code]._last_update_time = an_hour_ago
+            manager._idle_games.schedule(game_code, an_hour_ago)
+        # active since it was scheduled, so its heap entry is out of date
+        manager._games[touched_code]._last_update_time = time.time()
+        game_task = manager._game_tasks[idle_code]
+
+        assert await manager._purge_games(inactive_threshold=60) == 1
+        await asyncio.sleep(0)
+
+        assert await manager.get_game_state(idle_code) is None
+        assert game_task.cancelled()
+        assert idle_code not in manager._idle_games
+        for game_code in (active_code, touched_code):
+            assert await manager.get_game_state(game_code) is not None
+            assert game_code in manager._idle_games
+        assert await manager._purge_games(inactive_threshold=60) == 0
+
+    asyncio.run(with_manager(test))
@@ -0,0 +1,104 @@
+import pytest
+
+from utils.metrics import Counter, Gauge, Histogram, Metric, MetricsRegistry
+
+
+@pytest.fixture
+def registry() -> MetricsRegistry:
+    return MetricsRegistry()
+
+
+def test_counter(registry: MetricsRegistry):
+    counter = Counter("test_events_total", "Events", registry=registry)
+    counter.inc()
+    counter.inc(2)
+
+    assert registry.render() == (
+        "# HELP test_events_total Events\n"
+        "# TYPE test_events_total counter\n"
+        "test_events_total 3\n"
+    )
+    with pytest.raises(ValueError):
+        counter.inc(-1)
+
+
+def test_labelled_gauge(registry: MetricsRegistry):
+    gauge = Gauge("test_games", "Games by state", labelnames=("state",), registry=registry)
+    gauge.labels("lobby").set(2)
+    gauge.labels("game").inc(1.5)
+    gauge.labels('with "quotes"\n').dec()
+
+    assert registry.render().splitlines()[2:] == [
+        'test_games{state="lobby"} 2',
+        'test_games{state="game"} 1.5',
+        'test_games{state="with \\"quotes\\"\\n"} -1',
+    ]
+    with pytest.raises(ValueError):
+        gauge.set(1)
+    with pytest.raises(ValueError):
+        gauge.labels("lobby", "extra")
+
+
+def test_gauge_function(registry: MetricsRegistry):
+    gauge = Gauge("test_open", "Open things", registry=registry)
+    values = iter([1, 2])
+    gauge.set_function(lambda: next(values))
+
+    assert gauge.get() == 1
+    assert registry.render().endswith("test_open 2\n")
+
+
+def test_cleared_gauge_only_renders_new_children(registry: MetricsRegistry):
+    gauge = Gauge("test_depth", "Depth", labelnames=("game_code",), registry=registry)
+    gauge.labels("ABCD").set(5)
+    gauge.clear()
+    gauge.labels("EFGH").set(1)
+
+    assert registry.render().splitlines()[2:] == ['test_depth{game_code="EFGH"} 1']
+
+
+def test_histogram(registry: MetricsRegistry):
+    histogram = Histogram(
+        "test_seconds", "Seconds", labelnames=("type",), buckets=(0.1, 0.01), registry=registry
+    )
+    child = histogram.labels("move")
+    for value in (0.005, 0.01, 0.05, 2):
+        child.observe(value)
+
+    # buckets are sorted and cumulative, a value on a bound counts towards it
+    assert registry.render().splitlines()[2:] == [
+        'test_seconds_bucket{type="move",le="0.01"} 2',
+        'test_seconds_bucket{type="move",le="0.1"} 3',
+        'test_seconds_bucket{type="move",le="+Inf"} 4',
+        'test_seconds_sum{type="move"} 2.065',
+        'test_seconds_count{type="move"} 4',
+    ]
+
+
+def test_names_are_registered_once(registry: MetricsRegistry):
+    Counter("test_total", "Things", registry=registry)
+    with pytest.raises(ValueError):
+        Counter("test_total", "Things again", registry=registry)
+
+
+def test_metric_needs_children():
+    class Incomplete(Metric):
+        type = "gauge"
+
+    with pytest.raises(TypeError):
+        Incomplete("test_incomplete", "Never made", registry=None)
+
+
+def test_metrics_endpoint_needs_the_admin_token(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    with TestClient(main.app) as client:
+        assert client.get("/metrics").status_code == 404
+        assert client.get("/admin/metrics").status_code == 401
+        response = client.get("/admin/metrics", headers={"Authorization": "Bearer secret"})
+
+    assert response.status_code == 200
+    assert "# TYPE leapfrog_games gauge" in response.text
@@ -0,0 +1,198 @@
+"""
+Checks the leg odds engine against an enumeration that plays every remaining move of the leg
+through the real GameState rule code, _move_frog and _use_spectator_tile.
+"""
+
+import copy
+import random
+
+import pytest
+
+from game_state.engine import apply_event
+from game_state.events import MoveFrogEvent, StartGameEvent
+from game_state.odds import calculate_leg_odds, calculate_move_outcomes
+from game_state.state import GameState
+from game_state.track import Track
+
+from tests.conftest import GAME_CODE, current_websocket_id, join
+
+
+def enumerate_leg_placings(game_state: GameState) -> dict[int, list[float]]:
+    """Placing probabilities of every forward frog, by playing every move with GameState itself."""
+    placings = {
+        frog.idx: [0.0] * game_state.num_frogs
+        for frog in game_state.frogs
+        if frog.is_forward_frog
+    }
+    leg_end_size = (
+        game_state.num_frogs + game_state.num_backward_frogs - game_state.num_frogs_per_round
+    )
+
+    def add_placings(state: GameState, probability: float):
+        for placing, frog_idx in enumerate(state.frog_order):
+            placings[frog_idx][placing] += probability
+
+    def play(state: GameState, probability: float):
+        if len(state.unmoved_frogs) <= leg_end_size:
+            add_placings(state, probability)
+            return
+        for frog_idx in state.unmoved_frogs:
+            moves = state.frogs[frog_idx].moves
+            for distance in moves:
+                next_state = copy.deepcopy(state)
+                next_state.unmoved_frogs.remove(frog_idx)
+                to_tile = next_state._move_frog(frog_idx, distance)
+                to_tile = next_state._use_spectator_tile(to_tile)
+                next_probability = probability / (len(state.unmoved_frogs) * len(moves))
+                if to_tile == state.num_tiles - 1:
+                    add_placings(next_state, next_probability)
+                else:
+                    play(next_state, next_probability)
+
+    play(game_state, 1.0)
+    return placings
+
+
+def assert_matches_rules(game_state: GameState):
+    expected = enumerate_leg_placings(game_state)
+    leg_odds = calculate_leg_odds(game_state)
+
+    assert sorted(odds.frog_idx for odds in leg_odds) == sorted(expected)
+    for odds in leg_odds:
+        placings = expected[odds.frog_idx]
+        assert (odds.first, odds.second, odds.last) == pytest.approx(
+            (placings[0], placings[1], placings[-1]), abs=1e-9
+        ), f"frog {odds.frog_idx}"
+
+
+def make_position(
+    stacks: dict[int, list[int]],
+    unmoved: list[int],
+    spectator_tiles: dict[int, str] | None = None,
+    num_tiles: int = 17,
+    num_frogs: int = 5,
+) -> GameState:
+    """
+    A started game with its frogs placed by hand: `stacks` maps tiles to their frogs from the
+    bottom up. Frogs 0 to num_frogs - 1 are forward frogs, the two after them backward frogs.
+    """
+    game_state = GameState(
+        game_code=GAME_CODE, seed=0, num_tiles=num_tiles, num_frogs=num_frogs
+    )
+    join(game_state, "host")
+    game_state.create_players()
+    game_state.create_frogs()
+    game_state.state = "game"
+    game_state.track = Track(num_tiles, len(game_state.frogs))
+    for tile_idx, frog_idxs in stacks.items():
+        for frog_idx in frog_idxs:
+            game_state.track.place_frog(
+                frog_idx, tile_idx, game_state.frogs[frog_idx].is_forward_frog
+            )
+    player_id = game_state.player_order[0]
+    for tile_idx, direction in (spectator_tiles or {}).items():
+        game_state.track.place_spectator_tile(tile_idx, player_id, "host", direction)
+    game_state.unmoved_frogs = unmoved
+    return game_state
+
+
+def uses_packed_keys(game_state: GameState) -> bool:
+    # see odds._merge_transpositions
+    return len(game_state.frogs) <= 7 and game_state.num_tiles - 1 < 32
+
+
+def test_pile_carried_from_the_middle_of_a_stack():
+    # frog 1 carries 2 and the backward frog 5 and leaves 0 behind, frog 5 carries 2 back
+    game_state = make_position(
+        {2: [0, 1, 5, 2], 4: [3], 6: [4], 16: [6]}, unmoved=[1, 5, 3, 0]
+    )
+    assert_matches_rules(game_state)
+
+
+@pytest.mark.parametrize("direction", ["forward", "backward"])
+def test_spectator_tile_bumps(direction: str):
+    # piles landing on 3 or 5 are bumped on, or back under the frogs already there
+    game_state = make_position(
+        {1: [0, 1], 2: [2], 4: [3, 4], 7: [5], 16: [6]},
+        unmoved=[0, 1, 2, 5, 3],
+        spectator_tiles={3: direction, 5: direction, 9: direction},
+    )
+    assert_matches_rules(game_state)
+
+
+def test_frog_reaching_the_finish_within_the_leg():
+    game_state = make_position(
+        {13: [0], 14: [1, 2], 15: [3], 10: [4], 16: [5, 6]},
+        unmoved=[0, 1, 3, 5, 4],
+        spectator_tiles={12: "forward"},
+    )
+    odds = calculate_leg_odds(game_state)
+
+    assert_matches_rules(game_state)
+    # the leg ends early when a pile finishes, so not every move order plays out
+    assert sum(leg_odds.first for leg_odds in odds) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize(
+    "num_tiles, num_frogs, packed",
+    [(17, 5, True), (31, 5, True), (33, 5, False), (17, 6, False)],
+)
+def test_packed_and_unpacked_transposition_keys(num_tiles: int, num_frogs: int, packed: bool):
+    last = num_tiles - 1
+    backward = [num_frogs, num_frogs + 1]
+    stacks = {
+        1: [0, 1],
+        3: list(range(2, num_frogs)),
+        last - 2: [backward[0]],
+        last: [backward[1]],
+    }
+    # enough moves left for positions to be merged more than once
+    game_state = make_position(
+        stacks,
+        unmoved=[0, 2, backward[0], 1, num_frogs - 1],
+        spectator_tiles={5: "backward"},
+        num_tiles=num_tiles,
+        num_frogs=num_frogs,
+    )
+    assert uses_packed_keys(game_state) is packed
+    assert_matches_rules(game_state)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_played_positions(seed: int):
+    rng = random.Random(seed)
+    game_state = GameState(game_code=GAME_CODE, seed=seed)
+    join(game_state, "host")
+    join(game_state, "guest")
+    apply_event(game_state, StartGameEvent(game_code=GAME_CODE, websocket_id="host"))
+    for _ in range(rng.randint(0, 12)):
+        websocket_id = current_websocket_id(game_state)
+        apply_event(game_state, MoveFrogEvent(game_code=GAME_CODE, websocket_id=websocket_id))
+        if game_state.state != "game":
+            pytest.skip("the game ended")
+    for tile_idx in game_state.spectator_tile_placements:
+        if rng.random() < 0.3 and game_state.is_valid_spectator_tile_placement(tile_idx):
+            game_state.track.place_spectator_tile(
+                tile_idx, game_state.current_turn, "", rng.choice(["forward", "backward"])
+            )
+    game_state.unmoved_frogs = rng.sample([frog.idx for frog in game_state.frogs], 4)
+
+    assert_matches_rules(game_state)
+
+
+def test_move_outcomes_add_up_to_the_leg_odds():
+    game_state = make_position(
+        {1: [0, 1], 2: [2], 4: [3, 4], 7: [5], 16: [6]},
+        unmoved=[0, 1, 2, 5],
+        spectator_tiles={3: "forward"},
+    )
+    leg_odds = {odds.frog_idx: odds for odds in calculate_leg_odds(game_state)}
+    outcomes = calculate_move_outcomes(game_state)
+
+    assert sum(outcome.probability for outcome in outcomes) == pytest.approx(1.0)
+    for frog_idx, odds in leg_odds.items():
+        first = sum(
+            outcome.probability * next(o.first for o in outcome.leg_odds if o.frog_idx == frog_idx)
+            for outcome in outcomes
+        )
+        assert first == pytest.approx(odds.first)
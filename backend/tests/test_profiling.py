@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import threading
+import time
+
+from utils.profiling import SamplingProfiler, StallDetector, tag_work, untag_work
+
+
+def block(seconds: float):
+    time.sleep(seconds)
+
+
+def test_stall_is_logged_with_the_work_tags(caplog):
+    async def stall():
+        detector = StallDetector()
+        detector.start(0.02)
+        await asyncio.sleep(0.05)
+        tag_work(game_code="ABCD", event_type="move_frog")
+        try:
+            block(0.2)
+        finally:
+            untag_work()
+        await asyncio.sleep(0.1)
+        detector.stop()
+        return detector.num_stalls
+
+    with caplog.at_level(logging.WARNING, logger="utils.profiling"):
+        num_stalls = asyncio.run(stall())
+
+    assert num_stalls == 1
+    [record] = caplog.records
+    assert "in game ABCD handling move_frog" in record.message
+    assert "block" in record.message
+
+
+def test_untagged_stall(caplog):
+    async def stall():
+        detector = StallDetector()
+        detector.start(0.02)
+        await asyncio.sleep(0.05)
+        block(0.2)
+        await asyncio.sleep(0.1)
+        detector.stop()
+
+    with caplog.at_level(logging.WARNING, logger="utils.profiling"):
+        asyncio.run(stall())
+
+    [record] = caplog.records
+    assert " in game " not in record.message
+
+
+def test_sampling_profiler_folds_stacks():
+    profiler = SamplingProfiler()
+    done = threading.Event()
+    thread = threading.Thread(target=lambda: done.wait(1))
+    thread.start()
+
+    profiler.start(thread.ident, duration=0.2, interval=0.005)
+    time.sleep(0.1)
+    profiler.stop()
+    done.set()
+    thread.join()
+
+    folded = profiler.folded()
+    assert profiler.num_samples > 0
+    stack, count = folded.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert "wait" in stack.split(";")[-1]
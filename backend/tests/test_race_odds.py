@@ -0,0 +1,133 @@
+import asyncio
+from concurrent.futures import Executor, Future
+
+import pytest
+
+from game_state.engine import apply_event
+from game_state.events import MoveFrogEvent
+from game_state.game import Game
+from game_state.race_odds import RaceOddsEstimator, RaceSpec, simulate_races
+from game_state.state import GameState
+
+from tests.conftest import GAME_CODE, current_websocket_id
+
+
+class ManualExecutor(Executor):
+    """Holds every submitted batch until the test runs it."""
+
+    def __init__(self):
+        self.submitted: list[tuple[Future, tuple]] = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.submitted.append((future, (fn, *args)))
+        return future
+
+    def run_next(self):
+        """Runs the oldest batch that is still pending, cancelled ones are skipped."""
+        for future, (fn, *args) in self.submitted:
+            if not future.done() and future.set_running_or_notify_cancel():
+                future.set_result(fn(*args))
+                return
+        raise AssertionError("no pending batch")
+
+
+async def wait_for_batches(executor: ManualExecutor, num_batches: int):
+    async with asyncio.timeout(1):
+        while len(executor.submitted) < num_batches:
+            await asyncio.sleep(0.001)
+
+
+def test_simulated_races_all_have_a_winner_and_loser(game: GameState):
+    spec = RaceSpec.from_game_state(game)
+
+    wins, losses, num_finished = simulate_races(spec, num_races=200, seed=0)
+
+    assert num_finished == 200
+    assert wins.sum() == losses.sum() == num_finished
+    assert len(wins) == len(spec.forward_frogs)
+
+
+def test_estimate_stops_at_the_target_standard_error(game: GameState):
+    estimator = RaceOddsEstimator(
+        ManualExecutor(), batch_size=100, target_standard_error=1.0
+    )
+
+    async def run():
+        task = asyncio.create_task(estimator.estimate(RaceSpec.from_game_state(game)))
+        await wait_for_batches(estimator._executor, 1)
+        estimator._executor.run_next()
+        return await task
+
+    race_odds = asyncio.run(run())
+
+    assert len(estimator._executor.submitted) == 1
+    assert sum(odds.winner for odds in race_odds) == pytest.approx(1.0)
+
+
+def test_estimate_stops_when_the_time_budget_runs_out(game: GameState):
+    estimator = RaceOddsEstimator(
+        ManualExecutor(), batch_size=10, target_standard_error=0.0, time_budget_seconds=0.05
+    )
+
+    async def run():
+        task = asyncio.create_task(estimator.estimate(RaceSpec.from_game_state(game)))
+        await wait_for_batches(estimator._executor, 1)
+        estimator._executor.run_next()
+        await wait_for_batches(estimator._executor, 2)
+        await asyncio.sleep(0.05)
+        estimator._executor.run_next()
+        return await task
+
+    race_odds = asyncio.run(run())
+
+    # a standard error of 0 is out of reach, the second batch was past the deadline
+    assert len(estimator._executor.submitted) == 2
+    assert all(odds.winner_standard_error > 0 for odds in race_odds if 0 < odds.winner < 1)
+
+
+def test_cancelled_estimate_submits_no_more_batches(game: GameState):
+    estimator = RaceOddsEstimator(
+        ManualExecutor(), batch_size=10, target_standard_error=0.0, time_budget_seconds=60
+    )
+
+    async def run():
+        task = asyncio.create_task(estimator.estimate(RaceSpec.from_game_state(game)))
+        await wait_for_batches(estimator._executor, 1)
+        task.cancel()
+        estimator._executor.run_next()
+        await asyncio.sleep(0.01)
+        return task
+
+    task = asyncio.run(run())
+
+    assert task.cancelled()
+    assert len(estimator._executor.submitted) == 1
+
+
+def test_new_position_replaces_the_running_estimate(game: GameState):
+    estimator = RaceOddsEstimator(ManualExecutor(), batch_size=10, target_standard_error=1.0)
+
+    async def publish(game_state: GameState):
+        pass
+
+    async def run():
+        live_game = Game(GAME_CODE, game, publish, estimator)
+        live_game.update_odds()
+        first_task = live_game._race_odds_task
+        await wait_for_batches(estimator._executor, 1)
+
+        move = MoveFrogEvent(game_code=GAME_CODE, websocket_id=current_websocket_id(game))
+        apply_event(game, move)
+        live_game.update_odds()
+        await wait_for_batches(estimator._executor, 2)
+        estimator._executor.run_next()
+        await live_game._race_odds_task
+        return first_task
+
+    first_task = asyncio.run(run())
+
+    assert first_task.cancelled()
+    # the first position's batch was cancelled along with its task
+    assert estimator._executor.submitted[0][0].cancelled()
+    assert len(game.race_odds) == len(RaceSpec.from_game_state(game).forward_frogs)
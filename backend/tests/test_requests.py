@@ -0,0 +1,21 @@
+import pytest
+
+from api.requests import MAX_MESSAGE_BYTES, is_too_big
+
+
+@pytest.mark.parametrize(
+    "raw, too_big",
+    [
+        ("a" * MAX_MESSAGE_BYTES, False),
+        ("a" * (MAX_MESSAGE_BYTES + 1), True),
+        (b"a" * MAX_MESSAGE_BYTES, False),
+        (b"a" * (MAX_MESSAGE_BYTES + 1), True),
+        # 3 bytes a character in UTF-8
+        ("€" * (MAX_MESSAGE_BYTES // 3), False),
+        ("€" * (MAX_MESSAGE_BYTES // 3 + 1), True),
+        # 4 bytes a character
+        ("🐸" * (MAX_MESSAGE_BYTES // 4 + 1), True),
+    ],
+)
+def test_is_too_big_counts_bytes(raw, too_big: bool):
+    assert is_too_big(raw) is too_big
@@ -0,0 +1,70 @@
+import orjson
+
+from game_state.snapshot import PublishedState
+from game_state.state import GameState
+from game_state.updates import PlayerLegBetUpdate, UpdateLog
+from utils.ring_buffer import RingBuffer
+
+
+def test_sequence_numbers_count_across_evictions():
+    buffer = RingBuffer[str](capacity=3)
+
+    assert [buffer.append(item) for item in "abcde"] == [0, 1, 2, 3, 4]
+    assert list(buffer) == ["c", "d", "e"]
+    assert list(buffer.items()) == [(2, "c"), (3, "d"), (4, "e")]
+    assert (buffer.first_seq, buffer.next_seq) == (2, 5)
+
+
+def test_wraparound_keeps_order():
+    buffer = RingBuffer[int](capacity=4)
+    for i in range(11):
+        buffer.append(i)
+        assert list(buffer) == list(range(max(0, i - 3), i + 1))
+
+
+def test_since_cursor():
+    buffer = RingBuffer[str](capacity=3)
+    for item in "abcde":
+        buffer.append(item)
+
+    assert buffer.since(3) == [(3, "d"), (4, "e")]
+    # evicted items are gone, the rest is still returned
+    assert buffer.since(0) == [(2, "c"), (3, "d"), (4, "e")]
+    # a client that is up to date
+    assert buffer.since(5) == []
+    assert buffer.since(9) == []
+
+
+def test_cursor_stays_valid_after_clear():
+    buffer = RingBuffer[str](capacity=3)
+    for item in "ab":
+        buffer.append(item)
+    buffer.clear()
+
+    assert len(buffer) == 0
+    assert buffer.first_seq == buffer.next_seq == 2
+    assert buffer.since(1) == []
+    assert buffer.append("c") == 2
+    assert buffer.since(0) == [(2, "c")]
+
+
+def test_update_log_serializes_sequence_numbers():
+    updates = UpdateLog(capacity=2)
+    for frog_idx in range(3):
+        updates.append(PlayerLegBetUpdate(player_id="p", frog_idx=frog_idx))
+
+    assert updates.to_json_data() == [
+        {"player_id": "p", "frog_idx": 1, "type": "player_leg_bet", "seq": 1},
+        {"player_id": "p", "frog_idx": 2, "type": "player_leg_bet", "seq": 2},
+    ]
+
+
+def test_snapshot_only_has_updates_after_the_cursor(lobby: GameState):
+    for frog_idx in range(3):
+        lobby.updates.append(PlayerLegBetUpdate(player_id="p", frog_idx=frog_idx))
+    published = PublishedState.initial(lobby)
+
+    message = orjson.loads(published.encode_snapshot("player", updates_cursor=0))
+
+    assert [update["seq"] for update in message["game_state"]["updates"]] == [1, 2]
+    assert len(published.game_state["updates"]) == 3
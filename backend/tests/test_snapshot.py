@@ -0,0 +1,175 @@
+import copy
+import os
+import zlib
+
+import msgpack
+import orjson
+import pytest
+
+from game_state.engine import apply_event
+from game_state.events import LegBetEvent, MoveFrogEvent, StartGameEvent
+from game_state.snapshot import (
+    COMPRESS_SECONDS,
+    COMPRESSION_MIN_BYTES,
+    STATIC_KEYS,
+    PublishedState,
+    apply_patch,
+    make_patch,
+)
+from game_state.state import GameState
+
+from tests.conftest import GAME_CODE, current_websocket_id
+
+
+@pytest.mark.parametrize(
+    "old, new",
+    [
+        ({"a": 1, "b": [1, 2]}, {"a": 2, "b": [1, 2], "c": None}),
+        ({"a": [1, 2, 3, 4]}, {"a": [1]}),
+        ({"a": [1]}, {"a": [1, {"b": 2}, 3]}),
+        ({"a": {"b": {"c": 1}}}, {"a": {"b": {"d": 1}}}),
+        # keys that need escaping in a path
+        ({"a/b": 1, "c~d": {"~1": 2}}, {"a/b": 2, "c~d": {"~1": 3}}),
+        # a value that changes type
+        ({"a": 1}, {"a": 1.0}),
+        ({"a": [1, 2]}, {"a": {"0": 1}}),
+        # the whole document
+        ([1, 2], "three"),
+    ],
+)
+def test_patch_round_trip(old, new):
+    patch = make_patch(old, new)
+
+    assert apply_patch(copy.deepcopy(old), patch) == new
+    # a patch survives the trip through JSON to the client
+    assert apply_patch(copy.deepcopy(old), orjson.loads(orjson.dumps(patch))) == new
+
+
+def test_no_patch_without_changes():
+    doc = {"a": [1, {"b": "c"}]}
+    assert make_patch(doc, copy.deepcopy(doc)) == []
+
+
+def test_patch_tuples_like_lists():
+    assert make_patch({"a": (1, 2)}, {"a": [1, 2]}) == []
+
+
+def test_published_patches_rebuild_every_version(lobby: GameState):
+    """A delta client that applies every patch and update ends up with the latest snapshot."""
+    published = PublishedState.initial(lobby)
+    client = published.game_state
+
+    events = [StartGameEvent(game_code=GAME_CODE, websocket_id="host")]
+    events += [LegBetEvent(game_code=GAME_CODE, websocket_id="", frog_idx=1)]
+    events += [MoveFrogEvent(game_code=GAME_CODE, websocket_id="") for _ in range(20)]
+    for event in events:
+        if lobby.state == "game":
+            event.websocket_id = current_websocket_id(lobby)
+        apply_event(lobby, event)
+        published = published.next(lobby)
+
+        message = orjson.loads(published.encode_patch("player"))
+        assert message["base_version"] == published.version - 1
+        updates = client.pop("updates")
+        client = apply_patch(client, message["patch"])
+        client["updates"] = [
+            update for update in updates if update["seq"] >= message["updates_first_seq"]
+        ] + message["updates"]
+
+        assert client == published.game_state
+    assert published.version == len(events)
+
+
+def test_static_version_only_moves_with_static_keys(lobby: GameState):
+    published = PublishedState.initial(lobby)
+
+    apply_event(lobby, StartGameEvent(game_code=GAME_CODE, websocket_id="host"))
+    published = published.next(lobby)
+    # the frogs are created
+    assert published.static_version == 1
+
+    apply_event(lobby, MoveFrogEvent(game_code=GAME_CODE, websocket_id=current_websocket_id(lobby)))
+    published = published.next(lobby)
+    assert published.static_version == 1
+
+
+def unpack_state(message: bytes) -> dict:
+    """A packed full state or snapshot's game state, with its static block put back in."""
+    unpacked = msgpack.unpackb(message)
+    return {**unpacked["game_state"], **unpacked.get("static", {})}
+
+
+def test_packed_state_matches_json(game: GameState):
+    published = PublishedState.initial(game)
+
+    full = msgpack.unpackb(published.pack_full("player", with_static=True))
+    assert full["type"] == "player"
+    assert unpack_state(published.pack_full("player", with_static=True)) == published.game_state
+    assert unpack_state(published.pack_snapshot("player")) == published.game_state
+
+
+def test_static_block_is_left_out_when_not_asked_for(game: GameState):
+    published = PublishedState.initial(game)
+
+    full = msgpack.unpackb(published.pack_full("player", with_static=False))
+
+    assert "static" not in full
+    assert not set(STATIC_KEYS) & set(full["game_state"])
+
+
+def test_packed_patches_leave_static_ops_out(lobby: GameState):
+    published = PublishedState.initial(lobby)
+    client = unpack_state(published.pack_snapshot("player"))
+
+    apply_event(lobby, StartGameEvent(game_code=GAME_CODE, websocket_id="host"))
+    published = published.next(lobby, pack=True)
+    started = msgpack.unpackb(published.pack_patch("player", with_static=True))
+    move = MoveFrogEvent(game_code=GAME_CODE, websocket_id=current_websocket_id(lobby))
+    apply_event(lobby, move)
+    published = published.next(lobby, pack=True)
+    moved = msgpack.unpackb(published.pack_patch("player", with_static=False))
+
+    assert "static" not in moved
+    for message in (started, moved):
+        assert all(op["path"].split("/")[1] not in STATIC_KEYS for op in message["patch"])
+        updates = client.pop("updates")
+        client = apply_patch(client, message["patch"])
+        client.update(message.get("static", {}))
+        client["updates"] = [
+            update for update in updates if update["seq"] >= message["updates_first_seq"]
+        ] + message["updates"]
+    assert client == published.game_state
+
+
+def test_packed_snapshot_after_the_cursor(game: GameState):
+    apply_event(game, MoveFrogEvent(game_code=GAME_CODE, websocket_id=current_websocket_id(game)))
+    published = PublishedState.initial(game)
+    cursor = game.updates.next_seq - 2
+
+    snapshot = msgpack.unpackb(published.pack_snapshot("player", updates_cursor=cursor))
+
+    assert [update["seq"] for update in snapshot["game_state"]["updates"]] == [cursor + 1]
+    assert set(snapshot["static"]) == set(STATIC_KEYS)
+
+
+def test_compressed_once_for_every_socket(game: GameState):
+    published = PublishedState.initial(game)
+    message = published.encode_full("player")
+    num_compressed = COMPRESS_SECONDS.count
+
+    compressed = published.compress(message)
+
+    assert isinstance(compressed, bytes)
+    assert zlib.decompress(compressed).decode() == message
+    # the payload of every other socket is the same one, and isn't compressed again
+    assert published.compress(published.encode_full("player")) is compressed
+    assert COMPRESS_SECONDS.count == num_compressed + 1
+
+
+def test_small_and_incompressible_payloads_are_left_alone(game: GameState):
+    published = PublishedState.initial(game)
+    small = "x" * (COMPRESSION_MIN_BYTES - 1)
+    incompressible = os.urandom(COMPRESSION_MIN_BYTES * 4)
+
+    assert published.compress(small) is small
+    assert published.compress(incompressible) is incompressible
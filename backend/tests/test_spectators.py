@@ -0,0 +1,110 @@
+import asyncio
+
+from game_state.snapshot import PublishedState
+from game_state.spectators import SpectatorTier
+from game_state.state import GameState
+
+
+class FakeWriter:
+    def __init__(self):
+        self.published: list[PublishedState] = []
+        self.closed = False
+
+    def publish(self, published: PublishedState):
+        self.published.append(published)
+
+    async def close(self, code: int):
+        self.closed = True
+
+
+def test_reservations_up_to_capacity():
+    async def run():
+        tier = SpectatorTier(max_spectators=2)
+        reserved = [tier.reserve(websocket_id) for websocket_id in ("a", "b", "c")]
+        # a spectator reconnecting keeps its place even so
+        tier.admit("b")
+        tier.writers["b"] = FakeWriter()
+        tier.hold("d")
+        await tier.close()
+        return tier, reserved
+
+    tier, reserved = asyncio.run(run())
+
+    assert reserved == [True, True, False]
+    assert "a" in tier and "b" in tier and "c" not in tier
+    assert list(tier.reservations) == ["a", "d"]
+    assert tier.full
+
+
+def test_admit():
+    async def run():
+        tier = SpectatorTier(max_spectators=2)
+        tier.reserve("a")
+        tier.writers["b"] = FakeWriter()
+        admitted = {
+            "a": tier.admit("a"),
+            # already connected, e.g. a second websocket for the same spectator
+            "b": tier.admit("b"),
+            # not reserved, but there is room once "a" has its writer
+            "c": tier.admit("c"),
+        }
+        tier.writers["c"] = FakeWriter()
+        admitted["d"] = tier.admit("d")
+        await tier.close()
+        return tier, admitted
+
+    tier, admitted = asyncio.run(run())
+
+    assert admitted == {"a": True, "b": True, "c": True, "d": False}
+    assert tier.reservations == {}
+
+
+def test_expired_reservations_leave():
+    left = []
+
+    async def on_leave(websocket_id: str):
+        left.append(websocket_id)
+
+    async def run():
+        tier = SpectatorTier(on_leave=on_leave, reservation_seconds=0.1)
+        tier.reserve("a")
+        tier.reserve("b")
+        tier.reserve("c")
+        await asyncio.sleep(0.05)
+        # "b" connects in time, "c" reconnects and gets its time again
+        tier.admit("b")
+        tier.hold("c")
+        await asyncio.sleep(0.075)
+        left_in_time = list(left)
+        await asyncio.sleep(0.075)
+        await tier.close()
+        return left_in_time
+
+    left_in_time = asyncio.run(run())
+
+    assert left_in_time == ["a"]
+    assert left == ["a", "c"]
+
+
+def test_spectators_only_get_the_latest_state_at_the_max_rate(lobby: GameState):
+    versions = [PublishedState.initial(lobby)]
+    for _ in range(3):
+        versions.append(versions[-1].next(lobby))
+
+    async def run():
+        tier = SpectatorTier(max_rate=20)
+        writers = [FakeWriter() for _ in range(3)]
+        for i, writer in enumerate(writers):
+            tier.writers[f"s{i}"] = writer
+        for published in versions:
+            tier.publish(published)
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.1)
+        await tier.close()
+        return writers
+
+    writers = asyncio.run(run())
+
+    for writer in writers:
+        assert [published.version for published in writer.published] == [0, 3]
+        assert writer.closed
@@ -0,0 +1,79 @@
+import asyncio
+
+from game_state.snapshot import PublishedState
+from game_state.state import GameState
+from game_state.stream import STREAM_RETRY_MS, FrameBuffer
+
+
+def make_buffer(game_state: GameState, num_versions: int, capacity: int = 4) -> FrameBuffer:
+    """A buffer that was published versions 1 to num_versions - 1."""
+    published = PublishedState.initial(game_state)
+    buffer = FrameBuffer(published, capacity)
+    for _ in range(num_versions - 1):
+        published = published.next(game_state)
+        buffer.publish(published)
+    return buffer
+
+
+def parse_frames(frames: str) -> list[tuple[int, str]]:
+    """The (id, event) of every frame."""
+    parsed = []
+    for frame in frames.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.splitlines())
+        if "id" in fields:
+            parsed.append((int(fields["id"]), fields["event"]))
+    return parsed
+
+
+def test_resume_within_the_buffer_gets_patches(lobby: GameState):
+    buffer = make_buffer(lobby, 6)
+
+    assert parse_frames(buffer.frames_since(3)) == [(4, "patch"), (5, "patch")]
+    assert [version for version, _ in parse_frames(buffer.frames_since(1))] == [2, 3, 4, 5]
+    assert buffer.frames_since(5) == ""
+
+
+def test_resume_past_the_buffer_gets_a_snapshot(lobby: GameState):
+    buffer = make_buffer(lobby, 6)
+
+    for cursor in (None, 0, -1, 9):
+        assert parse_frames(buffer.frames_since(cursor)) == [(5, "snapshot")]
+    # encoded once for every watcher
+    assert buffer.frames_since(None) is buffer.frames_since(0)
+
+
+def test_version_gap_drops_the_patches(lobby: GameState):
+    buffer = make_buffer(lobby, 3)
+    recovered = PublishedState.initial(lobby)
+    recovered.version = 7
+
+    buffer.publish(recovered)
+
+    assert parse_frames(buffer.frames_since(2)) == [(7, "snapshot")]
+    assert parse_frames(buffer.frames_since(6)) == [(7, "patch")]
+
+
+def test_watch_resumes_after_the_last_event_id(lobby: GameState):
+    buffer = make_buffer(lobby, 3)
+
+    async def run():
+        frames = []
+
+        async def watch():
+            async for frame in buffer.watch(last_event_id=1, min_interval=0):
+                frames.append(frame)
+
+        task = asyncio.create_task(watch())
+        await asyncio.sleep(0.01)
+        assert buffer.num_watchers == 1
+        buffer.publish(buffer.latest.next(lobby))
+        await asyncio.sleep(0.01)
+        buffer.close()
+        await asyncio.wait_for(task, 1)
+        return frames
+
+    frames = asyncio.run(run())
+
+    assert frames[0] == f"retry: {STREAM_RETRY_MS}\n\n"
+    assert parse_frames("".join(frames)) == [(2, "patch"), (3, "patch")]
+    assert buffer.num_watchers == 0
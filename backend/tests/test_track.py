@@ -0,0 +1,125 @@
+import pytest
+
+from game_state.track import Track
+
+
+def make_track(num_tiles: int = 10, num_frogs: int = 4) -> Track:
+    """Frogs 0 and 1 stacked on tile 1 (1 on top), frog 2 on tile 3, frog 3 unranked on 5."""
+    track = Track(num_tiles, num_frogs)
+    track.place_frog(0, 1)
+    track.place_frog(1, 1)
+    track.place_frog(2, 3)
+    track.place_frog(3, 5, ranked=False)
+    return track
+
+
+def assert_consistent(track: Track):
+    """The frog -> (tile, height) index matches the stacks."""
+    for tile_idx, tile in enumerate(track):
+        for height, frog_idx in enumerate(tile.frogs):
+            assert track.position(frog_idx) == (tile_idx, height)
+
+
+def test_place_frog_ranks_by_tile_then_height():
+    track = make_track()
+
+    assert track.ranking == [2, 1, 0]
+    assert track.position(1) == (1, 1)
+    assert_consistent(track)
+
+
+def test_move_pile_carries_the_frogs_on_top():
+    track = make_track()
+
+    assert track.move_pile(0, 3) == 4
+
+    assert track[1].frogs == []
+    assert track[4].frogs == [0, 1]
+    assert track.ranking == [1, 0, 2]
+    assert_consistent(track)
+
+
+def test_move_pile_from_the_middle_of_a_stack():
+    track = make_track()
+    track.move_pile(2, -2)
+    # tile 1 is now 0, 1, 2 from the bottom
+    assert track.ranking == [2, 1, 0]
+
+    assert track.move_pile(1, 1) == 2
+
+    assert track[1].frogs == [0]
+    assert track[2].frogs == [1, 2]
+    assert track.ranking == [2, 1, 0]
+    assert_consistent(track)
+
+
+def test_move_pile_is_clamped_to_the_track():
+    track = make_track()
+
+    assert track.move_pile(2, 100) == len(track) - 1
+    assert track.move_pile(0, -100) == 0
+
+    assert track.ranking == [2, 1, 0]
+    assert_consistent(track)
+
+
+def test_unranked_frogs_move_without_ranking():
+    track = make_track()
+
+    track.move_pile(3, -2)
+
+    assert track[3].frogs == [2, 3]
+    assert track.ranking == [2, 1, 0]
+    assert_consistent(track)
+
+
+def test_ranked_frogs_carried_by_unranked_frogs_keep_their_order():
+    track = make_track()
+    # frog 2 lands on the unranked frog 3, which carries it back to tile 1
+    track.move_pile(2, 2)
+    track.move_pile(3, -4)
+
+    assert track[1].frogs == [0, 1, 3, 2]
+    assert track.ranking == [2, 1, 0]
+    assert_consistent(track)
+
+
+def test_position_of_a_frog_off_the_track():
+    with pytest.raises(ValueError):
+        Track(5, 1).position(0)
+
+
+def test_spectator_tile_placements():
+    track = make_track()
+
+    # not on the start or finish, nor on a frog
+    assert track.spectator_tile_placements() == [2, 4, 6, 7, 8]
+    assert [tile.can_spectator_tile_be_placed for tile in track] == [
+        tile_idx in (2, 4, 6, 7, 8) for tile_idx in range(len(track))
+    ]
+
+
+def test_spectator_tile_blocks_its_neighbours():
+    track = make_track()
+
+    track.place_spectator_tile(7, "player", "Player", "forward")
+
+    assert track.spectator_tile_placements() == [2, 4]
+    assert track[7].spectator_tile.direction == 1
+
+    track.clear_spectator_tiles()
+    assert track.spectator_tile_placements() == [2, 4, 6, 7, 8]
+
+
+def test_spectator_tile_placements_follow_the_frogs():
+    track = make_track()
+
+    track.move_pile(2, 3)
+
+    assert track.can_place_spectator_tile(3)
+    assert not track.can_place_spectator_tile(6)
+
+
+@pytest.mark.parametrize("tile_idx", [-1, -5, 10, 64, 1000])
+def test_spectator_tile_off_the_track(tile_idx: int):
+    assert not make_track().can_place_spectator_tile(tile_idx)
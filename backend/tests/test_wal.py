@@ -0,0 +1,95 @@
+import asyncio
+import os
+
+import pytest
+
+from game_state.events import LegBetEvent, MoveFrogEvent, PlayerJoinEvent
+from game_state.wal import WriteAheadLog
+
+from tests.conftest import GAME_CODE
+
+
+EVENTS = [
+    PlayerJoinEvent(game_code=GAME_CODE, websocket_id="host", player_name="Host"),
+    MoveFrogEvent(game_code=GAME_CODE, websocket_id="host"),
+    LegBetEvent(game_code=GAME_CODE, websocket_id="host", frog_idx=2),
+]
+
+
+@pytest.fixture
+def wal(tmp_path) -> WriteAheadLog:
+    wal = WriteAheadLog(str(tmp_path))
+    wal.create(GAME_CODE, seed=42)
+    for event in EVENTS:
+        wal.append(GAME_CODE, event)
+    asyncio.run(wal.commit())
+    return wal
+
+
+def wal_path(wal: WriteAheadLog) -> str:
+    return os.path.join(wal.directory, f"{GAME_CODE}.wal")
+
+
+def test_recover(wal: WriteAheadLog):
+    [game] = wal.recover()
+
+    assert game.game_code == GAME_CODE
+    assert game.seed == 42
+    assert game.events == EVENTS
+
+
+def test_recover_cuts_off_a_torn_line(wal: WriteAheadLog):
+    path = wal_path(wal)
+    with open(path, "rb") as f:
+        whole = f.read()
+    torn_line = MoveFrogEvent(game_code=GAME_CODE, websocket_id="host").model_dump_json()
+    with open(path, "ab") as f:
+        f.write(torn_line[:20].encode())
+
+    [game] = wal.recover()
+
+    assert game.events == EVENTS
+    with open(path, "rb") as f:
+        assert f.read() == whole
+
+    # later appends start on a fresh line
+    wal.append(GAME_CODE, EVENTS[1])
+    asyncio.run(wal.commit())
+    [game] = wal.recover()
+    assert game.events == EVENTS + [EVENTS[1]]
+
+
+def test_recover_skips_a_bad_event(wal: WriteAheadLog):
+    with open(wal_path(wal), "ab") as f:
+        f.write(b'{"type": "no_such_event"}\n')
+    wal.append(GAME_CODE, EVENTS[0])
+    asyncio.run(wal.commit())
+
+    [game] = wal.recover()
+
+    assert game.events == EVENTS + [EVENTS[0]]
+
+
+def test_recover_discards_a_log_without_a_header(wal: WriteAheadLog):
+    with open(wal_path(wal), "wb") as f:
+        f.write(b'{"game_co')
+
+    assert wal.recover() == []
+    assert not os.path.exists(wal_path(wal))
+
+
+def test_create_starts_the_log_over(wal: WriteAheadLog):
+    wal.create(GAME_CODE, seed=7)
+    asyncio.run(wal.commit())
+
+    [game] = wal.recover()
+
+    assert game.seed == 7
+    assert game.events == []
+
+
+def test_remove(wal: WriteAheadLog):
+    wal.remove(GAME_CODE)
+    asyncio.run(wal.commit())
+
+    assert wal.recover() == []
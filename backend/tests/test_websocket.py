@@ -0,0 +1,66 @@
+import msgpack
+import orjson
+import pytest
+
+from api.requests import MSGPACK_SUBPROTOCOL
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+def create_players(client) -> tuple[str, str]:
+    """A game with two players, and the websocket id of its host."""
+    game_code = client.post("/leapfrog/host").json()["game_code"]
+    websocket_ids = [
+        client.post(f"/leapfrog/game/{game_code}/create-player", json={"name": name}).json()[
+            "websocket_id"
+        ]
+        for name in ("Host", "Guest")
+    ]
+    return game_code, websocket_ids[0]
+
+
+def test_msgpack_is_negotiated(client):
+    game_code, websocket_id = create_players(client)
+
+    with client.websocket_connect(
+        f"/leapfrog/game/{game_code}?websocket_id={websocket_id}",
+        subprotocols=[MSGPACK_SUBPROTOCOL],
+    ) as websocket:
+        assert websocket.accepted_subprotocol == MSGPACK_SUBPROTOCOL
+        first = msgpack.unpackb(websocket.receive_bytes())
+        # events come in as MessagePack too
+        websocket.send_bytes(msgpack.packb({"type": "start_game", "gameCode": game_code}))
+        started = msgpack.unpackb(websocket.receive_bytes())
+        while started["game_state"]["state"] != "game":
+            # states of the players joining that were still on their way
+            started = msgpack.unpackb(websocket.receive_bytes())
+        websocket.send_bytes(msgpack.packb({"type": "resync"}))
+        resent = msgpack.unpackb(websocket.receive_bytes())
+
+    assert first["static"]["game_code"] == game_code
+    assert "frogs" not in first["game_state"]
+    # the frogs were created, so the static block changed
+    assert len(started["static"]["frogs"]) > 0
+    assert resent["game_state"]["state"] == "game"
+    assert "static" not in resent
+
+
+def test_json_without_the_subprotocol(client):
+    game_code, websocket_id = create_players(client)
+
+    with client.websocket_connect(
+        f"/leapfrog/game/{game_code}?websocket_id={websocket_id}"
+    ) as websocket:
+        assert websocket.accepted_subprotocol is None
+        message = orjson.loads(websocket.receive_text())
+
+    assert message["game_state"]["game_code"] == game_code
+    assert "static" not in message
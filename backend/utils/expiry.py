@@ -0,0 +1,58 @@
+from heapq import heappop, heappush
+from typing import Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+
+class ExpiryHeap(Generic[K]):
+    """
+    Min-heap of keys by time, for finding the keys that are due without looking at all of them.
+
+    Every key has at most one live entry. Scheduling a key again replaces its entry, and the old
+    one is dropped lazily once it reaches the top, so scheduling is O(log n) and popping the due
+    keys is O(k log n) for k due entries.
+    """
+
+    __slots__ = ("_heap", "_scheduled")
+
+    def __init__(self):
+        self._heap: list[tuple[float, K]] = []
+        # the time of every key's live entry
+        self._scheduled: dict[K, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._scheduled)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._scheduled
+
+    def __repr__(self) -> str:
+        return f"<ExpiryHeap object with {len(self)} key(s)>"
+
+    def schedule(self, key: K, at: float):
+        self._scheduled[key] = at
+        heappush(self._heap, (at, key))
+
+    def discard(self, key: K):
+        self._scheduled.pop(key, None)
+
+    def next_time(self) -> float | None:
+        """Time of the earliest live entry, if there is one."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, before: float) -> list[K]:
+        """Removes and returns every key scheduled before `before`, earliest first."""
+        due = []
+        heap, scheduled = self._heap, self._scheduled
+        while heap and heap[0][0] < before:
+            at, key = heappop(heap)
+            if scheduled.get(key) == at:
+                del scheduled[key]
+                due.append(key)
+        return due
+
+    def _drop_stale(self):
+        heap, scheduled = self._heap, self._scheduled
+        while heap and scheduled.get(heap[0][1]) != heap[0][0]:
+            heappop(heap)
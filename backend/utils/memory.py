@@ -0,0 +1,70 @@
+import asyncio
+from collections import deque
+from concurrent.futures import Executor
+import sys
+import types
+from array import array
+from typing import Any
+
+# objects from these packages are walked into, anything else is only counted shallowly
+_OWN_PACKAGES = ("game_state", "utils", "headless")
+_SKIPPED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    asyncio.AbstractEventLoop,
+    Executor,
+)
+
+
+def _slot_names(cls: type) -> list[str]:
+    names = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get("__slots__", ())
+        names.extend((slots,) if isinstance(slots, str) else slots)
+    return names
+
+
+def deep_sizeof(obj: Any, seen: set[int] | None = None) -> int:
+    """
+    Approximate bytes retained by `obj`: its own size plus everything it refers to that wasn't
+    already counted in `seen`. Pass the same `seen` to several calls to split one object graph
+    into components without counting shared objects twice.
+
+    Containers and objects of this package are walked into. Other objects (websockets, tasks,
+    futures...) only count their own size, so a walk never wanders into the event loop.
+    """
+    if seen is None:
+        seen = set()
+
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SKIPPED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool, array)) or obj is None:
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(obj)
+        elif isinstance(obj, asyncio.Task):
+            size += sys.getsizeof(obj.get_coro())
+        elif isinstance(obj, asyncio.Queue):
+            stack.extend(
+                value for name, value in vars(obj).items() if name != "_loop"
+            )
+        elif type(obj).__module__.startswith(_OWN_PACKAGES):
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for name in _slot_names(type(obj)):
+                if name not in ("__dict__", "__weakref__") and hasattr(obj, name):
+                    stack.append(getattr(obj, name))
+    return size
@@ -0,0 +1,220 @@
+"""
+Diagnostics for a slow server that cost nothing until they are started: a sampling profiler and a
+detector for event loop steps that block the loop for too long.
+
+Both run on a daemon thread of their own and read the event loop thread's stack from the outside
+with sys._current_frames, so the loop runs no extra code per step and they work the same on
+uvloop as on asyncio.
+"""
+
+import asyncio
+from collections import Counter
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from types import CodeType
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_INTERVAL = 0.005
+# innermost frames of a blocked stack that are logged
+STALL_STACK_DEPTH = 12
+
+
+def _code_label(code: CodeType) -> str:
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+# what each thread is working on, by thread id, as set with tag_work
+_work_tags: dict[int, dict[str, str]] = {}
+
+
+def tag_work(**tags: str):
+    """
+    Records what the calling thread is working on, e.g. its game_code and event_type, until
+    untag_work, for the stall detector to report. Code that awaits in between must untag first,
+    or a stall in another task would be put down to it.
+
+    The tags are kept here rather than read off the stack, since reading the locals of a frame
+    that another thread is running makes the interpreter copy them into the frame's dict.
+    """
+    _work_tags[threading.get_ident()] = tags
+
+
+def untag_work():
+    _work_tags.pop(threading.get_ident(), None)
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread every `interval` seconds for `duration` seconds and renders
+    the samples as folded stacks, one "outer;inner;leaf count" line per distinct stack, which is
+    what flamegraph.pl, speedscope and most other flame graph viewers read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._stacks: Counter[tuple[str, ...]] = Counter()
+
+    @property
+    def running(self) -> bool:
+        return (
+            self._thread is not None
+            and self._thread.is_alive()
+            and not self._stop.is_set()
+        )
+
+    @property
+    def num_samples(self) -> int:
+        with self._lock:
+            return sum(self._stacks.values())
+
+    def start(
+        self,
+        thread_id: int,
+        duration: float,
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+    ):
+        """Starts sampling, dropping the samples of the last run. Fails if it is already running."""
+        if self.running:
+            raise RuntimeError("The profiler is already running")
+        # a stopped run may still take one more sample, into its own counter
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(thread_id, duration, interval, self._stop, self._stacks),
+            name="sampling-profiler",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stops sampling, without waiting for the sampler thread to notice."""
+        self._stop.set()
+
+    def _run(
+        self,
+        thread_id: int,
+        duration: float,
+        interval: float,
+        stop: threading.Event,
+        stacks: Counter[tuple[str, ...]],
+    ):
+        labels: dict[CodeType, str] = {}
+        deadline = time.monotonic() + duration
+        while not stop.wait(interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                # the thread is gone
+                return
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _code_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            stack.reverse()
+            with self._lock:
+                stacks[tuple(stack)] += 1
+
+    def folded(self) -> str:
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks)
+
+
+class StallDetector:
+    """
+    Logs every time the event loop is blocked for longer than `threshold` seconds, by a single
+    slow step or a run of steps without the loop getting back to its timers in between.
+
+    A callback on the loop records a heartbeat every `threshold / 2` seconds, and a watcher thread
+    that finds the heartbeat late takes the stack the loop is stuck in. Once the loop moves on,
+    the stall is logged with its duration, that stack and the game code and event type the loop
+    was tagged with (see tag_work).
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._heartbeat: asyncio.TimerHandle | None = None
+        self._last_beat = 0.0
+        self.threshold: float | None = None
+        self.num_stalls = 0
+
+    @property
+    def running(self) -> bool:
+        return self.threshold is not None
+
+    def start(self, threshold: float):
+        """
+        Starts watching the running event loop, with a new threshold if it already is.
+        Must be called from the loop's thread, like stop.
+        """
+        self.stop()
+        loop = asyncio.get_running_loop()
+        interval = threshold / 2
+        self.threshold = threshold
+        self._last_beat = time.monotonic()
+
+        def beat():
+            self._last_beat = time.monotonic()
+            self._heartbeat = loop.call_later(interval, beat)
+
+        beat()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._watch,
+            args=(threading.get_ident(), threshold, interval, self._stop),
+            name="stall-detector",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stops watching, without waiting for the watcher thread to notice."""
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        self.threshold = None
+
+    def _watch(
+        self, thread_id: int, threshold: float, interval: float, stop: threading.Event
+    ):
+        # the heartbeat the current stall started after, and what the loop was doing in it
+        stalled_beat = None
+        stack: list[str] = []
+        tags: dict[str, str] = {}
+        while not stop.wait(interval / 2):
+            last_beat = self._last_beat
+            if stalled_beat is not None and last_beat != stalled_beat:
+                self.num_stalls += 1
+                self._log(last_beat - stalled_beat - interval, stack, tags)
+                stalled_beat = None
+            if stalled_beat is None and time.monotonic() - last_beat > interval + threshold:
+                frame = sys._current_frames().get(thread_id)
+                if frame is None:
+                    return
+                stalled_beat = last_beat
+                stack = traceback.format_stack(frame, limit=STALL_STACK_DEPTH)
+                tags = dict(_work_tags.get(thread_id, {}))
+
+    def _log(self, duration: float, stack: list[str], tags: dict[str, str]):
+        where = ""
+        if "game_code" in tags:
+            where += f" in game {tags['game_code']}"
+        if "event_type" in tags:
+            where += f" handling {tags['event_type']}"
+        logger.warning(
+            f"Event loop blocked for {duration * 1e3:.0f} ms{where}, at:\n" + "".join(stack)
+        )
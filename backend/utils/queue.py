@@ -1,3 +1,4 @@
+from collections import deque
 from typing import Generic, TypeVar
 import asyncio
 
@@ -6,24 +7,32 @@ T = TypeVar("T")
 
 class TypedQueue(Generic[T]):
     """
-    A type-hinted wrapper around asyncio.Queue.
+    A type-hinted, event-loop friendly FIFO queue with the semantics of asyncio.Queue.
     Everything here is non-blocking and event-loop friendly.
+
+    There is one of these per game and per websocket, and most of them sit empty, so unlike
+    asyncio.Queue the item buffer and waiter lists are only allocated while they are in use.
     """
 
+    __slots__ = ("_maxsize", "_items", "_getters", "_putters", "_unfinished_tasks")
+
     def __init__(self, maxsize: int = 0):
-        # Changed to asyncio.Queue
-        self._queue: asyncio.Queue[T] = asyncio.Queue(maxsize=maxsize)
+        self._maxsize = maxsize
+        self._items: deque[T] | None = None
+        self._getters: list[asyncio.Future] | None = None
+        self._putters: list[asyncio.Future] | None = None
+        self._unfinished_tasks = 0
 
     # --- Container Dunder Methods ---
 
     def __len__(self) -> int:
-        return self._queue.qsize()
+        return self.qsize()
 
     def __bool__(self) -> bool:
-        return not self._queue.empty()
+        return not self.empty()
 
     def __repr__(self) -> str:
-        size = self._queue.qsize()
+        size = self.qsize()
         return f"<TypedQueue object with {size} item(s)>"
 
     # --- Async Queue Methods ---
@@ -33,33 +42,96 @@ class TypedQueue(Generic[T]):
         Puts an item into the queue.
         If the queue is full, it will 'await' until there is space.
         """
-        await self._queue.put(item)
+        while self.full():
+            putter = asyncio.get_running_loop().create_future()
+            if self._putters is None:
+                self._putters = []
+            self._putters.append(putter)
+            try:
+                await putter
+            except BaseException:
+                self._discard_waiter(self._putters, putter)
+                if not self.full() and not putter.cancelled():
+                    # we were woken up but can't take the slot, pass it on
+                    self._wake_next(self._putters)
+                raise
+        self.put_nowait(item)
 
     def put_nowait(self, item: T) -> None:
         """
         Puts an item without awaiting.
         Use this inside synchronous functions or when you know the queue isn't full.
+        Raises asyncio.QueueFull if the queue is full.
         """
-        self._queue.put_nowait(item)
+        if self.full():
+            raise asyncio.QueueFull
+        if self._items is None:
+            self._items = deque()
+        self._items.append(item)
+        self._unfinished_tasks += 1
+        self._wake_next(self._getters)
 
     async def get(self) -> T:
         """
         Removes and returns an item.
         If the queue is empty, it 'await's (yields control) until an item arrives.
         """
-        return await self._queue.get()
+        while self.empty():
+            getter = asyncio.get_running_loop().create_future()
+            if self._getters is None:
+                self._getters = []
+            self._getters.append(getter)
+            try:
+                await getter
+            except BaseException:
+                self._discard_waiter(self._getters, getter)
+                if not self.empty() and not getter.cancelled():
+                    # we were woken up but won't take the item, pass it on
+                    self._wake_next(self._getters)
+                raise
+        return self.get_nowait()
+
+    def get_nowait(self) -> T:
+        """
+        Removes and returns an item without awaiting.
+        Raises asyncio.QueueEmpty if there is nothing in the queue.
+        """
+        if self.empty():
+            raise asyncio.QueueEmpty
+        item = self._items.popleft()
+        if not self._items:
+            # idle queues shouldn't hold on to a buffer
+            self._items = None
+        self._wake_next(self._putters)
+        return item
 
     def task_done(self) -> None:
-        """Required if you want to use join() or track task completion."""
-        self._queue.task_done()
+        """Required if you want to track task completion."""
+        if self._unfinished_tasks <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished_tasks -= 1
 
     # --- Helpers ---
 
     def qsize(self) -> int:
-        return self._queue.qsize()
+        return len(self._items) if self._items is not None else 0
 
     def empty(self) -> bool:
-        return self._queue.empty()
+        return self._items is None
 
     def full(self) -> bool:
-        return self._queue.full()
+        return 0 < self._maxsize <= self.qsize()
+
+    @staticmethod
+    def _wake_next(waiters: list[asyncio.Future] | None):
+        while waiters:
+            waiter = waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    @staticmethod
+    def _discard_waiter(waiters: list[asyncio.Future] | None, waiter: asyncio.Future):
+        waiter.cancel()
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
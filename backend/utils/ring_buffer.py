@@ -0,0 +1,79 @@
+from itertools import chain
+from typing import Generic, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class RingBuffer(Generic[T]):
+    """
+    A fixed-capacity buffer where every appended item gets a monotonic sequence number.
+    Appending to a full buffer evicts the oldest item, so memory stays bounded.
+    Sequence numbers keep counting across evictions and clear(), so a cursor stays valid forever.
+    Items live in a plain list that only grows up to capacity and is then overwritten in place,
+    so an empty buffer costs next to nothing.
+    """
+
+    __slots__ = ("_items", "_capacity", "_start", "_next_seq")
+
+    def __init__(self, capacity: int):
+        self._items: list[T] = []
+        self._capacity = capacity
+        # index of the oldest item once the list is full
+        self._start = 0
+        self._next_seq = 0
+
+    # --- Container Dunder Methods ---
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[T]:
+        if self._start == 0:
+            return iter(self._items)
+        return chain(self._items[self._start :], self._items[: self._start])
+
+    def __repr__(self) -> str:
+        return f"<RingBuffer object with {len(self._items)}/{self.capacity} item(s), next seq {self._next_seq}>"
+
+    # --- Sequence Numbers ---
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def next_seq(self) -> int:
+        """Sequence number the next appended item will get."""
+        return self._next_seq
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest retained item (equal to next_seq when empty)."""
+        return self._next_seq - len(self._items)
+
+    # --- Buffer Methods ---
+
+    def append(self, item: T) -> int:
+        """Appends an item, evicting the oldest one if full, and returns its sequence number."""
+        if len(self._items) < self._capacity:
+            self._items.append(item)
+        else:
+            self._items[self._start] = item
+            self._start = (self._start + 1) % self._capacity
+        self._next_seq += 1
+        return self._next_seq - 1
+
+    def clear(self) -> None:
+        self._items = []
+        self._start = 0
+
+    def items(self) -> Iterator[tuple[int, T]]:
+        """Iterates over (sequence number, item) pairs, oldest first."""
+        return enumerate(iter(self), start=self.first_seq)
+
+    def since(self, seq: int) -> list[tuple[int, T]]:
+        """Returns the retained (sequence number, item) pairs with a sequence number >= seq."""
+        count = self._next_seq - max(seq, self.first_seq)
+        if count <= 0:
+            return []
+        return list(self.items())[-count:]
@@ -0,0 +1,27 @@
+from dataclasses import fields
+from typing import Any
+
+_field_names: dict[type, tuple[str, ...]] = {}
+
+
+def to_json_data(obj: Any) -> Any:
+    """
+    Converts dataclasses (recursively) into plain JSON-like data, similar to dataclasses.asdict.
+    Tuples become lists, and objects can provide their own view with a `to_json_data` method.
+    Dataclass fields with `metadata={"json": False}` are left out.
+    """
+    cls = type(obj)
+    if obj is None or cls is str or cls is int or cls is float or cls is bool:
+        return obj
+    if cls is list or cls is tuple:
+        return [to_json_data(value) for value in obj]
+    if cls is dict:
+        return {key: to_json_data(value) for key, value in obj.items()}
+    if hasattr(obj, "to_json_data"):
+        return obj.to_json_data()
+
+    names = _field_names.get(cls)
+    if names is None:
+        names = tuple(f.name for f in fields(obj) if f.metadata.get("json", True))
+        _field_names[cls] = names
+    return {name: to_json_data(getattr(obj, name)) for name in names}
@@ -0,0 +1,9 @@
+import zlib
+
+
+def shard_for(key: str, num_shards: int) -> int:
+    """
+    Deterministically maps a key (e.g. a game code) to a shard index.
+    Unlike hash(), this is stable across processes and restarts.
+    """
+    return zlib.crc32(key.encode()) % num_shards
@@ -251,7 +251,8 @@ export const GameStateSchema = z.object({
         .describe("List of updates/events from server."),
     connections: z
         .array(ConnectionSchema)
-        .describe("All connection objects (players and spectators)."),
+        .describe("Player connection objects, spectators are only counted."),
+    num_spectators: z.number().int().describe("Number of spectators."),
     players: z
         .record(z.string(), PlayerSchema)
         .describe("Player map keyed by player_id."),
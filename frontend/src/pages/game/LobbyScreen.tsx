@@ -20,14 +20,11 @@ const LobbyScreen = ({
         sendJsonMessage(makeStartGameEvent(gameCode, websocketId));
     };
 
+    // spectators aren't listed in connections
     const connection = gameState.connections.find(
         (conn) => conn.websocket_id === websocketId
     );
 
-    if (connection === undefined) {
-        return <></>;
-    }
-
     return (
         <Grid
             container
@@ -53,15 +50,8 @@ const LobbyScreen = ({
                         ))}
                 </Grid>
             )}
-            <Typography>
-                Spectators:{" "}
-                {
-                    gameState.connections.filter(
-                        (conn) => conn.connection_type === "spectator"
-                    ).length
-                }
-            </Typography>
-            {connection.is_host && (
+            <Typography>Spectators: {gameState.num_spectators}</Typography>
+            {connection?.is_host && (
                 <Button
                     variant="contained"
                     color="primary"